@@ -0,0 +1,18 @@
+-- =====================================================================
+-- Flyway Migration Script
+-- Version: V2
+-- Description: Index the deterministically encrypted sales columns
+-- =====================================================================
+
+-- customer_id, product_id and store_id are encrypted with AES-SIV
+-- ("encrypt": "deterministic" in table_schemas.py): equal values have
+-- equal ciphertexts, so B-tree indexes serve equality lookups, joins
+-- and GROUP BY without decrypting.
+
+CREATE INDEX IF NOT EXISTS idx_sales_customer_id ON sales (customer_id);
+CREATE INDEX IF NOT EXISTS idx_sales_product_id ON sales (product_id);
+CREATE INDEX IF NOT EXISTS idx_sales_store_id ON sales (store_id);
+
+-- =====================================================
+-- End of Script
+-- =====================================================
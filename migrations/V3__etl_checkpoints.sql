@@ -0,0 +1,26 @@
+-- =====================================================================
+-- Flyway Migration Script
+-- Version: V3
+-- Description: Chunk-level checkpoints of blob loads
+-- =====================================================================
+
+-- One row per blob version (name and ETag). chunk_index and byte_offset
+-- are the last chunk committed and the blob offset just after it; they
+-- are updated in the same transaction as that chunk's rows, so a rerun
+-- resumes with a ranged download from byte_offset and never loads a
+-- committed chunk twice.
+CREATE TABLE IF NOT EXISTS etl_checkpoints (
+    blob_name       VARCHAR(1024) NOT NULL,
+    etag            VARCHAR(100) NOT NULL,
+    chunk_index     INTEGER NOT NULL DEFAULT 0,
+    byte_offset     BIGINT NOT NULL DEFAULT 0,
+    rows_loaded     BIGINT NOT NULL DEFAULT 0,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    status          VARCHAR(20) NOT NULL DEFAULT 'running',
+    updated_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (blob_name, etag)
+);
+
+-- =====================================================
+-- End of Script
+-- =====================================================
@@ -0,0 +1,19 @@
+-- =====================================================================
+-- Flyway Migration Script
+-- Version: V4
+-- Description: Persistent dedup filters of loaded keys
+-- =====================================================================
+
+-- One row per table (name): a scalable Bloom filter of the unique keys
+-- loaded into it, serialized by utils/dedup.py. Workers load it at start
+-- and OR their additions into it under a row lock when they save.
+CREATE TABLE IF NOT EXISTS etl_dedup_filters (
+    name            VARCHAR(100) PRIMARY KEY,
+    filter          BYTEA NOT NULL,
+    keys_added      BIGINT NOT NULL DEFAULT 0,
+    updated_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =====================================================
+-- End of Script
+-- =====================================================
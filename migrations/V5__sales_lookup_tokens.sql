@@ -0,0 +1,30 @@
+-- =====================================================================
+-- Flyway Migration Script
+-- Version: V5
+-- Description: Lookup-token columns for the encrypted sales ID columns
+-- =====================================================================
+
+-- customer_id, product_id and store_id are Fernet-encrypted again
+-- ("encrypt": True in table_schemas.py): equal values get different
+-- ciphertexts, so the V2 indexes on them serve no lookup.
+DROP INDEX IF EXISTS idx_sales_customer_id;
+DROP INDEX IF EXISTS idx_sales_product_id;
+DROP INDEX IF EXISTS idx_sales_store_id;
+
+-- With "lookup": True on a column, the ETL writes a keyed HMAC-SHA256
+-- of each value to <column>_lookup. Rows loaded before are filled by
+-- scripts/backfill_lookup_tokens.py; until then they stay NULL.
+ALTER TABLE sales ADD COLUMN IF NOT EXISTS customer_id_lookup VARCHAR(64);
+ALTER TABLE sales ADD COLUMN IF NOT EXISTS product_id_lookup VARCHAR(64);
+ALTER TABLE sales ADD COLUMN IF NOT EXISTS store_id_lookup VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_sales_customer_id_lookup
+    ON sales (customer_id_lookup);
+CREATE INDEX IF NOT EXISTS idx_sales_product_id_lookup
+    ON sales (product_id_lookup);
+CREATE INDEX IF NOT EXISTS idx_sales_store_id_lookup
+    ON sales (store_id_lookup);
+
+-- =====================================================
+-- End of Script
+-- =====================================================
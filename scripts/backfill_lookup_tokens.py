@@ -0,0 +1,183 @@
+"""
+This script brings the rows already loaded into the sales table in line with
+the encryption configured in table_schemas.py, so an encrypted column never
+mixes token schemes and every "lookup" column has its lookup tokens.
+
+Usage:
+    python backfill_lookup_tokens.py [--batch-size 5000] [--dry-run]
+
+Main logic:
+    - Reads the sales table in sale_id order, --batch-size rows at a time.
+    - Decrypts every encrypted column as Fernet or, failing that, as AES-SIV
+      (rows loaded while the column was "deterministic"), and re-encrypts
+      the values whose token scheme differs from the column's mode.
+    - For every column with "lookup": True, writes the HMAC token of the
+      plaintext to <column>_lookup where it is missing or differs.
+    - Updates the changed rows of each batch in one transaction, so the
+      script can be stopped and run again; converted rows are left as they
+      are.
+
+Connection settings and keys come from the same environment variables as the
+pipeline (POSTGRES_*, FERNET_KEY, DETERMINISTIC_KEY, LOOKUP_KEY).
+"""
+import argparse
+import logging
+import os
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src", "etl_pipeline"))
+
+from sqlalchemy import text  # noqa: E402
+
+from src.etl_pipeline.load.to_sql import get_postgres_engine  # noqa: E402
+from src.etl_pipeline.transform.sales_data import (  # noqa: E402
+    get_deterministic_cipher,
+    get_fernet,
+    get_lookup_tokenizer,
+)
+from src.etl_pipeline.utils.encryption import (  # noqa: E402
+    get_encrypt_mode,
+    lookup_column,
+)
+from src.etl_pipeline.utils.env_vars import EnvConfig  # noqa: E402
+from src.etl_pipeline.utils.table_schemas import SALES_SQLALCHEMY_SCHEMA  # noqa: E402
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level=logging.INFO)
+logger = logging.getLogger("backfill_lookup_tokens")
+
+
+def target_columns():
+    """
+    Returns (column, encrypt mode, lookup column) for every column of the sales
+    schema that is encrypted or has lookup tokens.
+    """
+    return [
+        (col_meta["name"], get_encrypt_mode(col_meta), lookup_column(col_meta))
+        for col_meta in SALES_SQLALCHEMY_SCHEMA["columns"]
+        if get_encrypt_mode(col_meta) or lookup_column(col_meta)
+    ]
+
+
+def decrypt(token, ciphers):
+    """
+    Returns the plaintext of a token and the mode it was encrypted with.
+
+    Raises:
+        ValueError: If the token is neither a Fernet nor an AES-SIV token of
+            the configured keys.
+    """
+    for mode, cipher in ciphers.items():
+        if cipher is None:
+            continue
+        try:
+            return cipher.decrypt(token.encode()).decode(), mode
+        except Exception:
+            continue
+    raise ValueError("Token is neither a Fernet nor an AES-SIV token of the keys")
+
+
+def migrate_row(row, columns, ciphers, tokenizer):
+    """
+    Returns the new values of the columns of a row that must change.
+    """
+    changes = {}
+    for col, mode, token_col in columns:
+        value = row[col]
+        if value is None:
+            continue
+        plaintext = value
+        if mode:
+            plaintext, current = decrypt(value, ciphers)
+            if current != mode:
+                changes[col] = ciphers[mode].encrypt(plaintext.encode()).decode()
+        if token_col:
+            token = tokenizer.encrypt(plaintext.encode()).decode()
+            if row[token_col] != token:
+                changes[token_col] = token
+    return changes
+
+
+def backfill(engine, batch_size, dry_run=False):
+    """
+    Migrates the sales table batch by batch.
+
+    Returns:
+        tuple: Rows read and rows updated.
+    """
+    columns = target_columns()
+    selected = ["sale_id"]
+    for col, _, token_col in columns:
+        selected += [col] + ([token_col] if token_col else [])
+    select = text(
+        f"SELECT {', '.join(selected)} FROM sales "
+        "WHERE sale_id > :after ORDER BY sale_id LIMIT :limit"
+    )
+    ciphers = {"fernet": get_fernet(), "deterministic": get_deterministic_cipher()}
+    tokenizer = get_lookup_tokenizer()
+    if ciphers["fernet"] is None:
+        raise RuntimeError("FERNET_KEY is required to decrypt the sales table")
+
+    after, read, updated = 0, 0, 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select, {"after": after, "limit": batch_size}
+            ).mappings().all()
+            if not rows:
+                break
+            # One executemany per set of changed columns
+            updates = defaultdict(list)
+            for row in rows:
+                changes = migrate_row(row, columns, ciphers, tokenizer)
+                if changes:
+                    updates[tuple(sorted(changes))].append(
+                        {**changes, "sale_id": row["sale_id"]}
+                    )
+            if not dry_run:
+                for changed, params in updates.items():
+                    assignments = ", ".join(f"{col} = :{col}" for col in changed)
+                    update = f"UPDATE sales SET {assignments} WHERE sale_id = :sale_id"
+                    conn.execute(text(update), params)
+        after = rows[-1]["sale_id"]
+        read += len(rows)
+        updated += sum(len(params) for params in updates.values())
+        logger.info(f"Up to sale_id {after}: {read} rows read, {updated} to update.")
+    return read, updated
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Re-encrypt mixed tokens and fill lookup tokens of the sales table."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        help="Rows read and updated per transaction (default: 5000)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Count the rows to update without writing them",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    config = EnvConfig()
+    try:
+        config.validate()
+        read, updated = backfill(
+            get_postgres_engine(config), args.batch_size, args.dry_run
+        )
+    except Exception as e:
+        logger.error(f"Backfill failed: {e}")
+        sys.exit(1)
+    logger.info(
+        f"✅ {read} sales rows checked, {updated} "
+        f"{'to update (dry run)' if args.dry_run else 'updated'}."
+    )
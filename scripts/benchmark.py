@@ -0,0 +1,379 @@
+"""
+This script benchmarks the ETL pipeline end to end against the docker-compose
+Azurite and Postgres services, and compares the results with earlier runs.
+
+Usage:
+    python benchmark.py run [--rows 100000,1000000,10000000]
+        [--load-methods insert,copy,merge] [--chunk-sizes 10000,100000]
+        [--pipeline-modes sequential] [--seed 42] [--history FILE]
+        [--threshold 0.1] [--allow-remote-db]
+    python benchmark.py compare [--history FILE] [--threshold 0.1]
+
+Main logic:
+    - Generates one reproducible dataset per row count with
+      generate_mock_data.write_mock_csv (same seed, same file) in
+      data/benchmarks/, and uploads it to the container as
+      benchmarks/sales_<rows>_<seed>.csv unless it is already there.
+    - Runs src/etl_pipeline/main.py once per combination of row count, loader
+      mode (LOAD_METHOD), chunk size (CHUNK_SIZE) and pipeline mode, each in a
+      fresh process with DEDUP and CHECKPOINTS off and ARCHIVE_MODE=tags, so
+      the blob stays in place. The sales table is truncated before each run.
+    - Reads the JSON job report of each run: end-to-end rows/second, and the
+      rows and bytes per second of the extract, transform, encrypt and load
+      stages (busy time of each stage, so they are measured separately).
+    - Appends the run to a JSON history file (default:
+      data/benchmarks/history.json) and compares every case with its most
+      recent earlier result. A throughput drop beyond the threshold, or a
+      failed case, is reported as a regression and the script exits with
+      status 1.
+
+Connection settings come from the same environment variables as the pipeline
+(e.g. POSTGRES_HOST=localhost, POSTGRES_PORT=5434 and an Azurite
+AZ_CONNECTION_STRING on 127.0.0.1). The sales table is truncated, so only a
+local database is accepted unless --allow-remote-db is given.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src", "etl_pipeline"))
+
+from azure.core.exceptions import ResourceNotFoundError  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from generate_mock_data import write_mock_csv  # noqa: E402
+from src.etl_pipeline.load.to_sql import get_postgres_engine  # noqa: E402
+from src.etl_pipeline.utils.env_vars import EnvConfig  # noqa: E402
+from src.etl_pipeline.utils.storage import get_container_client  # noqa: E402
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level=logging.INFO)
+logger = logging.getLogger("benchmark")
+
+BENCHMARK_DIR = os.path.join(ROOT, "data", "benchmarks")
+DEFAULT_HISTORY = os.path.join(BENCHMARK_DIR, "history.json")
+MAIN_SCRIPT = os.path.join(ROOT, "src", "etl_pipeline", "main.py")
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1", "db")
+STAGES = ("extract", "transform", "encrypt", "load")
+
+DATASET_START = datetime(2025, 10, 9, 8, 0, 0)
+DATASET_END = datetime(2025, 10, 12, 22, 0, 0)
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def str_list(value):
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+
+def prepare_dataset(num_rows, seed):
+    """
+    Generates the dataset of num_rows rows (once per seed) and uploads it.
+
+    Args:
+        num_rows (int): Rows of the dataset.
+        seed (int): Seed of the generator.
+
+    Returns:
+        str: Name of the blob.
+    """
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    file_name = f"sales_{num_rows}_{seed}.csv"
+    local_path = os.path.join(BENCHMARK_DIR, file_name)
+    if not os.path.exists(local_path):
+        logger.info(f"Generating {num_rows} rows in {local_path}")
+        started = time.perf_counter()
+        write_mock_csv(local_path, num_rows, DATASET_START, DATASET_END, seed)
+        logger.info(f"Generated in {time.perf_counter() - started:.1f}s")
+
+    blob_name = f"benchmarks/{file_name}"
+    blob_client = get_container_client().get_blob_client(blob_name)
+    try:
+        uploaded = blob_client.get_blob_properties().size == os.path.getsize(local_path)
+    except ResourceNotFoundError:
+        uploaded = False
+    if not uploaded:
+        logger.info(f"Uploading {local_path} to {blob_name}")
+        with open(local_path, "rb") as data:
+            blob_client.upload_blob(data, overwrite=True, max_concurrency=4)
+    return blob_name
+
+
+def truncate_sales(engine):
+    """
+    Empties the sales table so every case loads the same rows.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE TABLE sales"))
+
+
+def run_case(blob_name, case):
+    """
+    Runs main.py for one benchmark case in a fresh process.
+
+    Args:
+        blob_name (str): Blob of the dataset.
+        case (dict): rows, load_method, chunk_size and pipeline_mode.
+
+    Returns:
+        dict: The case with its success, duration, throughput, stage metrics and
+            peak RSS, taken from the job report.
+    """
+    with tempfile.TemporaryDirectory(prefix="etl-bench-") as work_dir:
+        env = dict(
+            os.environ,
+            # CHUNK_SIZE is only used as given in the local environment;
+            # otherwise the chunk size is estimated from the free memory
+            ENVIRONMENT="local",
+            LOAD_METHOD=case["load_method"],
+            CHUNK_SIZE=str(case["chunk_size"]),
+            PIPELINE_MODE=case["pipeline_mode"],
+            ADAPTIVE_CHUNKING="false",
+            DEDUP="false",
+            CHECKPOINTS="false",
+            ARCHIVE_MODE="tags",
+            JOB_REPORT="true",
+            JOB_REPORT_DIR=work_dir,
+            PYTHONPATH=os.pathsep.join(
+                [ROOT, os.path.join(ROOT, "src", "etl_pipeline")]
+                + [p for p in [os.getenv("PYTHONPATH")] if p]
+            ),
+        )
+        # The job log (src.log) is written to the working directory
+        subprocess.run(
+            [sys.executable, MAIN_SCRIPT, blob_name],
+            cwd=work_dir,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        reports = glob.glob(os.path.join(work_dir, "etl_report_*.json"))
+        if not reports:
+            raise RuntimeError(f"No job report for {blob_name}; see the job log")
+        with open(reports[0], encoding="utf-8") as f:
+            report = json.load(f)
+
+    seconds = report["seconds"]
+    return {
+        **case,
+        "success": report["success"],
+        "rows_loaded": report["rows"],
+        "seconds": seconds,
+        "rows_per_second": case["rows"] / seconds if seconds else 0.0,
+        "stages": {
+            stage: {
+                "seconds": values["seconds"],
+                "rows_per_second": values["rows_per_second"],
+                "bytes_per_second": values["bytes_per_second"],
+            }
+            for stage, values in report["stages"].items()
+        },
+        "peak_rss_bytes": report["peak_rss_bytes"],
+        "db_pool_wait_seconds": report.get("db_pool", {}).get("wait_seconds"),
+    }
+
+
+def case_key(result):
+    return (
+        result["rows"],
+        result["load_method"],
+        result["chunk_size"],
+        result["pipeline_mode"],
+    )
+
+
+def case_name(key):
+    rows, load_method, chunk_size, pipeline_mode = key
+    return f"{rows} rows, {load_method}, chunk {chunk_size}, {pipeline_mode}"
+
+
+def compare(history, threshold):
+    """
+    Compares every case of the last run with its most recent earlier result.
+
+    Args:
+        history (list): Benchmark runs, oldest first.
+        threshold (float): Relative throughput drop reported as a regression.
+
+    Returns:
+        list: Report lines of every compared metric, and the regressions.
+    """
+    if not history:
+        return [], []
+    current, earlier = history[-1], history[:-1]
+    lines, regressions = [], []
+    for result in current["results"]:
+        key = case_key(result)
+        baseline = next(
+            (
+                previous
+                for run in reversed(earlier)
+                for previous in run["results"]
+                if case_key(previous) == key and previous["success"]
+            ),
+            None,
+        )
+        if not result["success"]:
+            line = f"{case_name(key)}: FAILED"
+            lines.append(line)
+            regressions.append(line)
+            continue
+        if baseline is None:
+            lines.append(f"{case_name(key)}: new")
+            continue
+        metrics = [("end to end", result, baseline)] + [
+            (stage, result["stages"][stage], baseline["stages"][stage])
+            for stage in STAGES
+            if stage in result["stages"] and stage in baseline["stages"]
+        ]
+        for metric, now, before in metrics:
+            if not before["rows_per_second"]:
+                continue
+            change = now["rows_per_second"] / before["rows_per_second"] - 1
+            flag = "REGRESSION" if change < -threshold else "ok"
+            line = (
+                f"{case_name(key)} [{metric}]: {now['rows_per_second']:.0f} rows/s "
+                f"vs {before['rows_per_second']:.0f} ({change:+.1%}) {flag}"
+            )
+            lines.append(line)
+            if flag == "REGRESSION":
+                regressions.append(line)
+    return lines, regressions
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def report(history, threshold):
+    """
+    Logs the comparison of the last run and returns the exit status.
+    """
+    lines, regressions = compare(history, threshold)
+    logger.info(f"----- BENCHMARK REPORT (threshold {threshold:.0%}) -----")
+    for line in lines:
+        logger.info(line)
+    if regressions:
+        logger.error(f"{len(regressions)} regressions beyond {threshold:.0%}")
+        return 1
+    logger.info("No regressions")
+    return 0
+
+
+def run(args):
+    config = EnvConfig()
+    config.validate()
+    if config.postgres_host not in LOCAL_HOSTS and not args.allow_remote_db:
+        logger.error(
+            f"The benchmark truncates the sales table of {config.postgres_host}; "
+            "pass --allow-remote-db to run it against a non-local database."
+        )
+        return 1
+    engine = get_postgres_engine(config)
+
+    results = []
+    for num_rows in args.rows:
+        blob_name = prepare_dataset(num_rows, args.seed)
+        for load_method in args.load_methods:
+            for chunk_size in args.chunk_sizes:
+                for pipeline_mode in args.pipeline_modes:
+                    case = {
+                        "rows": num_rows,
+                        "load_method": load_method,
+                        "chunk_size": chunk_size,
+                        "pipeline_mode": pipeline_mode,
+                    }
+                    truncate_sales(engine)
+                    logger.info(f"Running {case_name(case_key(case))}")
+                    try:
+                        result = run_case(blob_name, case)
+                    except Exception as e:
+                        logger.error(f"Case failed: {e}")
+                        result = {**case, "success": False}
+                    if result["success"]:
+                        logger.info(
+                            f"{result['seconds']:.1f}s, "
+                            f"{result['rows_per_second']:.0f} rows/s"
+                        )
+                    results.append(result)
+    truncate_sales(engine)
+
+    history = load_history(args.history)
+    history.append({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "seed": args.seed,
+        "host": {
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    })
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    logger.info(f"Results appended to {args.history}")
+    return report(history, args.threshold)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the ETL pipeline and compare with earlier runs."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "compare"):
+        subparser = subparsers.add_parser(name)
+        subparser.add_argument("--history", default=DEFAULT_HISTORY)
+        subparser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.1,
+            help="Relative throughput drop reported as a regression (default: 0.1)",
+        )
+    run_parser = subparsers.choices["run"]
+    run_parser.add_argument(
+        "--rows", type=int_list, default=[100000, 1000000, 10000000]
+    )
+    run_parser.add_argument(
+        "--load-methods", type=str_list, default=["insert", "copy", "merge"]
+    )
+    run_parser.add_argument("--chunk-sizes", type=int_list, default=[10000, 100000])
+    run_parser.add_argument("--pipeline-modes", type=str_list, default=["sequential"])
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--allow-remote-db", action="store_true")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "compare":
+        sys.exit(report(load_history(args.history), args.threshold))
+    sys.exit(run(args))
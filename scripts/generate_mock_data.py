@@ -3,128 +3,442 @@ This script generates mock sales data as a CSV file for testing ETL pipelines.
 
 Usage:
     python generate_mock_data.py [num_rows] [start_date] [end_date]
+        [--seed N] [--workers N] [--block-rows N]
+        [--customers N] [--products N] [--stores N] [--skew S]
+        [--duplicate-rate R] [--invalid-rate R]
+        [--output FILE | --azurite BLOB_NAME]
 
 Arguments:
     num_rows (int, optional): Number of rows to generate. Default is 100.
     start_date (str, optional): Start datetime in '%Y-%m-%d %H:%M:%S' format.
     end_date (str, optional): End datetime in '%Y-%m-%d %H:%M:%S' format.
+
+Main logic:
+    - Rows are generated with NumPy and written with the Arrow CSV writer in
+      blocks of --block-rows rows, by --workers processes (default: one per
+      CPU). Block i covers the i-th slice of the date range and is sorted, so
+      the file is in chronological order.
+    - Every block has its own generator derived from --seed and the block
+      number, so a seed gives the same file whatever the number of workers.
+      Without --seed a random seed is used and printed.
+    - --customers, --products and --stores set the number of distinct IDs, and
+      --skew the Zipf exponent of their popularity (0: uniform).
+    - --duplicate-rate repeats the transaction of an earlier row of the block
+      (a re-delivered row), and --invalid-rate writes rows the ETL rejects
+      (quantity 0 or a negative unit price).
+    - The CSV is written to --output (default: ../data/sales_<timestamp>.csv),
+      or with --azurite streamed to that blob of the Azurite container as
+      staged blocks, without a local file.
 """
-import csv
+import argparse
 import os
-import random
 import sys
-from uuid import uuid4
-from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+CUSTOMERS = 5
+PRODUCTS = 8
+STORES = 5
+PAYMENT_METHODS = pa.array(["credit card", "debit card", "paypal", "cash"])
+DISCOUNTS = np.array([0, 0.05, 0.10, 0.15, np.nan])
+FIELDNAMES = [
+    "transaction_id",
+    "customer_id",
+    "product_id",
+    "store_id",
+    "quantity",
+    "unit_price",
+    "discount",
+    "total_amount",
+    "payment_method",
+    "timestamp",
+]
+DEFAULT_START = datetime(2025, 10, 9, 8, 0, 0)
+DEFAULT_END = datetime(2025, 10, 12, 22, 0, 0)
+DEFAULT_BLOCK_ROWS = 250_000
+ID_WIDTH = 39
+
+# Two lowercase hex digits per byte value
+HEX_DIGITS = np.frombuffer(
+    "".join(f"{i:02x}" for i in range(256)).encode(), dtype=np.uint8
+).reshape(256, 2)
+
+
+def default_options():
+    """
+    Returns the data shape options used when none are given.
+
+    Returns:
+        dict: customers, products, stores, skew, duplicate_rate and
+            invalid_rate.
+    """
+    return {
+        "customers": CUSTOMERS,
+        "products": PRODUCTS,
+        "stores": STORES,
+        "skew": 0.0,
+        "duplicate_rate": 0.0,
+        "invalid_rate": 0.0,
+    }
+
+
+def transaction_ids(rng, n):
+    """
+    Generate n transaction IDs ('TX-' and a random version 4 UUID).
+
+    Args:
+        rng (np.random.Generator): Random generator.
+        n (int): Number of IDs.
+
+    Returns:
+        np.ndarray: One row of ID_WIDTH ASCII bytes per ID.
+    """
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    digits = HEX_DIGITS[raw].reshape(n, 32)
+    ids = np.empty((n, ID_WIDTH), dtype=np.uint8)
+    ids[:, :3] = np.frombuffer(b"TX-", dtype=np.uint8)
+    # 8-4-4-4-12 hex digits separated by dashes
+    offset = 3
+    for start, end in ((0, 8), (8, 12), (12, 16), (16, 20), (20, 32)):
+        ids[:, offset:offset + end - start] = digits[:, start:end]
+        offset += end - start
+        if end < 32:
+            ids[:, offset] = ord("-")
+            offset += 1
+    return ids
 
 
-def random_timestamp(start, end):
+def id_values(prefix, cardinality):
     """
-    Generate a random timestamp between two datetime objects.
-    
+    Returns the IDs '<prefix>-001' ... up to cardinality.
+    """
+    width = max(3, len(str(cardinality)))
+    return pa.array(
+        [f"{prefix}-{i:0{width}d}" for i in range(1, cardinality + 1)]
+    )
+
+
+def choose_ids(rng, cardinality, skew, n):
+    """
+    Draw n ID numbers out of cardinality, with Zipf popularity.
+
+    Args:
+        rng (np.random.Generator): Random generator.
+        cardinality (int): Number of distinct IDs.
+        skew (float): Zipf exponent; 0 draws every ID with the same probability.
+        n (int): Number of IDs to draw.
+
+    Returns:
+        np.ndarray: Positions of the drawn IDs in id_values.
+    """
+    weights = 1.0 / np.arange(1, cardinality + 1) ** skew
+    return rng.choice(cardinality, size=n, p=weights / weights.sum())
+
+
+def generate_block(block, num_rows, block_rows, start, end, seed, options):
+    """
+    Generate block number block of the dataset as CSV bytes.
+
     Args:
-        start (datetime): Start datetime.
-        end (datetime): End datetime.
-    
+        block (int): Block number; block 0 includes the header.
+        num_rows (int): Rows of the whole dataset.
+        block_rows (int): Rows per block.
+        start (datetime): Earliest timestamp of the dataset.
+        end (datetime): Latest timestamp of the dataset.
+        seed (int): Seed of the dataset.
+        options (dict): Data shape, see default_options.
+
     Returns:
-        datetime: Random datetime between start and end.
+        bytes: CSV rows of the block.
     """
-    delta = end - start
-    random_seconds = random.randint(0, int(delta.total_seconds()))
-    return start + timedelta(seconds=random_seconds)
+    rng = np.random.default_rng([seed, block])
+    first = block * block_rows
+    n = min(block_rows, num_rows - first)
+
+    # Each block covers its share of the date range, in order
+    start_s = np.datetime64(start, "s").astype(np.int64)
+    span = np.datetime64(end, "s").astype(np.int64) - start_s
+    low = start_s + span * first // num_rows
+    high = start_s + span * (first + n) // num_rows
+    seconds = np.sort(rng.integers(low, high + 1, size=n))
+
+    columns = {
+        "transaction_id": transaction_ids(rng, n),
+        "customer_id": choose_ids(rng, options["customers"], options["skew"], n),
+        "product_id": choose_ids(rng, options["products"], options["skew"], n),
+        "store_id": choose_ids(rng, options["stores"], options["skew"], n),
+        "quantity": rng.integers(1, 6, size=n),
+        "unit_price": np.round(rng.uniform(15.0, 600.0, size=n), 2),
+        "discount": DISCOUNTS[rng.integers(0, len(DISCOUNTS), size=n)],
+        "payment_method": rng.integers(0, len(PAYMENT_METHODS), size=n),
+    }
+
+    if options["duplicate_rate"] > 0:
+        # Repeat the transaction of an earlier row of the block
+        rows = np.flatnonzero(rng.random(n) < options["duplicate_rate"])
+        rows = rows[rows > 0]
+        sources = (rng.random(len(rows)) * rows).astype(np.int64)
+        for values in columns.values():
+            values[rows] = values[sources]
+    if options["invalid_rate"] > 0:
+        invalid = np.flatnonzero(rng.random(n) < options["invalid_rate"])
+        zero_quantity = rng.random(len(invalid)) < 0.5
+        columns["quantity"][invalid[zero_quantity]] = 0
+        columns["unit_price"][invalid[~zero_quantity]] *= -1
+
+    total_amount = np.round(
+        columns["quantity"]
+        * columns["unit_price"]
+        * (1 - np.nan_to_num(columns["discount"])),
+        2,
+    )
+    table = pa.table({
+        "transaction_id": pa.FixedSizeBinaryArray.from_buffers(
+            pa.binary(ID_WIDTH), n, [None, pa.py_buffer(columns["transaction_id"])]
+        ).cast(pa.string()),
+        "customer_id": id_values("CUST", options["customers"]).take(
+            columns["customer_id"]
+        ),
+        "product_id": id_values("PROD", options["products"]).take(
+            columns["product_id"]
+        ),
+        "store_id": id_values("STORE", options["stores"]).take(columns["store_id"]),
+        "quantity": columns["quantity"],
+        "unit_price": columns["unit_price"],
+        "discount": pa.array(columns["discount"], from_pandas=True),
+        "total_amount": total_amount,
+        "payment_method": PAYMENT_METHODS.take(columns["payment_method"]),
+        "timestamp": seconds.astype("datetime64[s]"),
+    })
+    # Arrow quotes its header, so the header is written here
+    sink = pa.BufferOutputStream()
+    if block == 0:
+        sink.write(",".join(FIELDNAMES).encode() + b"\n")
+    pacsv.write_csv(
+        table,
+        sink,
+        pacsv.WriteOptions(include_header=False, quoting_style="none"),
+    )
+    return sink.getvalue().to_pybytes()
+
+
+def generate_blocks(num_rows, start, end, seed, options, workers=None,
+                    block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    Generate the dataset block by block in worker processes.
+
+    Args:
+        num_rows (int): Number of rows.
+        start (datetime): Earliest timestamp.
+        end (datetime): Latest timestamp.
+        seed (int): Seed of the dataset.
+        options (dict): Data shape, see default_options.
+        workers (int, optional): Worker processes. Defaults to the CPU count.
+        block_rows (int): Rows per block.
+
+    Yields:
+        bytes: CSV blocks in order; the first one includes the header.
+    """
+    blocks = max(1, -(-num_rows // block_rows))
+    workers = workers or os.cpu_count() or 1
+    args = (num_rows, block_rows, start, end, seed, options)
+    if workers == 1 or blocks == 1:
+        for block in range(blocks):
+            yield generate_block(block, *args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # At most two blocks per worker wait in memory
+        pending = deque()
+        for block in range(blocks):
+            pending.append(executor.submit(generate_block, block, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_mock_csv(output_file, num_rows, start, end, seed=None, options=None,
+                   workers=None, block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    Writes num_rows mock sales rows, in chronological order, to a CSV file.
+
+    Args:
+        output_file (str): Path of the CSV file.
+        num_rows (int): Number of rows to generate.
+        start (datetime): Earliest timestamp.
+        end (datetime): Latest timestamp.
+        seed (int, optional): Seed of the generator. The same seed gives the
+            same file, transaction IDs included. Defaults to a random seed.
+        options (dict, optional): Data shape, see default_options.
+        workers (int, optional): Worker processes. Defaults to the CPU count.
+        block_rows (int): Rows generated per block.
+
+    Returns:
+        int: The seed used.
+    """
+    seed = random_seed() if seed is None else seed
+    options = {**default_options(), **(options or {})}
+    with open(output_file, mode="wb") as file:
+        for data in generate_blocks(
+            num_rows, start, end, seed, options, workers, block_rows
+        ):
+            file.write(data)
+    return seed
+
+
+def upload_mock_csv(blob_name, num_rows, start, end, seed=None, options=None,
+                    workers=None, block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    Streams num_rows mock sales rows to a blob of the Azurite container. Every
+    generated block is staged as a block of the blob, and the block list is
+    committed at the end, so no local file is written.
+
+    Args:
+        blob_name (str): Name of the blob in the container.
+        num_rows (int): Number of rows to generate.
+        start (datetime): Earliest timestamp.
+        end (datetime): Latest timestamp.
+        seed (int, optional): Seed of the generator.
+        options (dict, optional): Data shape, see default_options.
+        workers (int, optional): Worker processes. Defaults to the CPU count.
+        block_rows (int): Rows per generated and staged block.
+
+    Returns:
+        int: The seed used.
+    """
+    from azure.core.exceptions import ResourceExistsError
+    from azure.storage.blob import BlobBlock, BlobServiceClient
+
+    from upload_to_azurite import (
+        AZ_ACCOUNT_KEY,
+        AZ_ACCOUNT_NAME,
+        AZ_BLOB_URL,
+        CONTAINER_NAME,
+        PENDING_TAGS,
+        notify_queue,
+    )
+
+    seed = random_seed() if seed is None else seed
+    options = {**default_options(), **(options or {})}
+    connection_str = os.getenv("AZ_CONNECTION_STRING") or (
+        f"DefaultEndpointsProtocol=http;"
+        f"AccountName={AZ_ACCOUNT_NAME};"
+        f"AccountKey={AZ_ACCOUNT_KEY};"
+        f"BlobEndpoint={AZ_BLOB_URL};"
+    )
+    container_name = os.getenv("AZ_CONTAINER_NAME") or CONTAINER_NAME
+    container_client = BlobServiceClient.from_connection_string(
+        connection_str
+    ).get_container_client(container_name)
+    try:
+        container_client.create_container()
+    except ResourceExistsError:
+        pass
+
+    blob_client = container_client.get_blob_client(blob_name)
+    block_list = []
+    for i, data in enumerate(
+        generate_blocks(num_rows, start, end, seed, options, workers, block_rows)
+    ):
+        block_id = f"{i:08d}"
+        blob_client.stage_block(block_id, data, length=len(data))
+        block_list.append(BlobBlock(block_id=block_id))
+    blob_client.commit_block_list(block_list, tags=PENDING_TAGS)
+
+    queue_name = os.getenv("AZ_QUEUE_NAME")
+    if queue_name:
+        notify_queue(queue_name, blob_name)
+    return seed
+
+
+def random_seed():
+    return int(np.random.SeedSequence().entropy % 2**32)
+
+
+def parse_datetime(value):
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate mock sales data for testing ETL pipelines."
+    )
+    parser.add_argument("num_rows", nargs="?", type=int, default=100)
+    parser.add_argument(
+        "start_date", nargs="?", type=parse_datetime, default=DEFAULT_START
+    )
+    parser.add_argument(
+        "end_date", nargs="?", type=parse_datetime, default=DEFAULT_END
+    )
+    parser.add_argument("--seed", type=int, help="Seed (default: random)")
+    parser.add_argument(
+        "--workers", type=int, help="Worker processes (default: CPU count)"
+    )
+    parser.add_argument("--block-rows", type=int, default=DEFAULT_BLOCK_ROWS)
+    parser.add_argument("--customers", type=int, default=CUSTOMERS)
+    parser.add_argument("--products", type=int, default=PRODUCTS)
+    parser.add_argument("--stores", type=int, default=STORES)
+    parser.add_argument(
+        "--skew", type=float, default=0.0, help="Zipf exponent (default: 0)"
+    )
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--invalid-rate", type=float, default=0.0)
+    destination = parser.add_mutually_exclusive_group()
+    destination.add_argument("--output", help="CSV file to write")
+    destination.add_argument(
+        "--azurite", metavar="BLOB_NAME", help="Stream to this Azurite blob"
+    )
+    return parser.parse_args(argv)
 
 
 def main():
     """
-    Generates mock sales data and writes it to a CSV file.
-    Reads optional command-line arguments for number of rows and date range.
-    The output file is named with a timestamp and saved in the ../data directory.
-    """
-    
-
-    os.makedirs("../data", exist_ok=True)
-    execution_timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    output_file = f"../data/sales_{execution_timestamp}.csv"
-    customers = ["CUST-001", "CUST-002", "CUST-003", "CUST-004", "CUST-005"]
-    products = [
-        "PROD-001",
-        "PROD-002",
-        "PROD-003",
-        "PROD-004",
-        "PROD-005",
-        "PROD-006",
-        "PROD-007",
-        "PROD-008",
-    ]
-    stores = ["STORE-001", "STORE-002", "STORE-003", "STORE-004", "STORE-005"]
-    payment_methods = ["credit card", "debit card", "paypal", "cash"]
-    args = sys.argv[1:]
-    num_rows = 100
-    start = datetime(2025, 10, 9, 8, 0, 0)
-    end = datetime(2025, 10, 12, 22, 0, 0)
-    if len(args) > 0:
-        try:
-            num_rows = int(args[0])
-        except ValueError:
-            print(f"Invalid argument: {args[0]}. Using default value: {num_rows}.")
-    if len(args) > 1:
-        try:
-            start = datetime.strptime(args[1], "%Y-%m-%d %H:%M:%S")
-        except Exception:
-            print(f"Invalid start date: {args[1]}. Using default {start}.")
-    if len(args) > 2:
-        try:
-            end = datetime.strptime(args[2], "%Y-%m-%d %H:%M:%S")
-        except Exception:
-            print(f"Invalid end date: {args[2]}. Using default {end}.")
-
-    # Generate sorted timestamps to ensure chronological order
-    timestamps = [random_timestamp(start, end) for _ in range(num_rows)]
-    timestamps.sort()
-
-    rows = []
-    for i in range(num_rows):
-        transaction_id = f"TX-{uuid4()}"
-        customer_id = random.choice(customers)
-        product_id = random.choice(products)
-        store_id = random.choice(stores)
-        quantity = random.randint(1, 5)
-        unit_price = round(random.uniform(15.0, 600.0), 2)
-        discount = random.choice([0, 0.05, 0.10, 0.15, None])
-        payment_method = random.choice(payment_methods)
-        timestamp = timestamps[i]
-        total_amount = round(quantity * unit_price * (1 - (discount or 0)), 2)
-        row = {
-            "transaction_id": transaction_id,
-            "customer_id": customer_id,
-            "product_id": product_id,
-            "store_id": store_id,
-            "quantity": quantity,
-            "unit_price": unit_price,
-            "discount": discount if discount is not None else "",
-            "total_amount": total_amount,
-            "payment_method": payment_method,
-            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        rows.append(row)
-    fieldnames = [
-        "transaction_id",
-        "customer_id",
-        "product_id",
-        "store_id",
-        "quantity",
-        "unit_price",
-        "discount",
-        "total_amount",
-        "payment_method",
-        "timestamp",
-    ]
-    with open(output_file, mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-    
-    print(f"✅ CSV file generated successfully: {output_file}")
+    Generates mock sales data and writes it to a CSV file, or streams it to
+    Azurite. Reads the number of rows, date range and data shape from the
+    command line.
+    """
+    args = parse_args()
+    options = {
+        "customers": args.customers,
+        "products": args.products,
+        "stores": args.stores,
+        "skew": args.skew,
+        "duplicate_rate": args.duplicate_rate,
+        "invalid_rate": args.invalid_rate,
+    }
+    kwargs = {
+        "seed": args.seed,
+        "options": options,
+        "workers": args.workers,
+        "block_rows": args.block_rows,
+    }
+    if args.azurite:
+        seed = upload_mock_csv(
+            args.azurite, args.num_rows, args.start_date, args.end_date, **kwargs
+        )
+        print(
+            f"✅ {args.num_rows} rows streamed to Azurite blob '{args.azurite}' "
+            f"(seed {seed})"
+        )
+        return
+
+    output_file = args.output
+    if output_file is None:
+        os.makedirs("../data", exist_ok=True)
+        execution_timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        output_file = f"../data/sales_{execution_timestamp}.csv"
+    seed = write_mock_csv(
+        output_file, args.num_rows, args.start_date, args.end_date, **kwargs
+    )
+    print(f"✅ CSV file generated successfully: {output_file} (seed {seed})")
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
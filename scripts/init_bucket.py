@@ -1,5 +1,5 @@
 """
-This script monitors an Azure Blob Storage container for new CSV files and triggers ETL processing.
+This script initializes the Azure Blob Storage container used by the ETL pipeline.
 
 Usage:
     python init_bucket.py
@@ -7,17 +7,13 @@ Usage:
 Main logic:
     - Connects to Azure Blob Storage using environment variables.
     - Creates the container if it does not exist.
-    - Continuously polls for new blobs not in the processed/ folder and with .csv extension.
-    - For each new CSV blob, runs the ETL pipeline script (main.py) with the blob name as argument.
-    - Logs errors and waits between polling cycles.
-"""
-import os
-import subprocess
-import tempfile
-import time
 
-from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
-from azure.storage.blob import BlobClient, BlobServiceClient, ContainerClient
+New blobs are discovered and processed by the listener service
+(src/etl_pipeline/listener.py), which claims each blob with a lease so
+several ETL containers can share the backlog.
+"""
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.blob import BlobServiceClient
 
 from src.etl_pipeline.utils.env_vars import EnvConfig
 from src.etl_pipeline.utils.logger import get_logger
@@ -33,28 +29,6 @@ blob_service_client = BlobServiceClient.from_connection_string(connection_str)
 container_client = blob_service_client.get_container_client(config.az_container_name)
 try:
     container_client.create_container()
+    logger.info(f"Container '{config.az_container_name}' created")
 except ResourceExistsError:
-    pass
-
-
-while True:
-    try:
-        blob_list = container_client.list_blobs()
-    except Exception as e:
-        logger.error(f"Error listing blobs: {e}")
-        time.sleep(5)
-        continue
-
-    for blob in blob_list:
-        name = blob.name
-        # ignore blobs in the processed/ folder
-        if name.startswith(config.processed_prefix):
-            # already in processed/success or processed/fail
-            continue
-        if not name.endswith(".csv"):
-            continue
-
-        logger.info(f"New blob detected: {name}")
-        result = subprocess.run(["python", "src/etl_pipeline/main.py", name])
-
-    time.sleep(5)
+    logger.info(f"Container '{config.az_container_name}' already exists")
@@ -1,41 +1,117 @@
 """
-This script uploads a CSV file to an Azurite (Azure Blob Storage emulator) container.
+This script uploads CSV files to an Azurite (Azure Blob Storage emulator) container.
 It reads connection details from environment variables and handles errors gracefully.
 
 Usage:
-    python upload_to_azurite.py [file_path]
-    If no file_path is provided, the most recent CSV in ../data is used.
+    python upload_to_azurite.py [path] [--block-size-mb MB] [--concurrency N]
+                                [--compress {none,gzip,zstd}] [--level LEVEL]
+                                [--files N] [--pattern GLOB]
+    If no path is provided, the most recent CSV in ../data is used.
+    If path is a directory, every file matching --pattern in it is uploaded,
+    --files of them at a time; blob names are the paths relative to it.
+    If AZ_QUEUE_NAME is set, the blob name is also sent to that Azurite queue
+    for listeners running with LISTENER_SOURCE=queue.
+    Uploaded blobs are tagged etl_status=pending for listeners running with
+    ARCHIVE_MODE=tags.
+
+Main logic:
+    - Each file is read (and, with --compress, compressed on the fly) in blocks
+      of --block-size-mb, which are staged in parallel by --concurrency threads
+      shared by all files; the block list is committed once all are staged.
+    - At most 2 x --concurrency blocks per file are held in memory.
+    - Progress and throughput are logged every few seconds.
 """
 
+import argparse
 import glob
 import logging
 import os
 import sys
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobBlock, BlobServiceClient, ContentSettings
 
-from azure.storage.blob import BlobServiceClient
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed by --compress zstd
+    zstandard = None
 
 logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level=logging.INFO)
 logger = logging.getLogger("upload_to_azurite")
 
 AZ_BLOB_URL = "http://127.0.0.1:10000/devstoreaccount1"
+AZ_QUEUE_URL = "http://127.0.0.1:10001/devstoreaccount1"
 AZ_ACCOUNT_NAME = "devstoreaccount1"
 AZ_ACCOUNT_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
 CONTAINER_NAME = "mycontainer"
 
+COMPRESSIONS = ("none", "gzip", "zstd")
+# Suffix added to the blob name and content type of each compression
+BLOB_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+CONTENT_TYPES = {
+    "none": "text/csv",
+    "gzip": "application/gzip",
+    "zstd": "application/zstd",
+}
+MB = 1024 * 1024
+# Index tag of new blobs, found by listeners running with ARCHIVE_MODE=tags
+PENDING_TAGS = {"etl_status": "pending"}
+
 
-def upload_file(file_path):
+class Progress:
     """
-    Uploads a file to the Azurite blob container.
-    Creates the container if it does not exist.
-    Handles errors for missing files, environment variables, connection issues, and upload failures.
+    Thread-safe counters of the bytes read from disk and sent to Azurite by
+    an upload run, logged at most every interval seconds.
+    """
+
+    def __init__(self, total_bytes, interval=5.0):
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.read_bytes = 0
+        self.sent_bytes = 0
+        self.started = time.monotonic()
+        self._logged = self.started
+        self._lock = threading.Lock()
+
+    def add(self, read_bytes=0, sent_bytes=0):
+        with self._lock:
+            self.read_bytes += read_bytes
+            self.sent_bytes += sent_bytes
+            now = time.monotonic()
+            if now - self._logged < self.interval:
+                return
+            self._logged = now
+        self.log()
+
+    def elapsed(self):
+        return max(time.monotonic() - self.started, 1e-9)
+
+    def log(self):
+        percent = 100 * self.read_bytes / self.total_bytes if self.total_bytes else 100
+        logger.info(
+            f"Progress: {self.read_bytes / MB:.1f}/{self.total_bytes / MB:.1f} MB "
+            f"read ({percent:.0f}%), {self.sent_bytes / MB:.1f} MB sent, "
+            f"{self.sent_bytes / MB / self.elapsed():.1f} MB/s"
+        )
+
+
+def connect(pool_size=10):
+    """
+    Returns the client of the Azurite container, creating the container if it
+    does not exist.
 
     Args:
-        file_path (str): Path to the file to upload.
+        pool_size (int): HTTP connections kept open, one per upload thread.
+
+    Returns:
+        ContainerClient: The container client, or None on errors.
     """
-    # Check if the file exists
-    if not os.path.exists(file_path):
-        logger.error(f"Archivo '{file_path}' no encontrado.")
-        return
     connection_str = (
         f"DefaultEndpointsProtocol=http;"
         f"AccountName={AZ_ACCOUNT_NAME};"
@@ -43,11 +119,18 @@ def upload_file(file_path):
         f"BlobEndpoint={AZ_BLOB_URL};"
     )
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(connection_str)
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        session.mount("http://", adapter)
+        blob_service_client = BlobServiceClient.from_connection_string(
+            connection_str, transport=RequestsTransport(session=session)
+        )
         container_client = blob_service_client.get_container_client(CONTAINER_NAME)
     except Exception as e:
         logger.error(f"Error connecting to Azurite: {e}")
-        return
+        return None
 
     try:
         container_client.create_container()
@@ -57,23 +140,353 @@ def upload_file(file_path):
             logger.info(f"Container '{CONTAINER_NAME}' already exists.")
         else:
             logger.error(f"Error creating container: {e}")
-            return
-        
-    blob_name = os.path.basename(file_path)
+            return None
+    return container_client
+
+
+def new_compressor(compression, level=None):
+    """
+    Returns a streaming compressor with compress(data) and flush() methods.
+
+    Args:
+        compression (str): One of COMPRESSIONS.
+        level (int, optional): Compression level; defaults to 6 for gzip and 3
+            for zstd.
+
+    Returns:
+        The compressor, or None for "none".
+
+    Raises:
+        ValueError: If the compression is unknown.
+        RuntimeError: If zstd is requested but zstandard is not installed.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown compression '{compression}'. "
+            f"Expected one of: {', '.join(COMPRESSIONS)}"
+        )
+    if compression == "gzip":
+        # wbits=31 writes the gzip header and trailer
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError(
+                "zstd compression requires zstandard: pip install zstandard"
+            )
+        return zstandard.ZstdCompressor(
+            level=3 if level is None else level
+        ).compressobj()
+    return None
+
+
+def read_blocks(file_path, block_size, compressor=None, progress=None):
+    """
+    Yields the blocks of a blob: slices of block_size bytes of the file or,
+    with a compressor, of its compressed stream.
+
+    Args:
+        file_path (str): Path of the file.
+        block_size (int): Bytes per block; the last block may be shorter.
+        compressor (optional): Compressor returned by new_compressor.
+        progress (Progress, optional): Counts the bytes read.
+    """
+    pending = bytearray()
+    with open(file_path, "rb") as f:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            if progress is not None:
+                progress.add(read_bytes=len(data))
+            if compressor is None:
+                yield data
+                continue
+            pending += compressor.compress(data)
+            while len(pending) >= block_size:
+                yield bytes(pending[:block_size])
+                del pending[:block_size]
+    if compressor is not None:
+        pending += compressor.flush()
+        for start in range(0, len(pending), block_size):
+            yield bytes(pending[start:start + block_size])
+
+
+def upload_blocks(blob_client, blocks, executor, max_in_flight, progress=None):
+    """
+    Stages the blocks in parallel on the executor, in the order of the blob.
+    Waits for the oldest block whenever max_in_flight blocks are pending.
+
+    Returns:
+        tuple: Bytes uploaded and the committed BlobBlock list.
+    """
+
+    def stage(block_id, data):
+        blob_client.stage_block(block_id, data, length=len(data))
+        if progress is not None:
+            progress.add(sent_bytes=len(data))
+
+    block_list = []
+    in_flight = deque()
+    sent = 0
     try:
-        # Create blob client and upload the file
+        for i, data in enumerate(blocks):
+            if len(in_flight) >= max_in_flight:
+                in_flight.popleft().result()
+            block_id = f"{i:08d}"
+            in_flight.append(executor.submit(stage, block_id, data))
+            block_list.append(BlobBlock(block_id=block_id))
+            sent += len(data)
+        while in_flight:
+            in_flight.popleft().result()
+    finally:
+        # On errors, uncommitted blocks are discarded by the service
+        for future in in_flight:
+            future.cancel()
+    return sent, block_list
+
+
+def upload_file(
+    file_path,
+    blob_name=None,
+    block_size_mb=8,
+    concurrency=4,
+    compression="none",
+    level=None,
+    container_client=None,
+    executor=None,
+    progress=None,
+):
+    """
+    Uploads a file to the Azurite blob container as staged blocks.
+    Creates the container if it does not exist.
+    Handles errors for missing files, connection issues, and upload failures.
+
+    Args:
+        file_path (str): Path to the file to upload.
+        blob_name (str, optional): Blob name, before the compression suffix.
+            Defaults to the file name.
+        block_size_mb (float): Size of each staged block in MB.
+        concurrency (int): Blocks staged at once.
+        compression (str): "none", "gzip" or "zstd"; compressed blobs get a
+            .gz or .zst suffix.
+        level (int, optional): Compression level.
+        container_client (ContainerClient, optional): Shared container client.
+        executor (ThreadPoolExecutor, optional): Shared upload threads.
+        progress (Progress, optional): Shared progress of a directory upload.
+
+    Returns:
+        str: The blob name, or None if the upload failed.
+    """
+    # Check if the file exists
+    if not os.path.exists(file_path):
+        logger.error(f"Archivo '{file_path}' no encontrado.")
+        return None
+    try:
+        compressor = new_compressor(compression, level)
+    except Exception as e:
+        logger.error(f"Error uploading file '{file_path}': {e}")
+        return None
+    if container_client is None:
+        container_client = connect(concurrency)
+        if container_client is None:
+            return None
+
+    blob_name = (blob_name or os.path.basename(file_path)) + BLOB_SUFFIXES[compression]
+    file_size = os.path.getsize(file_path)
+    own_progress = progress is None
+    if own_progress:
+        progress = Progress(file_size)
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+    started = time.monotonic()
+    try:
+        # Create blob client and upload the file block by block
         blob_client = container_client.get_blob_client(blob_name)
-        with open(file_path, "rb") as data:
-            blob_client.upload_blob(data, overwrite=True)
-        logger.info(f"✅ File '{blob_name}' uploaded successfully to Azurite.")
+        blocks = read_blocks(file_path, int(block_size_mb * MB), compressor, progress)
+        sent, block_list = upload_blocks(
+            blob_client, blocks, executor, 2 * concurrency, progress
+        )
+        blob_client.commit_block_list(
+            block_list,
+            content_settings=ContentSettings(content_type=CONTENT_TYPES[compression]),
+            tags=PENDING_TAGS,
+        )
+        seconds = max(time.monotonic() - started, 1e-9)
+        logger.info(
+            f"✅ File '{blob_name}' uploaded successfully to Azurite "
+            f"({file_size / MB:.1f} MB -> {sent / MB:.1f} MB in {len(block_list)} "
+            f"blocks, {seconds:.1f}s, {file_size / MB / seconds:.1f} MB/s)."
+        )
     except Exception as e:
         logger.error(f"Error uploading file '{blob_name}': {e}")
+        return None
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+
+    queue_name = os.getenv("AZ_QUEUE_NAME")
+    if queue_name:
+        notify_queue(queue_name, blob_name)
+    return blob_name
+
+
+def upload_directory(
+    directory, pattern="*.csv", files_concurrency=2, concurrency=4, **options
+):
+    """
+    Uploads every file of a directory matching pattern, files_concurrency
+    files at a time. All files share one pool of concurrency upload threads
+    and one progress readout. Blob names are the paths relative to directory.
+
+    Args:
+        directory (str): Directory to upload.
+        pattern (str): Glob of the files, e.g. "*.csv" or "**/*.csv".
+        files_concurrency (int): Files uploaded at once.
+        concurrency (int): Blocks staged at once, across all files.
+        **options: block_size_mb, compression and level, see upload_file.
+
+    Returns:
+        list: Names of the uploaded blobs.
+    """
+    files = sorted(
+        path
+        for path in glob.glob(os.path.join(directory, pattern), recursive=True)
+        if os.path.isfile(path)
+    )
+    if not files:
+        logger.error(f"No files matching '{pattern}' found in '{directory}'.")
+        return []
+    container_client = connect(concurrency + files_concurrency)
+    if container_client is None:
+        return []
+
+    progress = Progress(sum(os.path.getsize(path) for path in files))
+    logger.info(
+        f"Uploading {len(files)} files ({progress.total_bytes / MB:.1f} MB) "
+        f"from '{directory}'."
+    )
+
+    def upload(path):
+        blob_name = os.path.relpath(path, directory).replace(os.sep, "/")
+        return upload_file(
+            path,
+            blob_name,
+            concurrency=concurrency,
+            container_client=container_client,
+            executor=executor,
+            progress=progress,
+            **options,
+        )
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        with ThreadPoolExecutor(max_workers=files_concurrency) as file_executor:
+            uploaded = [name for name in file_executor.map(upload, files) if name]
+    progress.log()
+    logger.info(
+        f"✅ {len(uploaded)}/{len(files)} files uploaded in {progress.elapsed():.1f}s "
+        f"({progress.read_bytes / MB / progress.elapsed():.1f} MB/s read)."
+    )
+    return uploaded
+
+
+def notify_queue(queue_name, blob_name):
+    """
+    Sends the name of an uploaded blob to an Azurite queue, creating the queue
+    if it does not exist.
+
+    Args:
+        queue_name (str): Queue watched by the ETL listener.
+        blob_name (str): Name of the uploaded blob.
+    """
+    try:
+        from azure.core.exceptions import ResourceExistsError
+        from azure.storage.queue import QueueClient
+    except ImportError:
+        logger.error("AZ_QUEUE_NAME is set but azure-storage-queue is not installed.")
+        return
+    connection_str = (
+        f"DefaultEndpointsProtocol=http;"
+        f"AccountName={AZ_ACCOUNT_NAME};"
+        f"AccountKey={AZ_ACCOUNT_KEY};"
+        f"QueueEndpoint={AZ_QUEUE_URL};"
+    )
+    try:
+        queue_client = QueueClient.from_connection_string(connection_str, queue_name)
+        try:
+            queue_client.create_queue()
+        except ResourceExistsError:
+            pass
+        queue_client.send_message(blob_name)
+        logger.info(f"Blob '{blob_name}' queued in '{queue_name}'.")
+    except Exception as e:
+        logger.error(f"Error queueing blob '{blob_name}': {e}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Upload a file, or the files of a directory, to Azurite."
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        help="File or directory to upload (default: most recent CSV in ../data)",
+    )
+    parser.add_argument(
+        "--block-size-mb",
+        type=float,
+        default=8,
+        help="Size of each staged block in MB (default: 8)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Blocks staged at once (default: 4)",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=COMPRESSIONS,
+        default="none",
+        help="Compress on the fly and add a .gz or .zst suffix (default: none)",
+    )
+    parser.add_argument(
+        "--level",
+        type=int,
+        help="Compression level (default: 6 for gzip, 3 for zstd)",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=2,
+        help="Files uploaded at once when path is a directory (default: 2)",
+    )
+    parser.add_argument(
+        "--pattern",
+        default="*.csv",
+        help="Files of a directory to upload, e.g. '**/*.csv' (default: *.csv)",
+    )
+    args = parser.parse_args(argv)
+    if args.block_size_mb <= 0 or args.concurrency < 1 or args.files < 1:
+        parser.error("--block-size-mb, --concurrency and --files must be positive")
+    return args
 
 
 if __name__ == "__main__":
-    if len(sys.argv) == 2:
+    args = parse_args()
+    options = {
+        "block_size_mb": args.block_size_mb,
+        "compression": args.compress,
+        "level": args.level,
+    }
+    if args.path and os.path.isdir(args.path):
+        uploaded = upload_directory(
+            args.path, args.pattern, args.files, args.concurrency, **options
+        )
+        sys.exit(0 if uploaded else 1)
+    if args.path:
         # Use the file path provided as an argument
-        file_path = sys.argv[1]
+        file_path = args.path
     else:
         # Otherwise, find the most recent CSV file in ../data
         files = glob.glob("../data/*.csv")
@@ -82,4 +495,5 @@ if __name__ == "__main__":
             sys.exit(1)
         file_path = max(files, key=os.path.getctime)
         logger.info(f"No file provided, using the most recent: {file_path}")
-    upload_file(file_path)
+    if upload_file(file_path, concurrency=args.concurrency, **options) is None:
+        sys.exit(1)
@@ -0,0 +1,252 @@
+import bz2
+import itertools
+import os
+import zlib
+from typing import Iterable, Iterator
+
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+from src.etl_pipeline.utils.metrics import metrics
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed by zstd blobs
+    zstandard = None
+
+logger = get_logger()
+config = EnvConfig()
+
+CODECS = ("none", "gzip", "zstd", "bz2")
+INPUT_COMPRESSIONS = ("auto",) + CODECS
+
+# Codec of each blob name extension, Content-Encoding and Content-Type
+EXTENSIONS = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+    ".bz2": "bz2",
+}
+CONTENT_ENCODINGS = {
+    "gzip": "gzip",
+    "x-gzip": "gzip",
+    "zstd": "zstd",
+    "bzip2": "bz2",
+    "x-bzip2": "bz2",
+}
+CONTENT_TYPES = {
+    "application/gzip": "gzip",
+    "application/x-gzip": "gzip",
+    "application/zstd": "zstd",
+    "application/x-bzip2": "bz2",
+}
+# Leading bytes of each compressed format
+MAGIC_BYTES = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"BZh", "bz2"),
+)
+MAGIC_SIZE = max(len(magic) for magic, _ in MAGIC_BYTES)
+
+# Compressed bytes given to the decompressor at a time. This keeps the
+# unconsumed input copied between bounded steps small, and bounds the
+# output of a zstd step to what one slice inflates to.
+DECOMPRESS_INPUT_SIZE = 64 * 1024
+# Decompressed bytes returned per gzip or bz2 step, whatever the
+# compression ratio, so such a blob is never inflated in memory at once
+DECOMPRESS_OUTPUT_SIZE = 1024 * 1024
+
+
+def is_csv_blob(blob_name: str) -> bool:
+    """
+    Return whether a blob name is a CSV file, plain or compressed
+    (e.g. sales.csv, sales.csv.gz).
+    """
+    name = blob_name.lower()
+    return name.endswith(".csv") or any(
+        name.endswith(".csv" + extension) for extension in EXTENSIONS
+    )
+
+
+def input_compression() -> str:
+    """
+    Return the INPUT_COMPRESSION setting.
+    Raises:
+        ValueError: If the setting is unknown.
+    """
+    setting = config.input_compression.lower()
+    if setting not in INPUT_COMPRESSIONS:
+        raise ValueError(
+            f"Unknown INPUT_COMPRESSION '{setting}'. "
+            f"Expected one of: {', '.join(INPUT_COMPRESSIONS)}"
+        )
+    return setting
+
+
+def codec_from_properties(blob_name: str, content_settings=None) -> str:
+    """
+    Return the codec given by the blob name extension, or else by the
+    Content-Encoding or Content-Type of the blob, or None if neither
+    tells.
+    """
+    extension = os.path.splitext(blob_name)[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    if content_settings is not None:
+        encoding = (content_settings.content_encoding or "").lower()
+        if encoding in CONTENT_ENCODINGS:
+            return CONTENT_ENCODINGS[encoding]
+        content_type = (content_settings.content_type or "").lower()
+        if content_type in CONTENT_TYPES:
+            return CONTENT_TYPES[content_type]
+    return None
+
+
+def codec_from_magic(head: bytes) -> str:
+    """
+    Return the codec whose magic bytes start head, or "none".
+    """
+    for magic, codec in MAGIC_BYTES:
+        if head.startswith(magic):
+            return codec
+    return "none"
+
+
+def detect_codec(
+    blob_name: str, content_settings=None, head: bytes = b""
+) -> str:
+    """
+    Return the codec of a blob: INPUT_COMPRESSION if set to a codec,
+    otherwise detected from the blob name extension, Content-Encoding,
+    Content-Type and, failing those, the magic bytes at the start of
+    head.
+    Args:
+        blob_name (str): Name of the blob.
+        content_settings (ContentSettings, optional): Blob properties.
+        head (bytes): First bytes of the blob.
+    Returns:
+        str: One of CODECS.
+    """
+    setting = input_compression()
+    if setting != "auto":
+        return setting
+    return (
+        codec_from_properties(blob_name, content_settings)
+        or codec_from_magic(head)
+    )
+
+
+def _new_decompressor(codec: str):
+    """
+    Return a decompressor of one gzip member, zstd frame or bz2 stream,
+    with decompress(data), eof and unused_data.
+    """
+    if codec == "gzip":
+        # wbits=31 expects the gzip header and trailer
+        return zlib.decompressobj(31)
+    if codec == "bz2":
+        return bz2.BZ2Decompressor()
+    if zstandard is None:
+        raise RuntimeError(
+            "zstd compressed blobs require zstandard: pip install zstandard"
+        )
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def _decompress_step(decompressor, codec: str, data) -> Iterator[bytes]:
+    """
+    Feed data to a decompressor of codec and yield its output until the
+    data is consumed or the member ends. gzip and bz2 output is yielded
+    in pieces of at most DECOMPRESS_OUTPUT_SIZE bytes; zstandard has no
+    output limit, so a zstd step yields everything the data inflates to.
+    """
+    if codec == "zstd":
+        output = decompressor.decompress(data)
+        if output:
+            yield output
+        return
+    while True:
+        output = decompressor.decompress(data, DECOMPRESS_OUTPUT_SIZE)
+        if output:
+            yield output
+        if decompressor.eof:
+            return
+        if codec == "bz2":
+            # Input not yet consumed is kept by the decompressor
+            if decompressor.needs_input:
+                return
+            data = b""
+        else:
+            data = decompressor.unconsumed_tail
+            if not data and len(output) < DECOMPRESS_OUTPUT_SIZE:
+                return
+
+
+def decompress_chunks(chunks: Iterable[bytes], codec: str) -> Iterator[bytes]:
+    """
+    Decompress a stream of compressed byte chunks incrementally, holding
+    one download chunk at a time. gzip and bz2 output is held at most
+    DECOMPRESS_OUTPUT_SIZE bytes at a time, zstd output at most what one
+    DECOMPRESS_INPUT_SIZE slice inflates to. Concatenated gzip members,
+    zstd frames and bz2 streams are decompressed one after another, and
+    a stream ending inside one raises an error. The compressed bytes are
+    counted in the extract_compressed_bytes metric.
+    Args:
+        chunks (Iterable[bytes]): Compressed chunks in stream order.
+        codec (str): One of CODECS; "none" yields the chunks unchanged.
+    Yields:
+        bytes: Decompressed chunks.
+    Raises:
+        ValueError: If the codec is unknown or the stream is truncated.
+        RuntimeError: If zstd is needed but zstandard is not installed.
+    """
+    if codec not in CODECS:
+        raise ValueError(
+            f"Unknown codec '{codec}'. Expected one of: {', '.join(CODECS)}"
+        )
+    if codec == "none":
+        yield from chunks
+        return
+
+    decompressor = _new_decompressor(codec)
+    started = False
+    for data in chunks:
+        metrics.count("extract_compressed_bytes", len(data))
+        view = memoryview(data)
+        for start in range(0, len(view), DECOMPRESS_INPUT_SIZE):
+            piece = view[start:start + DECOMPRESS_INPUT_SIZE]
+            while piece:
+                started = True
+                yield from _decompress_step(decompressor, codec, piece)
+                if not decompressor.eof:
+                    break
+                # The next member, if any, starts in the unused bytes
+                piece = decompressor.unused_data
+                decompressor = _new_decompressor(codec)
+                started = False
+    if started:
+        raise ValueError(f"Truncated {codec} stream")
+
+
+def decode_chunks(
+    blob_name: str, chunks: Iterable[bytes], content_settings=None
+):
+    """
+    Detect the codec of a downloading blob (see detect_codec), using the
+    first chunk for the magic bytes, and decompress it on the fly.
+    Args:
+        blob_name (str): Name of the blob.
+        chunks (Iterable[bytes]): Downloaded chunks, as stored.
+        content_settings (ContentSettings, optional): Blob properties.
+    Returns:
+        tuple: (codec, iterator of decompressed chunks)
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    codec = detect_codec(blob_name, content_settings, first[:MAGIC_SIZE])
+    if codec != "none":
+        logger.info(f"Decompressing '{blob_name}' ({codec})")
+    return codec, decompress_chunks(
+        itertools.chain([first], chunks), codec
+    )
@@ -1,23 +1,66 @@
-from io import StringIO
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
+from azure.core import MatchConditions
 from utils.env_vars import EnvConfig
 from utils.logger import get_logger
 
-from src.etl_pipeline.utils.utils import create_blob_client
+from src.etl_pipeline.extract.compression import (
+    MAGIC_SIZE,
+    codec_from_properties,
+    decode_chunks,
+    decompress_chunks,
+    detect_codec,
+    input_compression
+)
+from src.etl_pipeline.extract.streams import BlobStreamReader
+from src.etl_pipeline.utils.arrow_utils import (
+    DATAFRAME_ENGINES,
+    read_csv_arrow
+)
+from src.etl_pipeline.utils.metrics import bind_job_metrics, metrics
+from src.etl_pipeline.utils.storage import (
+    async_downloads_enabled,
+    download_blob,
+    get_async_downloader
+)
+from src.etl_pipeline.utils.utils import (
+    create_blob_client,
+    downcast_numeric_columns,
+    get_csv_read_options
+)
 
 logger = get_logger()
 config = EnvConfig()
 
+# Bytes downloaded at a time when looking for the header or a line break
+PROBE_SIZE = 64 * 1024
 
-def extract_data_from_azure_blob_stream(blob_name: str, chunk_size: int):
+# Marks the end of a byte range in its output queue
+_RANGE_DONE = object()
+
+
+def extract_data_from_azure_blob_stream(
+    blob_name: str, chunk_size: int, schema_name: str = "sales", sizer=None
+):
     """
     Stream a CSV blob from Azure Storage and yield pandas DataFrames
-    in chunks of exact rows. Does not load the entire blob into memory.
+    in chunks of exact rows. Does not load the entire blob into memory:
+    the download stream is read as raw bytes by pandas' C parser, with
+    column types and projection taken from CSV_SCHEMAS. gzip, zstd and
+    bz2 blobs are decompressed on the fly (see decode_chunks).
 
     Args:
         blob_name (str): Name of the blob in Azure container.
         chunk_size (int): Number of rows per chunk.
+        schema_name (str): Key in CSV_SCHEMAS describing the columns.
+        sizer (AdaptiveChunkSizer, optional): Adapts the size of each
+            chunk and receives the extract measurements.
 
     Yields:
         pd.DataFrame: DataFrame containing up to chunk_size rows.
@@ -25,46 +68,24 @@ def extract_data_from_azure_blob_stream(blob_name: str, chunk_size: int):
     try:
         # Create blob client and open stream
         blob_client = create_blob_client(blob_name)
-        stream_downloader = blob_client.download_blob()
-
-        # Initialize line buffer
-        lines = []
-        header = None
-        chunk_index = 1
-
-        # Iterate over raw bytes from Azure in chunks
-        for byte_chunk in stream_downloader.chunks():
-            # Decode bytes to string lines
-            text_chunk = byte_chunk.decode("utf-8")
-            for line in text_chunk.splitlines():
-                if not line.strip():
-                    continue  # skip empty lines
-
-                if header is None:
-                    # First non-empty line is the CSV header
-                    header = line
-                    continue
-
-                lines.append(line)
-                # If we've collected enough lines, yield a DataFrame
-                if len(lines) >= chunk_size:
-                    csv_buffer = StringIO("\n".join([header] + lines))
-                    df_chunk = pd.read_csv(csv_buffer)
-                    logger.info(
-                        f"Extracted chunk {chunk_index}. "
-                        f"Output {len(df_chunk)} rows"
-                    )
-                    yield df_chunk
-                    lines = []
-                    chunk_index += 1
-
-        # Yield remaining lines
-        if lines:
-            csv_buffer = StringIO("\n".join([header] + lines))
-            df_chunk = pd.read_csv(csv_buffer)
+        content_settings = None
+        if async_downloads_enabled():
+            data = get_async_downloader().iter_chunks(blob_name)
+        else:
+            downloader = download_blob(blob_client)
+            content_settings = downloader.properties.content_settings
+            data = downloader.chunks()
+        _, data = decode_chunks(blob_name, data, content_settings)
+        stream = BlobStreamReader(data)
+
+        for chunk_index, df_chunk in enumerate(
+            read_csv_chunks(stream, chunk_size, schema_name, sizer),
+            start=1,
+        ):
             logger.info(
-                f"Yielding final stream chunk {chunk_index} "
-                f"with {len(df_chunk)} rows"
+                f"Extracted chunk {chunk_index}. "
+                f"Output {len(df_chunk)} rows "
+                f"({stream.bytes_read} bytes read)"
             )
             yield df_chunk
 
@@ -73,3 +94,471 @@ def extract_data_from_azure_blob_stream(blob_name: str, chunk_size: int):
         raise RuntimeError(
             f"Exception: from_storage.extract_data_from_azure_blob_stream: {e}"
         )
+
+
+def extract_data_from_azure_blob_ranges(
+    blob_name: str,
+    chunk_size: int,
+    max_workers: int = None,
+    range_size: int = None,
+    schema_name: str = "sales",
+    sizer=None,
+):
+    """
+    Split a CSV blob into byte ranges aligned to line breaks and download
+    and parse the ranges in parallel workers. Each range is parsed on its
+    own with the blob header prepended; chunks are yielded range by range
+    so chunk numbering is deterministic. Workers prefetch at most
+    EXTRACT_PREFETCH_CHUNKS chunks per range ahead of the consumer.
+    Quoted fields must not contain line breaks. Compressed blobs cannot
+    be split and are extracted as one stream instead.
+
+    Args:
+        blob_name (str): Name of the blob in Azure container.
+        chunk_size (int): Number of rows per chunk.
+        max_workers (int, optional): Parallel range workers. Defaults to
+            EXTRACT_WORKERS.
+        range_size (int, optional): Target bytes per range. Defaults to
+            EXTRACT_RANGE_SIZE_MB.
+        schema_name (str): Key in CSV_SCHEMAS describing the columns.
+        sizer (AdaptiveChunkSizer, optional): Adapts the size of each
+            chunk and receives the extract measurements.
+
+    Yields:
+        pd.DataFrame: DataFrame containing up to chunk_size rows.
+    """
+    max_workers = max_workers or int(config.extract_workers)
+    range_size = range_size or int(config.extract_range_size_mb) * 1024**2
+    prefetch = int(config.extract_prefetch_chunks)
+    stop_event = threading.Event()
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="extract-range"
+    )
+
+    try:
+        blob_client = create_blob_client(blob_name)
+        properties = blob_client.get_blob_properties()
+        codec = detect_blob_codec(blob_client, properties)
+        if codec != "none":
+            logger.info(
+                f"'{blob_name}' is {codec} compressed; extracting it as "
+                f"one stream"
+            )
+            yield from extract_data_from_azure_blob_stream(
+                blob_name, chunk_size, schema_name, sizer
+            )
+            return
+        blob_size = properties.size
+        header, data_start = read_blob_header(blob_client, blob_size)
+        ranges = split_blob_ranges(
+            blob_client, data_start, blob_size, range_size, executor
+        )
+        logger.info(
+            f"Extracting '{blob_name}' ({blob_size} bytes) in "
+            f"{len(ranges)} ranges with {max_workers} workers"
+        )
+
+        range_queues = [queue.Queue(maxsize=prefetch) for _ in ranges]
+        for (start, end), range_queue in zip(ranges, range_queues):
+            executor.submit(
+                bind_job_metrics(_extract_range), blob_client, header,
+                start, end, chunk_size, schema_name, range_queue,
+                stop_event, sizer,
+            )
+
+        chunk_index = 0
+        for range_index, range_queue in enumerate(range_queues, start=1):
+            while True:
+                item = range_queue.get()
+                if item is _RANGE_DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                chunk_index += 1
+                logger.info(
+                    f"Extracted chunk {chunk_index} (range {range_index}/"
+                    f"{len(ranges)}). Output {len(item)} rows"
+                )
+                yield item
+
+    except Exception as e:
+        logger.error(f"Error processing blob '{blob_name}' from Azure: {e}")
+        raise RuntimeError(
+            f"Exception: from_storage.extract_data_from_azure_blob_ranges: "
+            f"{e}"
+        )
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_data_from_azure_blob_offsets(
+    blob_name: str,
+    chunk_size: int,
+    start_offset: int = None,
+    etag: str = None,
+    schema_name: str = "sales",
+    sizer=None,
+):
+    """
+    Stream a CSV blob from start_offset and yield each chunk with the
+    blob offset just after its last row, so a checkpointed load can
+    resume from that offset with a ranged download. Line breaks are
+    located in the downloaded bytes with numpy and each chunk is parsed
+    from exactly chunk_size lines, with the header prepended. Quoted
+    fields must not contain line breaks. The offsets of a compressed
+    blob count decompressed bytes: it is downloaded and decompressed
+    from the start, and the bytes before start_offset are skipped.
+
+    Args:
+        blob_name (str): Name of the blob in Azure container.
+        chunk_size (int): Number of lines per chunk.
+        start_offset (int, optional): Offset of the first line to read,
+            from a checkpoint. Defaults to the line after the header.
+        etag (str, optional): Fail if the blob changes from this version.
+        schema_name (str): Key in CSV_SCHEMAS describing the columns.
+        sizer (AdaptiveChunkSizer, optional): Adapts the size of each
+            chunk and receives the extract measurements.
+
+    Yields:
+        tuple: (pd.DataFrame, end offset of the chunk in the blob)
+    """
+    try:
+        blob_client = create_blob_client(blob_name)
+        properties = blob_client.get_blob_properties()
+        codec = detect_blob_codec(blob_client, properties)
+        condition = (
+            {"etag": etag, "match_condition": MatchConditions.IfNotModified}
+            if etag else {}
+        )
+        if codec == "none":
+            header, data_start = read_blob_header(
+                blob_client, properties.size
+            )
+            offset = start_offset or data_start
+            if offset >= properties.size:
+                return
+            chunks = download_blob(blob_client, offset, **condition).chunks()
+        else:
+            chunks = decompress_chunks(
+                download_blob(blob_client, **condition).chunks(), codec
+            )
+            header, data_start, chunks = read_stream_header(chunks)
+            offset = start_offset or data_start
+            chunks = _skip_bytes(chunks, offset - data_start)
+
+        pending = bytearray()
+        newlines = np.empty(0, dtype=np.int64)
+        chunk_index = 0
+        started = time.perf_counter()
+        for data in itertools.chain(chunks, [b""]):
+            last = not data
+            found = np.flatnonzero(
+                np.frombuffer(data, dtype=np.uint8) == ord("\n")
+            )
+            newlines = np.concatenate((newlines, found + len(pending)))
+            pending += data
+            while True:
+                size = sizer.chunk_size if sizer else chunk_size
+                if len(newlines) >= size:
+                    end = int(newlines[size - 1]) + 1
+                elif last and pending.strip():
+                    end = len(pending)
+                else:
+                    break
+                df_chunk = _parse_lines(
+                    header, bytes(pending[:end]), schema_name
+                )
+                del pending[:end]
+                newlines = newlines[np.searchsorted(newlines, end):] - end
+                offset += end
+                if sizer is not None:
+                    sizer.record_extract(
+                        len(df_chunk), end, time.perf_counter() - started
+                    )
+                chunk_index += 1
+                logger.info(
+                    f"Extracted chunk {chunk_index} ending at byte "
+                    f"{offset}. Output {len(df_chunk)} rows"
+                )
+                yield df_chunk, offset
+                started = time.perf_counter()
+
+    except Exception as e:
+        logger.error(f"Error processing blob '{blob_name}' from Azure: {e}")
+        raise RuntimeError(
+            f"Exception: from_storage.extract_data_from_azure_blob_offsets: "
+            f"{e}"
+        )
+
+
+def _parse_lines(header: bytes, lines: bytes, schema_name: str):
+    """
+    Parse whole CSV lines with the configured engine into one DataFrame.
+    """
+    stream = BlobStreamReader([header, lines])
+    frames = list(
+        read_csv_chunks(stream, lines.count(b"\n") + 1, schema_name)
+    )
+    # A single frame unless the lines are all blank
+    return frames[0] if frames else pd.DataFrame()
+
+
+def read_csv_chunks(
+    stream, chunk_size: int, schema_name: str, sizer=None
+):
+    """
+    Parse a binary CSV stream into DataFrames of chunk_size rows with the
+    engine selected by DATAFRAME_ENGINE: pandas' C parser, or the pyarrow
+    CSV reader producing Arrow-backed columns.
+    Args:
+        stream (BlobStreamReader): Binary stream counting the bytes read.
+        chunk_size (int): Number of rows per chunk.
+        schema_name (str): Key in CSV_SCHEMAS describing the columns.
+        sizer (AdaptiveChunkSizer, optional): If given, each chunk takes
+            the sizer's current chunk_size, and the rows, bytes and parse
+            time of every chunk are reported to it.
+    The rows, bytes and time of every chunk are recorded in the metrics
+    under the extract stage.
+    Yields:
+        pd.DataFrame: DataFrame containing up to chunk_size rows.
+    """
+    engine = config.dataframe_engine.lower()
+    if engine not in DATAFRAME_ENGINES:
+        raise ValueError(
+            f"Unknown DATAFRAME_ENGINE '{engine}'. "
+            f"Expected one of: {', '.join(DATAFRAME_ENGINES)}"
+        )
+    if engine == "arrow":
+        chunks = read_csv_arrow(stream, chunk_size, schema_name, sizer)
+    else:
+        chunks = _read_csv_pandas(stream, chunk_size, schema_name, sizer)
+
+    # Time spent while suspended at yield belongs to the consumer
+    started = time.perf_counter()
+    bytes_before = stream.bytes_read
+    for df_chunk in chunks:
+        df_chunk = downcast_numeric_columns(df_chunk, schema_name)
+        seconds = time.perf_counter() - started
+        nbytes = stream.bytes_read - bytes_before
+        metrics.record(
+            "extract", seconds, rows=len(df_chunk), bytes=nbytes, batches=1
+        )
+        if sizer is not None:
+            sizer.record_extract(len(df_chunk), nbytes, seconds)
+        yield df_chunk
+        started = time.perf_counter()
+        bytes_before = stream.bytes_read
+
+
+def _read_csv_pandas(stream, chunk_size: int, schema_name: str, sizer):
+    """
+    Parse a CSV stream with pandas' C parser, reading each chunk with the
+    sizer's current chunk_size if a sizer is given.
+    """
+    # Blank lines are skipped and the first non-blank line is the header
+    with pd.read_csv(
+        stream,
+        chunksize=chunk_size,
+        encoding="utf-8",
+        **get_csv_read_options(schema_name),
+    ) as reader:
+        if sizer is None:
+            yield from reader
+            return
+        while True:
+            try:
+                yield reader.get_chunk(sizer.chunk_size)
+            except StopIteration:
+                return
+
+
+def read_blob_header(blob_client, blob_size: int):
+    """
+    Read the CSV header line of a blob, skipping leading blank lines.
+    Args:
+        blob_client: Azure BlobClient.
+        blob_size (int): Blob size in bytes.
+    Returns:
+        tuple: (header line bytes including the line break, offset of the
+            first data byte)
+    """
+    length = PROBE_SIZE
+    while True:
+        head = download_blob(
+            blob_client, 0, min(length, blob_size)
+        ).readall()
+        stripped = head.lstrip(b"\r\n")
+        newline = stripped.find(b"\n")
+        if newline != -1:
+            header = stripped[:newline + 1]
+            return header, len(head) - len(stripped) + newline + 1
+        if len(head) >= blob_size:
+            # Header only, without a trailing line break
+            return stripped + b"\n", blob_size
+        length *= 2
+
+
+def read_stream_header(chunks):
+    """
+    Read the CSV header line at the start of a stream of byte chunks,
+    skipping leading blank lines.
+    Args:
+        chunks (Iterable[bytes]): Byte chunks in stream order.
+    Returns:
+        tuple: (header line bytes including the line break, offset of the
+            first data byte, iterator of the chunks from that offset)
+    """
+    chunks = iter(chunks)
+    head = bytearray()
+    for data in chunks:
+        head += data
+        stripped = head.lstrip(b"\r\n")
+        newline = stripped.find(b"\n")
+        if newline != -1:
+            data_start = len(head) - len(stripped) + newline + 1
+            rest = bytes(head[data_start:])
+            return (
+                bytes(stripped[:newline + 1]),
+                data_start,
+                itertools.chain([rest] if rest else [], chunks),
+            )
+    # Header only, without a trailing line break
+    return bytes(head.lstrip(b"\r\n")) + b"\n", len(head), iter(())
+
+
+def _skip_bytes(chunks, count: int):
+    """
+    Yield the non-empty byte chunks of a stream after its first count
+    bytes.
+    """
+    for data in chunks:
+        if count:
+            skipped = min(count, len(data))
+            count -= skipped
+            data = data[skipped:]
+        if data:
+            yield data
+
+
+def detect_blob_codec(blob_client, properties) -> str:
+    """
+    Return the codec of a blob (see detect_codec), downloading its first
+    bytes only if its name and properties do not tell.
+    Args:
+        blob_client: Azure BlobClient.
+        properties (BlobProperties): Properties of the blob.
+    Returns:
+        str: One of CODECS.
+    """
+    head = b""
+    if (
+        input_compression() == "auto"
+        and properties.size
+        and codec_from_properties(
+            blob_client.blob_name, properties.content_settings
+        ) is None
+    ):
+        head = download_blob(
+            blob_client, 0, min(MAGIC_SIZE, properties.size)
+        ).readall()
+    return detect_codec(
+        blob_client.blob_name, properties.content_settings, head
+    )
+
+
+def find_line_start(blob_client, offset: int, blob_size: int) -> int:
+    """
+    Return the offset of the first line starting at or after offset.
+    Args:
+        blob_client: Azure BlobClient.
+        offset (int): Nominal byte offset.
+        blob_size (int): Blob size in bytes.
+    Returns:
+        int: Offset just after the next line break, or blob_size.
+    """
+    position = offset
+    while position < blob_size:
+        length = min(PROBE_SIZE, blob_size - position)
+        probe = download_blob(blob_client, position, length).readall()
+        newline = probe.find(b"\n")
+        if newline != -1:
+            return position + newline + 1
+        position += length
+    return blob_size
+
+
+def split_blob_ranges(
+    blob_client, data_start: int, blob_size: int, range_size: int, executor
+) -> list:
+    """
+    Split the data section of a blob into (start, end) byte ranges of
+    about range_size bytes, each starting at the beginning of a line.
+    Args:
+        blob_client: Azure BlobClient.
+        data_start (int): Offset of the first data byte.
+        blob_size (int): Blob size in bytes.
+        range_size (int): Target bytes per range.
+        executor: Executor used to probe the range boundaries in parallel.
+    Returns:
+        list: Sorted, non-overlapping (start, end) tuples.
+    """
+    nominal = range(data_start + range_size, blob_size, range_size)
+    boundaries = executor.map(
+        bind_job_metrics(
+            lambda offset: find_line_start(blob_client, offset, blob_size)
+        ),
+        nominal,
+    )
+    edges = sorted({data_start, blob_size, *boundaries})
+    return [
+        (start, end)
+        for start, end in zip(edges, edges[1:])
+        if start < end
+    ]
+
+
+def _extract_range(
+    blob_client, header: bytes, start: int, end: int, chunk_size: int,
+    schema_name: str, range_queue: queue.Queue, stop_event: threading.Event,
+    sizer=None,
+):
+    """
+    Download and parse one byte range, putting its DataFrames on
+    range_queue followed by _RANGE_DONE, or the exception raised. With
+    AZ_ASYNC_DOWNLOADS the range is downloaded on the shared event loop,
+    which keeps fetching while this thread parses.
+    """
+    try:
+        if async_downloads_enabled():
+            data = get_async_downloader().iter_chunks(
+                blob_client.blob_name, start, end - start
+            )
+        else:
+            data = download_blob(blob_client, start, end - start).chunks()
+        stream = BlobStreamReader(itertools.chain([header], data))
+        for df_chunk in read_csv_chunks(
+            stream, chunk_size, schema_name, sizer
+        ):
+            if stop_event.is_set():
+                return
+            if not df_chunk.empty:
+                _put_until_stopped(range_queue, df_chunk, stop_event)
+        _put_until_stopped(range_queue, _RANGE_DONE, stop_event)
+    except Exception as e:
+        logger.error(f"Error extracting byte range {start}-{end}: {e}")
+        _put_until_stopped(range_queue, e, stop_event)
+
+
+def _put_until_stopped(
+    range_queue: queue.Queue, item, stop_event: threading.Event
+):
+    """
+    Put item on a bounded queue, giving up once stop_event is set.
+    """
+    while not stop_event.is_set():
+        try:
+            range_queue.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
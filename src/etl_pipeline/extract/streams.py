@@ -0,0 +1,44 @@
+import io
+from typing import Iterable
+
+
+class BlobStreamReader(io.RawIOBase):
+    """
+    Read-only binary file-like object over an iterable of byte chunks,
+    such as StorageStreamDownloader.chunks(). Lets pandas' C parser pull
+    raw bytes straight from the download stream, so lines and multi-byte
+    UTF-8 characters spanning download chunks are decoded correctly and
+    at most one download chunk is buffered at a time.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        """
+        Args:
+            chunks (Iterable[bytes]): Byte chunks in stream order.
+        """
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+        self._pos = 0
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        """
+        Fill the buffer b with the next bytes of the stream.
+        Returns:
+            int: Number of bytes read, 0 at end of stream.
+        """
+        while self._pos >= len(self._buffer):
+            try:
+                self._buffer = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+            self._pos = 0
+
+        size = min(len(b), len(self._buffer) - self._pos)
+        b[:size] = self._buffer[self._pos:self._pos + size]
+        self._pos += size
+        self.bytes_read += size
+        return size
@@ -0,0 +1,398 @@
+import base64
+import binascii
+import json
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceNotFoundError
+)
+from azure.storage.blob import BlobPrefix
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+from src.etl_pipeline.extract.compression import is_csv_blob
+from src.etl_pipeline.pipeline import process_blob
+from src.etl_pipeline.utils.dedup import get_dedup_index
+from src.etl_pipeline.utils.metrics import start_metrics_server
+from src.etl_pipeline.utils.utils import (
+    PENDING_STATUS,
+    STATUS_TAG,
+    create_container_client,
+    is_archived
+)
+
+try:
+    from azure.storage.queue import QueueClient
+except ImportError:  # optional dependency, only needed by the queue source
+    QueueClient = None
+
+logger = get_logger()
+config = EnvConfig()
+
+LISTENER_SOURCES = ("list", "queue")
+
+
+class BlobClaim:
+    """
+    Exclusive claim on a blob, held with a blob lease that a background
+    thread renews until the claim is released. Listeners in different
+    containers only process blobs they hold the lease of.
+    """
+
+    def __init__(self, blob_client, lease_seconds: int):
+        """
+        Acquire the lease.
+        Args:
+            blob_client: Azure BlobClient of the blob to claim.
+            lease_seconds (int): Lease duration, 15 to 60 seconds. The
+                lease is renewed every third of it.
+        Raises:
+            ResourceExistsError: If another listener holds the lease.
+            ResourceNotFoundError: If the blob no longer exists.
+        """
+        self.blob_name = blob_client.blob_name
+        self.lease = blob_client.acquire_lease(lease_duration=lease_seconds)
+        self._stopped = threading.Event()
+        self._renewer = threading.Thread(
+            target=self._renew,
+            args=(lease_seconds / 3,),
+            name=f"lease-{self.blob_name}",
+            daemon=True,
+        )
+        self._renewer.start()
+
+    def _renew(self, interval: float):
+        while not self._stopped.wait(interval):
+            try:
+                self.lease.renew()
+            except ResourceNotFoundError:
+                # The blob was moved away; nothing left to hold
+                return
+            except Exception as e:
+                logger.error(
+                    f"Error renewing lease on '{self.blob_name}': {e}"
+                )
+
+    def release(self):
+        """
+        Stop renewing and release the lease if the blob still exists.
+        """
+        self._stopped.set()
+        self._renewer.join()
+        try:
+            self.lease.release()
+        except (ResourceNotFoundError, HttpResponseError):
+            # Blob already moved (deleting it ended the lease)
+            pass
+
+
+class ListingSource:
+    """
+    Discovers CSV blobs by listing one level of the container under
+    LISTENER_PREFIX. The listing uses "/" as delimiter, so processed/
+    comes back as a single prefix and is never descended: the cost of a
+    poll depends on the blobs waiting, not on the blobs processed.
+    The SDK follows the continuation tokens between result pages.
+    With ARCHIVE_MODE=tags processed blobs stay where they are, so
+    instead of listing, the blob index is queried for blobs tagged
+    etl_status=pending by their producer: the cost of a poll again
+    depends only on the blobs waiting.
+    """
+
+    def __init__(self, container_client, prefix: str = None):
+        self.container_client = container_client
+        self.prefix = prefix or ""
+        self.by_tags = config.archive_mode.lower() == "tags"
+
+    def poll(self, max_blobs: int):
+        """
+        Yield (blob_name, None) for up to max_blobs CSV blobs, plain or
+        compressed, awaiting processing (and not leased, when listing).
+        """
+        found = 0
+        blobs = self._pending_blobs() if self.by_tags else self._list_blobs()
+        for blob_name in blobs:
+            if not is_csv_blob(blob_name):
+                continue
+            yield blob_name, None
+            found += 1
+            if found >= max_blobs:
+                return
+
+    def _list_blobs(self):
+        for item in self.container_client.walk_blobs(
+            name_starts_with=self.prefix or None, delimiter="/"
+        ):
+            if isinstance(item, BlobPrefix):
+                continue
+            if item.lease.state == "leased":
+                # Claimed by another listener
+                continue
+            yield item.name
+
+    def _pending_blobs(self):
+        # The query reports no lease state; claiming a leased blob fails
+        for item in self.container_client.find_blobs_by_tags(
+            f"\"{STATUS_TAG}\" = '{PENDING_STATUS}'"
+        ):
+            # Same level as the listing: directly under the prefix
+            rest = item.name[len(self.prefix):]
+            if item.name.startswith(self.prefix) and "/" not in rest:
+                yield item.name
+
+    def done(self, message):
+        pass
+
+
+class QueueSource:
+    """
+    Discovers blobs from a Storage queue (e.g. the Azurite queue service).
+    A message is either a blob name or a BlobCreated event in Event Grid
+    schema, optionally base64-encoded. Messages stay invisible for
+    LISTENER_VISIBILITY_SECONDS while their blob is processed and are
+    deleted once it is done.
+    """
+
+    def __init__(self, queue_name: str, connection_string: str):
+        if QueueClient is None:
+            raise RuntimeError(
+                "LISTENER_SOURCE=queue requires azure-storage-queue: "
+                "pip install azure-storage-queue"
+            )
+        self.queue_client = QueueClient.from_connection_string(
+            connection_string, queue_name
+        )
+        try:
+            self.queue_client.create_queue()
+        except ResourceExistsError:
+            pass
+        self.visibility_timeout = int(config.listener_visibility_seconds)
+
+    def poll(self, max_blobs: int):
+        """
+        Yield (blob_name, message) for up to max_blobs queued blobs.
+        Unreadable messages are logged and deleted.
+        """
+        messages = self.queue_client.receive_messages(
+            max_messages=max_blobs,
+            visibility_timeout=self.visibility_timeout,
+        )
+        for message in messages:
+            blob_name = parse_blob_message(message.content)
+            if blob_name is None:
+                logger.warning(f"Ignoring queue message: {message.content}")
+                self.done(message)
+                continue
+            yield blob_name, message
+
+    def done(self, message):
+        """
+        Delete a handled message. Ignores messages that became visible
+        again and were received by another listener.
+        """
+        try:
+            self.queue_client.delete_message(message)
+        except (ResourceNotFoundError, HttpResponseError) as e:
+            logger.warning(f"Could not delete queue message: {e}")
+
+
+def parse_blob_message(content: str):
+    """
+    Extract the blob name from a queue message.
+    Args:
+        content (str): Blob name, or Event Grid BlobCreated event JSON
+            (single event or list), optionally base64-encoded.
+    Returns:
+        str or None: Blob name, or None if the message is not understood.
+    """
+    content = (content or "").strip()
+    try:
+        decoded = base64.b64decode(content, validate=True).decode("utf-8")
+        if decoded.lstrip().startswith(("{", "[")):
+            content = decoded
+    except (binascii.Error, UnicodeDecodeError):
+        pass
+
+    if not content.startswith(("{", "[")):
+        return content or None
+    try:
+        event = json.loads(content)
+    except ValueError:
+        return None
+    if isinstance(event, list):
+        event = event[0] if event else {}
+    # subject: /blobServices/default/containers/<container>/blobs/<name>
+    _, separator, blob_name = event.get("subject", "").partition("/blobs/")
+    return blob_name if separator and blob_name else None
+
+
+def ensure_container(container_client):
+    """
+    Create the container if it does not exist.
+    """
+    try:
+        container_client.create_container()
+        logger.info(f"Container '{config.az_container_name}' created")
+    except ResourceExistsError:
+        pass
+
+
+def create_source(container_client):
+    """
+    Create the discovery source selected with LISTENER_SOURCE.
+    """
+    source = config.listener_source.lower()
+    if source not in LISTENER_SOURCES:
+        raise ValueError(
+            f"Unknown LISTENER_SOURCE '{source}'. "
+            f"Expected one of: {', '.join(LISTENER_SOURCES)}"
+        )
+    if source == "queue":
+        return QueueSource(
+            config.az_queue_name,
+            config.az_queue_connection_string or config.az_connection_string,
+        )
+    return ListingSource(container_client, config.listener_prefix)
+
+
+def run_listener(stop_event: threading.Event = None):
+    """
+    Poll the discovery source until stop_event is set, claim each new
+    blob with a lease and process it with at most LISTENER_CONCURRENCY
+    blobs in flight. New blobs are only claimed while a slot is free, so
+    other listeners can take the rest of the backlog.
+    Args:
+        stop_event (threading.Event, optional): Stops polling when set;
+            blobs in flight are finished before returning.
+    """
+    stop_event = stop_event or threading.Event()
+    concurrency = int(config.listener_concurrency)
+    poll_seconds = float(config.listener_poll_seconds)
+    lease_seconds = int(config.lease_seconds)
+
+    container_client = create_container_client()
+    ensure_container(container_client)
+    source = create_source(container_client)
+    # Warm the dedup filter before the first blob
+    get_dedup_index()
+    start_metrics_server()
+    slots = threading.BoundedSemaphore(concurrency)
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+    logger.info(
+        f"Listening for blobs ({config.listener_source}) with "
+        f"concurrency {concurrency}"
+    )
+
+    def run_claimed(claim: BlobClaim, message):
+        try:
+            process_blob(claim.blob_name, lease=claim.lease)
+        except Exception as e:
+            logger.error(f"Error processing '{claim.blob_name}': {e}")
+        finally:
+            claim.release()
+            source.done(message)
+            with in_flight_lock:
+                in_flight.discard(claim.blob_name)
+            slots.release()
+
+    with ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="listener"
+    ) as executor:
+        while not stop_event.is_set():
+            claimed = 0
+            try:
+                with in_flight_lock:
+                    free = concurrency - len(in_flight)
+                for blob_name, message in source.poll(max(free, 1)):
+                    with in_flight_lock:
+                        if blob_name in in_flight:
+                            continue
+                    if not wait_for_slot(slots, stop_event):
+                        break
+                    claim = claim_blob(
+                        container_client, blob_name, lease_seconds,
+                        source, message,
+                    )
+                    if claim is None:
+                        slots.release()
+                        continue
+                    with in_flight_lock:
+                        in_flight.add(blob_name)
+                    executor.submit(run_claimed, claim, message)
+                    claimed += 1
+            except Exception as e:
+                logger.error(f"Error polling for blobs: {e}")
+            # Poll again right away while the backlog yields new blobs
+            if not claimed:
+                stop_event.wait(poll_seconds)
+
+    logger.info("Listener stopped")
+
+
+def wait_for_slot(
+    slots: threading.Semaphore, stop_event: threading.Event
+) -> bool:
+    """
+    Acquire a processing slot. Returns False if stop_event is set first.
+    """
+    while not slots.acquire(timeout=1):
+        if stop_event.is_set():
+            return False
+    return True
+
+
+def claim_blob(
+    container_client, blob_name: str, lease_seconds: int, source, message
+):
+    """
+    Try to lease a blob. The message of a blob that no longer exists, or
+    with ARCHIVE_MODE=tags was already processed, is marked done.
+    Returns:
+        BlobClaim or None: None if the blob is gone, already processed or
+            leased elsewhere.
+    """
+    try:
+        blob_client = container_client.get_blob_client(blob_name)
+        claim = BlobClaim(blob_client, lease_seconds)
+    except ResourceNotFoundError:
+        logger.info(f"Blob '{blob_name}' no longer exists")
+        source.done(message)
+        return None
+    except HttpResponseError as e:
+        logger.info(f"Blob '{blob_name}' is claimed elsewhere: {e}")
+        return None
+
+    if config.archive_mode.lower() == "tags" and _is_archived(blob_client):
+        # Tagged by another listener since it was discovered
+        logger.info(f"Blob '{blob_name}' was already processed")
+        claim.release()
+        source.done(message)
+        return None
+    logger.info(f"Claimed blob: {blob_name}")
+    return claim
+
+
+def _is_archived(blob_client) -> bool:
+    """
+    is_archived, treating tags that cannot be read as not processed.
+    """
+    try:
+        return is_archived(blob_client)
+    except Exception as e:
+        logger.warning(
+            f"Could not read tags of '{blob_client.blob_name}': {e}"
+        )
+        return False
+
+
+if __name__ == "__main__":
+    config.validate()
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    run_listener(stop)
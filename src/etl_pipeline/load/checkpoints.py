@@ -0,0 +1,248 @@
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+from src.etl_pipeline.load.to_sql import (
+    LOAD_METHODS,
+    copy_df_to_table,
+    get_postgres_engine,
+    merge_df,
+    pooled_connection,
+    prepare_df_for_sql
+)
+from src.etl_pipeline.utils.metrics import metrics
+
+logger = get_logger()
+config = EnvConfig()
+
+CHECKPOINT_TABLE = "etl_checkpoints"
+
+# Count the attempt and return the checkpoint of a blob version
+START_SQL = text(
+    f"INSERT INTO {CHECKPOINT_TABLE} (blob_name, etag, attempts) "
+    "VALUES (:blob_name, :etag, 1) "
+    "ON CONFLICT (blob_name, etag) DO UPDATE SET "
+    f"attempts = {CHECKPOINT_TABLE}.attempts + 1, "
+    f"status = CASE WHEN {CHECKPOINT_TABLE}.status = 'success' "
+    "THEN 'success' ELSE 'running' END, "
+    "updated_at = CURRENT_TIMESTAMP "
+    "RETURNING chunk_index, byte_offset, rows_loaded, attempts, status"
+)
+
+# Advance the checkpoint by exactly one chunk; no row is updated if
+# another job already committed this chunk
+ADVANCE_SQL = text(
+    f"UPDATE {CHECKPOINT_TABLE} SET "
+    "chunk_index = :chunk_index, byte_offset = :byte_offset, "
+    "rows_loaded = rows_loaded + :rows, updated_at = CURRENT_TIMESTAMP "
+    "WHERE blob_name = :blob_name AND etag = :etag "
+    "AND chunk_index = :chunk_index - 1"
+)
+
+FINISH_SQL = text(
+    f"UPDATE {CHECKPOINT_TABLE} SET status = :status, "
+    "updated_at = CURRENT_TIMESTAMP "
+    "WHERE blob_name = :blob_name AND etag = :etag"
+)
+
+
+class BlobCheckpoint:
+    """
+    Progress of one blob version (name and ETag): the last committed
+    chunk and the byte offset just after it. Chunks must be committed in
+    order with load_chunk_with_checkpoint; after a chunk fails, later
+    chunks are not loaded so the next run resumes from the failed one.
+    """
+
+    def __init__(
+        self,
+        blob_name: str,
+        etag: str,
+        chunk_index: int = 0,
+        byte_offset: int = 0,
+        rows_loaded: int = 0,
+        attempts: int = 1,
+        status: str = "running",
+    ):
+        self.blob_name = blob_name
+        self.etag = etag
+        self.chunk_index = chunk_index
+        self.byte_offset = byte_offset
+        self.rows_loaded = rows_loaded
+        self.attempts = attempts
+        self.status = status
+        self.failed = False
+        # End offset of each extracted chunk not yet committed
+        self.chunk_offsets = {}
+        self._lock = threading.Lock()
+
+    def track_offsets(self, chunks):
+        """
+        Number the (DataFrame, end_offset) pairs of an offset-aware
+        extractor from the next chunk to commit, remember each offset and
+        yield the DataFrames.
+        """
+        for i, (df_chunk, end_offset) in enumerate(
+            chunks, start=self.chunk_index + 1
+        ):
+            with self._lock:
+                self.chunk_offsets[i] = end_offset
+            yield df_chunk
+
+
+def start_checkpoint(blob_name: str, etag: str) -> BlobCheckpoint:
+    """
+    Count a new attempt for a blob version and return its checkpoint.
+    Args:
+        blob_name (str): Blob name.
+        etag (str): Blob ETag; a new version of the blob starts over.
+    Returns:
+        BlobCheckpoint: Committed progress of previous attempts, if any.
+    """
+    with get_postgres_engine(config).begin() as conn:
+        row = conn.execute(
+            START_SQL, {"blob_name": blob_name, "etag": etag}
+        ).one()
+    checkpoint = BlobCheckpoint(blob_name, etag, *row)
+    if checkpoint.chunk_index:
+        logger.info(
+            f"Resuming '{blob_name}' after chunk {checkpoint.chunk_index} "
+            f"(byte {checkpoint.byte_offset}, {checkpoint.rows_loaded} "
+            f"rows loaded, attempt {checkpoint.attempts})"
+        )
+    return checkpoint
+
+
+def finish_checkpoint(checkpoint: BlobCheckpoint, status: str):
+    """
+    Record the final status ("success" or "failed") of a blob attempt.
+    """
+    with get_postgres_engine(config).begin() as conn:
+        conn.execute(
+            FINISH_SQL,
+            {
+                "status": status,
+                "blob_name": checkpoint.blob_name,
+                "etag": checkpoint.etag,
+            },
+        )
+    checkpoint.status = status
+
+
+def load_chunk_with_checkpoint(
+    df: pd.DataFrame,
+    table_name: str,
+    checkpoint: BlobCheckpoint,
+    chunk_index: int,
+    sizer=None,
+) -> bool:
+    """
+    Load a chunk and advance the blob checkpoint in one transaction on
+    one connection, so either both commit or neither does. Chunks must
+    arrive in order; an empty chunk (every row dropped by DEDUP) only
+    advances the checkpoint. With LOAD_METHOD=copy or merge the whole
+    chunk is sent in a single COPY; with insert, in multi-row INSERT
+    batches of BATCH_SIZE (or the sizer's batch size).
+    Args:
+        df (pd.DataFrame): Transformed chunk.
+        table_name (str): Target table.
+        checkpoint (BlobCheckpoint): Checkpoint of the blob.
+        chunk_index (int): Number of the chunk in the blob.
+        sizer (AdaptiveChunkSizer, optional): Receives the load time.
+    Returns:
+        bool: True if the chunk and checkpoint were committed.
+    """
+    byte_offset = checkpoint.chunk_offsets.pop(chunk_index, None)
+    if checkpoint.failed:
+        logger.warning(
+            f"Skipping chunk {chunk_index}: an earlier chunk of "
+            f"'{checkpoint.blob_name}' failed"
+        )
+        return False
+    if df is None:
+        logger.warning(f"No data for {table_name}.")
+        checkpoint.failed = True
+        return False
+
+    try:
+        load_method = config.load_method.lower()
+        if load_method not in LOAD_METHODS:
+            raise ValueError(
+                f"Unknown LOAD_METHOD '{load_method}'. "
+                f"Expected one of: {', '.join(LOAD_METHODS)}"
+            )
+        if not df.empty:
+            df = prepare_df_for_sql(df)
+        batch_size = sizer.batch_size if sizer else int(config.batch_size)
+        started = time.perf_counter()
+        counts = {"inserted": len(df)}
+
+        with pooled_connection(get_postgres_engine(config)) as conn:
+            with conn.begin():
+                if df.empty:
+                    # Every row was dropped by DEDUP; only the checkpoint
+                    # advances
+                    pass
+                elif load_method == "insert":
+                    for i in range(0, len(df), batch_size):
+                        df.iloc[i:i + batch_size].to_sql(
+                            name=table_name,
+                            con=conn,
+                            if_exists="append",
+                            index=False,
+                            method="multi",
+                        )
+                else:
+                    # DBAPI cursor inside the same transaction
+                    with conn.connection.cursor() as cursor:
+                        if load_method == "merge":
+                            counts = merge_df(cursor, df, table_name)
+                        else:
+                            copy_df_to_table(cursor, df, table_name)
+
+                advanced = conn.execute(
+                    ADVANCE_SQL,
+                    {
+                        "chunk_index": chunk_index,
+                        "byte_offset": byte_offset,
+                        "rows": len(df),
+                        "blob_name": checkpoint.blob_name,
+                        "etag": checkpoint.etag,
+                    },
+                ).rowcount
+                if advanced != 1:
+                    raise RuntimeError(
+                        f"Checkpoint of '{checkpoint.blob_name}' is not at "
+                        f"chunk {chunk_index - 1}; another job is loading "
+                        f"this blob"
+                    )
+
+        seconds = time.perf_counter() - started
+        if not df.empty:
+            batches = (
+                -(-len(df) // batch_size) if load_method == "insert" else 1
+            )
+            metrics.record("load", seconds, rows=len(df), batches=batches)
+            if sizer is not None:
+                sizer.record_batches([len(df)], [seconds])
+        checkpoint.chunk_index = chunk_index
+        checkpoint.byte_offset = byte_offset
+        checkpoint.rows_loaded += len(df)
+        logger.info(
+            f"Loaded chunk {chunk_index}. Loaded {len(df)} records into "
+            f"{table_name} ({load_method}, {counts.get('inserted', 0)} "
+            f"inserted, {counts.get('updated', 0)} updated, "
+            f"{counts.get('skipped', 0)} skipped); checkpoint at byte "
+            f"{byte_offset}"
+        )
+        return True
+    except Exception as e:
+        logger.error(
+            f"Error loading chunk {chunk_index} into table {table_name}: {e}"
+        )
+        checkpoint.failed = True
+        return False
@@ -1,15 +1,94 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from io import StringIO
+
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from psycopg2 import sql
+from sqlalchemy import create_engine, event
 from utils.env_vars import EnvConfig
 from utils.logger import get_logger
 
+from src.etl_pipeline.utils.arrow_utils import (
+    df_to_csv_bytes,
+    is_arrow_backed
+)
+from src.etl_pipeline.utils.metrics import bind_job_metrics, metrics
+from src.etl_pipeline.utils.profiling import (
+    InlineExecutor,
+    profiling_enabled
+)
+from src.etl_pipeline.utils.table_schemas import SQLALCHEMY_SCHEMAS
+
 logger = get_logger()
 config = EnvConfig()
 
+LOAD_METHODS = ("insert", "copy", "merge")
+MERGE_ACTIONS = ("nothing", "update")
+
+# Process-wide engine and loader executor, created on first use
+_engine = None
+_loader_executor = None
+_engine_lock = threading.Lock()
+
 
-def load_df_to_sql(df: pd.DataFrame, table_name: str) -> bool:
+class PoolStats:
+    """
+    Thread-safe counters for the connection pool: checkouts, physical
+    connections opened and time spent waiting for a pooled connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_connect(self, *args):
+        with self._lock:
+            self.connects += 1
+
+    def record_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "waits": self.waits,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+
+pool_stats = PoolStats()
+metrics.add_collector("db_pool", pool_stats.snapshot)
+
+
+def load_df_to_sql(df: pd.DataFrame, table_name: str, sizer=None) -> bool:
     """
     Loads a DataFrame into the specified SQL table.
+    The load path is selected with LOAD_METHOD:
+        - insert: pandas to_sql with multi-row INSERT statements (default)
+        - copy: PostgreSQL COPY FROM STDIN streaming an in-memory CSV
+        - merge: COPY into a temporary staging table, then a set-based
+          INSERT ... ON CONFLICT into the target table (idempotent reloads)
+    BATCH_SIZE sets the number of rows per INSERT batch or COPY segment,
+    unless an AdaptiveChunkSizer is given: its current batch_size is used
+    and the duration of every batch is reported to it.
     Returns True if successful, False if failed.
     """
     if df is None or df.empty:
@@ -17,47 +96,68 @@ def load_df_to_sql(df: pd.DataFrame, table_name: str) -> bool:
         return False
 
     try:
+        load_method = config.load_method.lower()
+        if load_method not in LOAD_METHODS:
+            raise ValueError(
+                f"Unknown LOAD_METHOD '{load_method}'. "
+                f"Expected one of: {', '.join(LOAD_METHODS)}"
+            )
+        load_batch = {
+            "insert": insert_batch_to_sql,
+            "copy": copy_batch_to_sql,
+            "merge": merge_batch_to_sql,
+        }[load_method]
+
         engine = get_postgres_engine(config)
+        executor = (
+            InlineExecutor()
+            if profiling_enabled()
+            else get_loader_executor(config)
+        )
+        df = prepare_df_for_sql(df)
 
         # Batch size for concurrent loading
-        batch_size = int(config.batch_size)
+        batch_size = sizer.batch_size if sizer else int(config.batch_size)
         num_records = len(df)
         batches = [
             df.iloc[i:i + batch_size]
             for i in range(0, num_records, batch_size)
         ]
 
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-
         results = []
+        counts = Counter()
+        batch_rows = []
+        batch_seconds = []
 
-        with ThreadPoolExecutor() as executor:
-            future_to_batch = {
-                executor.submit(
-                    lambda batch: batch.to_sql(
-                        name=table_name,
-                        con=engine,
-                        if_exists="append",
-                        index=False,
-                        method="multi",
-                    ),
-                    batch,
-                ): batch
-                for batch in batches
-            }
-            for future in as_completed(future_to_batch):
-                try:
-                    future.result()
-                    results.append(True)
-                except Exception as e:
-                    logger.error(
-                        f"Error loading batch into table {table_name}: {e}"
-                    )
-                    results.append(False)
+        future_to_batch = {
+            executor.submit(
+                bind_job_metrics(_timed), load_batch, batch, table_name,
+                engine
+            ): batch
+            for batch in batches
+        }
+        for future in as_completed(future_to_batch):
+            try:
+                batch_counts, seconds = future.result()
+                counts.update(batch_counts)
+                batch_rows.append(len(future_to_batch[future]))
+                batch_seconds.append(seconds)
+                results.append(True)
+            except Exception as e:
+                logger.error(
+                    f"Error loading batch into table {table_name}: {e}"
+                )
+                metrics.count("load_batch_failures")
+                results.append(False)
+        log_pool_stats(engine)
+        if sizer is not None:
+            sizer.record_batches(batch_rows, batch_seconds)
         if all(results):
             logger.info(
                 f"Loaded chunk. Loaded {num_records} records into "
-                f"{table_name} concurrently."
+                f"{table_name} concurrently ({load_method}): "
+                f"{counts['inserted']} inserted, {counts['updated']} "
+                f"updated, {counts['skipped']} skipped."
             )
             return True
         else:
@@ -68,9 +168,330 @@ def load_df_to_sql(df: pd.DataFrame, table_name: str) -> bool:
         return False
 
 
+def _timed(load_batch, batch: pd.DataFrame, table_name: str, engine):
+    """
+    Run a batch loader and return its counts with the seconds it took.
+    """
+    started = time.perf_counter()
+    counts = load_batch(batch, table_name, engine)
+    seconds = time.perf_counter() - started
+    metrics.record("load", seconds, rows=len(batch), batches=1)
+    return counts, seconds
+
+
+def prepare_df_for_sql(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert columns without a direct SQL representation: timedelta64
+    time-of-day columns become "HH:MM:SS[.ffffff]" strings for TIME
+    columns, which both to_sql and COPY accept.
+    Args:
+        df (pd.DataFrame): Transformed DataFrame.
+    Returns:
+        pd.DataFrame: DataFrame ready for the batch loaders.
+    """
+    timedelta_cols = [
+        col for col in df.columns
+        if pd.api.types.is_timedelta64_dtype(df[col])
+    ]
+    if not timedelta_cols:
+        return df
+    df = df.copy(deep=False)
+    for col in timedelta_cols:
+        df[col] = format_time_of_day(df[col])
+    return df
+
+
+def format_time_of_day(values: pd.Series) -> pd.Series:
+    """
+    Format timedelta64 values (time since midnight) as "HH:MM:SS", with
+    microseconds only when some value has a fractional second.
+    """
+    nanos = values.to_numpy(dtype="timedelta64[ns]")
+    whole_seconds = (
+        (nanos[~np.isnat(nanos)] % np.timedelta64(1, "s")) == 0
+    ).all()
+    unit = "s" if whole_seconds else "us"
+    # Offset from the epoch and keep the time part of the ISO string
+    text = np.datetime_as_string(np.datetime64(0, "ns") + nanos, unit=unit)
+    times = pd.Series(text, index=values.index, dtype=object).str[11:]
+    return times.where(~np.isnat(nanos), None)
+
+
+def insert_batch_to_sql(
+    batch: pd.DataFrame, table_name: str, engine
+) -> dict:
+    """
+    Insert a batch using pandas to_sql with multi-row INSERT statements.
+    Args:
+        batch (pd.DataFrame): Rows to insert.
+        table_name (str): Target table.
+        engine: SQLAlchemy engine.
+    Returns:
+        dict: Row counts by outcome.
+    """
+    with pooled_connection(engine) as conn:
+        with conn.begin():
+            batch.to_sql(
+                name=table_name,
+                con=conn,
+                if_exists="append",
+                index=False,
+                method="multi",
+            )
+    return {"inserted": len(batch)}
+
+
+def copy_batch_to_sql(
+    batch: pd.DataFrame, table_name: str, engine
+) -> dict:
+    """
+    Stream a batch into the table with COPY FROM STDIN. The batch is
+    serialized once into an in-memory CSV buffer and sent through
+    psycopg2's copy API in a single round trip.
+    Args:
+        batch (pd.DataFrame): Rows to copy.
+        table_name (str): Target table.
+        engine: SQLAlchemy engine.
+    Returns:
+        dict: Row counts by outcome.
+    """
+    with pooled_connection(engine, raw=True) as conn:
+        try:
+            with conn.cursor() as cursor:
+                copy_df_to_table(cursor, batch, table_name)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return {"inserted": len(batch)}
+
+
+def merge_batch_to_sql(
+    batch: pd.DataFrame, table_name: str, engine
+) -> dict:
+    """
+    COPY a batch into a temporary staging table and merge it into the
+    target with INSERT ... SELECT ... ON CONFLICT on the table's unique
+    columns. Rows already present are skipped (MERGE_ON_CONFLICT=nothing)
+    or overwritten (MERGE_ON_CONFLICT=update) instead of failing the batch.
+    Args:
+        batch (pd.DataFrame): Rows to merge.
+        table_name (str): Target table.
+        engine: SQLAlchemy engine.
+    Returns:
+        dict: Row counts by outcome.
+    """
+    with pooled_connection(engine, raw=True) as conn:
+        try:
+            with conn.cursor() as cursor:
+                counts = merge_df(cursor, batch, table_name)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return counts
+
+
+def merge_df(cursor, batch: pd.DataFrame, table_name: str) -> dict:
+    """
+    Merge rows into a table on the given cursor, in the caller's
+    transaction: COPY into a temporary staging table dropped at commit,
+    then INSERT ... SELECT ... ON CONFLICT (see merge_batch_to_sql). Call
+    at most once per transaction.
+    Args:
+        cursor: psycopg2 cursor.
+        batch (pd.DataFrame): Rows to merge.
+        table_name (str): Target table.
+    Returns:
+        dict: Row counts by outcome.
+    """
+    conflict_action = config.merge_on_conflict.lower()
+    if conflict_action not in MERGE_ACTIONS:
+        raise ValueError(
+            f"Unknown MERGE_ON_CONFLICT '{conflict_action}'. "
+            f"Expected one of: {', '.join(MERGE_ACTIONS)}"
+        )
+    keys = get_conflict_columns(table_name)
+    if not keys:
+        raise ValueError(f"No unique columns declared for '{table_name}'")
+
+    stage_name = f"_stage_{table_name}"
+    columns = sql.SQL(", ").join(sql.Identifier(col) for col in batch.columns)
+    key_columns = sql.SQL(", ").join(sql.Identifier(col) for col in keys)
+
+    if conflict_action == "update":
+        conflict_stmt = sql.SQL("DO UPDATE SET {}").format(
+            sql.SQL(", ").join(
+                sql.SQL("{col} = EXCLUDED.{col}").format(
+                    col=sql.Identifier(col)
+                )
+                for col in batch.columns
+                if col not in keys
+            )
+        )
+    else:
+        conflict_stmt = sql.SQL("DO NOTHING")
+
+    create_stage = sql.SQL(
+        "CREATE TEMP TABLE {stage} ON COMMIT DROP AS "
+        "SELECT {columns} FROM {table} WITH NO DATA"
+    ).format(
+        stage=sql.Identifier(stage_name),
+        columns=columns,
+        table=sql.Identifier(table_name),
+    )
+    # DISTINCT ON drops duplicate keys inside the batch, which ON CONFLICT
+    # DO UPDATE would otherwise reject. xmax = 0 marks freshly inserted rows
+    merge_stmt = sql.SQL(
+        "WITH merged AS ("
+        "INSERT INTO {table} ({columns}) "
+        "SELECT DISTINCT ON ({keys}) {columns} FROM {stage} "
+        "ORDER BY {keys} "
+        "ON CONFLICT ({keys}) {conflict} "
+        "RETURNING (xmax = 0) AS inserted) "
+        "SELECT count(*) FILTER (WHERE inserted), "
+        "count(*) FILTER (WHERE NOT inserted) FROM merged"
+    ).format(
+        table=sql.Identifier(table_name),
+        columns=columns,
+        keys=key_columns,
+        stage=sql.Identifier(stage_name),
+        conflict=conflict_stmt,
+    )
+
+    cursor.execute(create_stage)
+    copy_df_to_table(cursor, batch, stage_name)
+    cursor.execute(merge_stmt)
+    inserted, updated = cursor.fetchone()
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "skipped": len(batch) - inserted - updated,
+    }
+
+
+def copy_df_to_table(cursor, df: pd.DataFrame, table_name: str):
+    """
+    Serialize a DataFrame into an in-memory CSV buffer and stream it into
+    a table with COPY FROM STDIN on the given cursor. Arrow-backed frames
+    are written by pyarrow's CSV writer.
+    Args:
+        cursor: psycopg2 cursor.
+        df (pd.DataFrame): Rows to copy.
+        table_name (str): Target table.
+    """
+    # Unquoted empty fields are read as NULL by COPY in CSV format
+    if any(is_arrow_backed(df[col]) for col in df.columns):
+        buffer = df_to_csv_bytes(df)
+    else:
+        buffer = StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+    copy_stmt = sql.SQL(
+        "COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    ).format(
+        table=sql.Identifier(table_name),
+        columns=sql.SQL(", ").join(
+            sql.Identifier(col) for col in df.columns
+        ),
+    )
+    cursor.copy_expert(copy_stmt, buffer)
+
+
+def get_conflict_columns(table_name: str) -> list:
+    """
+    Return the columns flagged as unique in the table's SQL schema.
+    """
+    schema = SQLALCHEMY_SCHEMAS.get(table_name, {})
+    return [
+        col_meta["name"]
+        for col_meta in schema.get("columns", [])
+        if col_meta.get("unique", False)
+    ]
+
+
+@contextmanager
+def pooled_connection(engine, raw: bool = False):
+    """
+    Check a connection out of the engine pool, recording how long the
+    caller waited for it, and return it to the pool on exit.
+    Args:
+        engine: SQLAlchemy engine.
+        raw (bool): Yield the DBAPI (psycopg2) connection instead of a
+            SQLAlchemy Connection.
+    Yields:
+        Connection: Pooled connection.
+    """
+    start = time.perf_counter()
+    conn = engine.raw_connection() if raw else engine.connect()
+    pool_stats.record_wait(time.perf_counter() - start)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def log_pool_stats(engine):
+    """
+    Log connection pool checkouts, new connections and checkout wait time.
+    """
+    stats = pool_stats.snapshot()
+    avg_wait_ms = (
+        1000 * stats["wait_seconds"] / stats["waits"]
+        if stats["waits"] else 0.0
+    )
+    logger.info(
+        f"DB pool: {stats['checkouts']} checkouts, "
+        f"{stats['connects']} connections opened, "
+        f"avg wait {avg_wait_ms:.1f}ms, "
+        f"max wait {1000 * stats['max_wait_seconds']:.1f}ms. "
+        f"{engine.pool.status()}"
+    )
+
+
+def get_loader_executor(config: EnvConfig) -> ThreadPoolExecutor:
+    """
+    Return the process-wide executor used to load batches concurrently.
+    It is sized to the connection pool so loader threads never outnumber
+    the available connections.
+    Args:
+        config: Instance of EnvConfig with pool settings.
+    Returns:
+        ThreadPoolExecutor: Long-lived loader executor.
+    """
+    global _loader_executor
+    with _engine_lock:
+        if _loader_executor is None:
+            max_workers = (
+                int(config.db_pool_size) + int(config.db_max_overflow)
+            )
+            _loader_executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="sql-loader"
+            )
+        return _loader_executor
+
+
 def get_postgres_engine(config: EnvConfig):
     """
-    Creates and returns a SQLAlchemy engine for Postgres connection.
+    Returns the process-wide SQLAlchemy engine for Postgres, creating it
+    on first use. Connections are pooled, pre-pinged and recycled so each
+    chunk reuses established (TLS) connections.
+    Args:
+        config: Instance of EnvConfig with connection details.
+    Returns:
+        engine: SQLAlchemy engine
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_postgres_engine(config)
+        return _engine
+
+
+def create_postgres_engine(config: EnvConfig):
+    """
+    Creates and returns a pooled SQLAlchemy engine for Postgres connection.
     Args:
         config: Instance of EnvConfig with connection details.
     Returns:
@@ -90,4 +511,15 @@ def get_postgres_engine(config: EnvConfig):
     if sslmode:
         connect_args["sslmode"] = sslmode
 
-    return create_engine(conn_str, connect_args=connect_args)
+    engine = create_engine(
+        conn_str,
+        connect_args=connect_args,
+        pool_size=int(config.db_pool_size),
+        max_overflow=int(config.db_max_overflow),
+        pool_timeout=int(config.db_pool_timeout),
+        pool_recycle=int(config.db_pool_recycle),
+        pool_pre_ping=True,
+    )
+    event.listen(engine, "connect", pool_stats.record_connect)
+    event.listen(engine, "checkout", pool_stats.record_checkout)
+    return engine
@@ -0,0 +1,508 @@
+import queue
+import threading
+import time
+
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+from src.etl_pipeline.extract.from_storage import (
+    extract_data_from_azure_blob_offsets,
+    extract_data_from_azure_blob_ranges,
+    extract_data_from_azure_blob_stream
+)
+from src.etl_pipeline.load.checkpoints import (
+    finish_checkpoint,
+    load_chunk_with_checkpoint,
+    start_checkpoint
+)
+from src.etl_pipeline.load.to_sql import load_df_to_sql
+from src.etl_pipeline.transform.parallel import transform_chunk
+from src.etl_pipeline.utils.chunk_sizer import create_chunk_sizer
+from src.etl_pipeline.utils.dedup import (
+    get_dedup_index,
+    save_dedup_indexes
+)
+from src.etl_pipeline.utils.metrics import (
+    bind_job_metrics,
+    finish_job_metrics,
+    log_stage_metrics,
+    metrics,
+    start_job_metrics,
+    write_job_report,
+    write_prometheus_textfile
+)
+from src.etl_pipeline.utils.profiling import (
+    finish_job_profile,
+    profile_stage,
+    start_job_profile
+)
+from src.etl_pipeline.utils.utils import (
+    archive_blob,
+    create_blob_client,
+    estimate_chunk_size
+)
+
+logger = get_logger()
+config = EnvConfig()
+
+PIPELINE_MODES = ("sequential", "pipelined")
+
+# Tells a stage worker that no more items will arrive
+_STOP = object()
+
+
+def process_blob(blob_name: str, lease=None) -> dict:
+    """
+    Run the ETL job for one blob: extract, transform and load its chunks,
+    log the job summary and record the outcome on the blob with
+    ARCHIVE_MODE (see archive_blob). Errors are logged and reported in
+    the summary. The per-stage metrics of the job are logged and written
+    with the summary as a JSON job report (see write_job_report), and
+    the METRICS_TEXTFILE is refreshed.
+    While profiling is enabled (main.py --profile) chunks are processed
+    sequentially on this thread, every stage is profiled, and the
+    profile summary is added to the job report.
+    With CHECKPOINTS enabled the job resumes after the last chunk
+    committed by a previous attempt, and a failed blob is left in place
+    for the next attempt until CHECKPOINT_MAX_ATTEMPTS is reached.
+    Args:
+        blob_name (str): Name of the blob in the Azure container.
+        lease (BlobLeaseClient, optional): Lease held on the blob, needed
+            to tag, move or delete it when it is archived.
+    Returns:
+        dict: {"blob", "success", "chunks", "succeeded", "failed", "rows",
+            "destination", "report"}
+    """
+    logger.info(f"----- ETL JOB START: {blob_name} -----")
+    started_at = time.time()
+    job_metrics_recorder = start_job_metrics()
+    job_profiler = start_job_profile()
+
+    success = True
+    chunk_results = []
+    checkpoint = None
+
+    try:
+        chunk_size = estimate_chunk_size()
+        sizer = create_chunk_sizer(chunk_size)
+        if config.checkpoints.lower() in ("1", "true", "yes"):
+            etag = create_blob_client(blob_name).get_blob_properties().etag
+            checkpoint = start_checkpoint(blob_name, etag)
+            if checkpoint.attempts > 1:
+                metrics.count("blob_retries")
+            if checkpoint.status == "success":
+                logger.info(f"Blob '{blob_name}' was already loaded")
+                chunks = iter(())
+            else:
+                chunks = checkpoint.track_offsets(
+                    extract_data_from_azure_blob_offsets(
+                        blob_name, chunk_size, checkpoint.byte_offset, etag,
+                        sizer=sizer,
+                    )
+                )
+        else:
+            extract = (
+                extract_data_from_azure_blob_ranges
+                if int(config.extract_workers) > 1 and job_profiler is None
+                else extract_data_from_azure_blob_stream
+            )
+            chunks = extract(blob_name, chunk_size, sizer=sizer)
+
+        if job_profiler is None:
+            run_chunks(chunks, chunk_results, sizer, checkpoint)
+        else:
+            run_sequential(
+                job_profiler.profile_iter("extract", chunks),
+                chunk_results,
+                sizer,
+                checkpoint,
+            )
+        success = all(r["success"] for r in chunk_results)
+
+    except Exception as e:
+        logger.error(f"ETL job failed for '{blob_name}': {e}")
+        success = False
+
+    if get_dedup_index() is not None:
+        save_dedup_indexes()
+
+    if checkpoint is not None:
+        try:
+            finish_checkpoint(checkpoint, "success" if success else "failed")
+        except Exception as e:
+            logger.error(f"Failed to save checkpoint status: {e}")
+
+    total_chunks = len(chunk_results)
+    succeeded_chunks = sum(r["success"] for r in chunk_results)
+    failed_chunks = total_chunks - succeeded_chunks
+    rows_loaded = sum(r["rows"] for r in chunk_results)
+
+    logger.info(f"----- ETL JOB SUMMARY: {blob_name} -----")
+    logger.info(f"Total chunks processed: {total_chunks}")
+    logger.info(f"Chunks succeeded: {succeeded_chunks}")
+    logger.info(f"Chunks failed: {failed_chunks}")
+    logger.info(f"Rows loaded: {rows_loaded}")
+    logger.info(f"ETL job status: {'SUCCESS' if success else 'FAILURE'}")
+
+    dest_blob_name = blob_name
+    if (
+        not success
+        and checkpoint is not None
+        and checkpoint.attempts < int(config.checkpoint_max_attempts)
+    ):
+        logger.info(
+            f"Leaving '{blob_name}' in place to resume after chunk "
+            f"{checkpoint.chunk_index} (attempt {checkpoint.attempts} of "
+            f"{config.checkpoint_max_attempts})"
+        )
+    else:
+        try:
+            # A resumed blob also counts rows of the earlier attempts
+            rows = checkpoint.rows_loaded if checkpoint else rows_loaded
+            dest_blob_name = archive_blob(
+                blob_name, success, rows, lease=lease
+            )
+        except Exception as e:
+            logger.error(f"Failed to archive blob: {e}")
+
+    summary = {
+        "blob": blob_name,
+        "success": success,
+        "chunks": total_chunks,
+        "succeeded": succeeded_chunks,
+        "failed": failed_chunks,
+        "rows": rows_loaded,
+        "destination": dest_blob_name,
+    }
+    metrics.count("jobs_succeeded" if success else "jobs_failed")
+    job_metrics = finish_job_metrics(job_metrics_recorder)
+    log_stage_metrics(job_metrics["stages"])
+    if job_profiler is not None:
+        try:
+            job_metrics["profile"] = finish_job_profile(
+                job_profiler, blob_name
+            )
+        except Exception as e:
+            logger.error(f"Failed to write the job profile: {e}")
+    finished_at = time.time()
+    # A profiled job always gets its report, which holds the profile
+    summary["report"] = write_job_report(
+        {
+            **summary,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "seconds": finished_at - started_at,
+            **job_metrics,
+        },
+        force=job_profiler is not None,
+    )
+    write_prometheus_textfile()
+
+    logger.info(f"----- ETL JOB END: {blob_name} -----")
+    return summary
+
+
+def run_chunks(chunks, chunk_results: list, sizer=None, checkpoint=None):
+    """
+    Transform and load every extracted chunk using the runner selected
+    with PIPELINE_MODE.
+    Args:
+        chunks (Iterable[pd.DataFrame]): Extracted chunks.
+        chunk_results (list): Receives one {"chunk", "success", "rows"}
+            dict per chunk, also when extraction fails part-way.
+        sizer (AdaptiveChunkSizer, optional): Receives the transform and
+            load measurements and resizes chunks after every load.
+        checkpoint (BlobCheckpoint, optional): Chunks are numbered after
+            its last committed chunk and committed in order with it; the
+            run stops at the first failed chunk.
+    Raises:
+        Exception: Any error raised while extracting chunks.
+    """
+    pipeline_mode = config.pipeline_mode.lower()
+    if pipeline_mode not in PIPELINE_MODES:
+        raise ValueError(
+            f"Unknown PIPELINE_MODE '{pipeline_mode}'. "
+            f"Expected one of: {', '.join(PIPELINE_MODES)}"
+        )
+    if pipeline_mode == "pipelined":
+        run_pipelined(
+            chunks, chunk_results, sizer=sizer, checkpoint=checkpoint
+        )
+    else:
+        run_sequential(chunks, chunk_results, sizer, checkpoint)
+
+
+def run_sequential(chunks, chunk_results: list, sizer=None, checkpoint=None):
+    """
+    Extract, transform and load one chunk at a time.
+    Args:
+        chunks (Iterable[pd.DataFrame]): Extracted chunks.
+        chunk_results (list): Receives one result dict per chunk.
+        sizer (AdaptiveChunkSizer, optional): See run_chunks.
+        checkpoint (BlobCheckpoint, optional): See run_chunks.
+    """
+    first = checkpoint.chunk_index + 1 if checkpoint else 1
+    for i, df_chunk in enumerate(chunks, start=first):
+        chunk_results.append(process_chunk(i, df_chunk, sizer, checkpoint))
+        if checkpoint is not None and checkpoint.failed:
+            break
+
+
+def run_pipelined(
+    chunks,
+    chunk_results: list,
+    transform_workers: int = None,
+    load_workers: int = None,
+    queue_size: int = None,
+    sizer=None,
+    checkpoint=None,
+):
+    """
+    Run extract, transform and load as concurrent stages connected by
+    bounded queues, so storage, CPU and database work overlap. A full
+    queue blocks the stage feeding it, which bounds the chunks in flight
+    to queue_size per queue plus one per worker.
+    Args:
+        chunks (Iterable[pd.DataFrame]): Extracted chunks.
+        chunk_results (list): Receives one result dict per chunk, sorted
+            by chunk number once all stages finish.
+        transform_workers (int, optional): Defaults to TRANSFORM_WORKERS,
+            or TRANSFORM_PROCESSES if greater, so every transform process
+            is kept busy.
+        load_workers (int, optional): Defaults to LOAD_WORKERS.
+        queue_size (int, optional): Defaults to PIPELINE_QUEUE_SIZE.
+        sizer (AdaptiveChunkSizer, optional): See run_chunks.
+        checkpoint (BlobCheckpoint, optional): See run_chunks. Chunks are
+            loaded by a single load worker in chunk order, and extraction
+            stops after the first failed chunk.
+    Raises:
+        Exception: Any error raised while extracting chunks, after the
+            chunks extracted before it have been loaded.
+    """
+    transform_workers = transform_workers or max(
+        int(config.transform_workers), int(config.transform_processes)
+    )
+    load_workers = load_workers or int(config.load_workers)
+    queue_size = queue_size or int(config.pipeline_queue_size)
+    first = checkpoint.chunk_index + 1 if checkpoint else 1
+    if checkpoint is not None:
+        # Checkpointed chunks commit one after another, in order
+        load_workers = 1
+
+    transform_queue = queue.Queue(maxsize=queue_size)
+    load_queue = queue.Queue(maxsize=queue_size)
+    results = []
+    results_lock = threading.Lock()
+    extract_errors = []
+
+    def record(result: dict):
+        with results_lock:
+            results.append(result)
+
+    def extract_stage():
+        try:
+            for i, df_chunk in enumerate(chunks, start=first):
+                if checkpoint is not None and checkpoint.failed:
+                    break
+                transform_queue.put((i, df_chunk))
+        except Exception as e:
+            extract_errors.append(e)
+        finally:
+            for _ in range(transform_workers):
+                transform_queue.put(_STOP)
+
+    def transform_stage():
+        while True:
+            item = transform_queue.get()
+            if item is _STOP:
+                break
+            i, df_chunk = item
+            try:
+                load_queue.put((i, timed_transform(df_chunk, sizer)))
+            except Exception as e:
+                logger.error(f"Chunk {i} failed: {e}")
+                if checkpoint is None:
+                    record({"chunk": i, "success": False, "rows": 0})
+                else:
+                    # The load stage must see every chunk to keep order
+                    load_queue.put((i, None))
+
+    def load_stage():
+        # Chunks that arrived ahead of the next one to commit
+        pending = {}
+        next_chunk = first
+        while True:
+            item = load_queue.get()
+            if item is _STOP:
+                break
+            i, df_chunk_processed = item
+            if checkpoint is None:
+                record(load_chunk(i, df_chunk_processed, sizer))
+                continue
+            pending[i] = df_chunk_processed
+            while next_chunk in pending:
+                record(load_chunk(
+                    next_chunk, pending.pop(next_chunk), sizer, checkpoint
+                ))
+                next_chunk += 1
+        for i, df_chunk_processed in pending.items():
+            release_dedup_keys(df_chunk_processed)
+            record({"chunk": i, "success": False, "rows": 0})
+
+    extractor = _start_stage("extract", extract_stage, 1)
+    transformers = _start_stage(
+        "transform", transform_stage, transform_workers
+    )
+    loaders = _start_stage("load", load_stage, load_workers)
+
+    for thread in extractor + transformers:
+        thread.join()
+    for _ in range(load_workers):
+        load_queue.put(_STOP)
+    for thread in loaders:
+        thread.join()
+
+    chunk_results.extend(sorted(results, key=lambda r: r["chunk"]))
+    if extract_errors:
+        raise extract_errors[0]
+
+
+def process_chunk(i: int, df_chunk, sizer=None, checkpoint=None) -> dict:
+    """
+    Transform and load a single chunk.
+    Args:
+        i (int): Chunk number.
+        df_chunk (pd.DataFrame): Extracted chunk.
+        sizer (AdaptiveChunkSizer, optional): See run_chunks.
+        checkpoint (BlobCheckpoint, optional): See run_chunks.
+    Returns:
+        dict: {"chunk": i, "success": bool, "rows": rows loaded}
+    """
+    try:
+        df_chunk_processed = timed_transform(df_chunk, sizer)
+    except Exception as e:
+        logger.error(f"Chunk {i} failed: {e}")
+        if checkpoint is not None:
+            checkpoint.failed = True
+        return {"chunk": i, "success": False, "rows": 0}
+    return load_chunk(i, df_chunk_processed, sizer, checkpoint)
+
+
+def timed_transform(df_chunk, sizer=None):
+    """
+    Transform a chunk, recording its rows and transform time in the
+    metrics and reporting them to sizer.
+    With DEDUP, rows already loaded, repeated in the chunk or in a chunk
+    not loaded yet are dropped first, and the keys of the transformed
+    rows stay reserved until load_chunk adds or releases them. An empty
+    chunk is returned if no new valid rows remain after
+    rows were dropped, so the chunk does not count as failed.
+    """
+    started = time.perf_counter()
+    dedup = get_dedup_index()
+    with profile_stage("transform"):
+        if dedup is None:
+            df_chunk_processed = transform_chunk(df_chunk)
+        else:
+            rows = dedup.drop_loaded_rows(df_chunk)
+            try:
+                df_chunk_processed = (
+                    None if rows.empty else transform_chunk(rows)
+                )
+            except Exception:
+                dedup.release_untransformed(rows, None)
+                raise
+            # Keys of rows the transform dropped will not be loaded
+            dedup.release_untransformed(rows, df_chunk_processed)
+            if df_chunk_processed is None and len(rows) < len(df_chunk):
+                # The rest of the chunk was loaded before
+                df_chunk_processed = rows.iloc[0:0]
+    seconds = time.perf_counter() - started
+    metrics.record("transform", seconds, rows=len(df_chunk), batches=1)
+    if sizer is not None:
+        sizer.record_transform(len(df_chunk), seconds)
+    return df_chunk_processed
+
+
+def load_chunk(
+    i: int, df_chunk_processed, sizer=None, checkpoint=None
+) -> dict:
+    """
+    Load a transformed chunk into the sales table.
+    Args:
+        i (int): Chunk number.
+        df_chunk_processed (pd.DataFrame): Transformed chunk.
+        sizer (AdaptiveChunkSizer, optional): Receives the load time and
+            resizes the following chunks.
+        checkpoint (BlobCheckpoint, optional): The chunk is committed
+            together with the blob checkpoint.
+    Returns:
+        dict: {"chunk": i, "success": bool, "rows": rows loaded}
+    """
+    try:
+        started = time.perf_counter()
+        if (
+            checkpoint is None
+            and df_chunk_processed is not None
+            and df_chunk_processed.empty
+        ):
+            # Every row was dropped as already loaded
+            logger.info(f"Chunk {i}: no new rows to load")
+            return {"chunk": i, "success": True, "rows": 0}
+        with profile_stage("load"):
+            if checkpoint is not None:
+                load_success = load_chunk_with_checkpoint(
+                    df_chunk_processed, "sales", checkpoint, i, sizer
+                )
+            else:
+                load_success = load_df_to_sql(
+                    df_chunk_processed, "sales", sizer
+                )
+        if sizer is not None and load_success:
+            sizer.record_load(
+                len(df_chunk_processed), time.perf_counter() - started
+            )
+            sizer.update()
+        dedup = get_dedup_index()
+        if dedup is not None and load_success:
+            dedup.add(df_chunk_processed[dedup.key_column])
+        if not load_success:
+            logger.error(f"Chunk {i} failed to load into SQL")
+            release_dedup_keys(df_chunk_processed)
+        return {
+            "chunk": i,
+            "success": load_success,
+            "rows": len(df_chunk_processed) if load_success else 0,
+        }
+    except Exception as e:
+        logger.error(f"Chunk {i} failed: {e}")
+        release_dedup_keys(df_chunk_processed)
+        return {"chunk": i, "success": False, "rows": 0}
+
+
+def release_dedup_keys(df_chunk_processed):
+    """
+    With DEDUP, release the keys reserved for a transformed chunk that
+    is not loaded, so a later chunk may load them. Errors are logged.
+    """
+    try:
+        dedup = get_dedup_index()
+        if dedup is not None and df_chunk_processed is not None:
+            dedup.release(df_chunk_processed[dedup.key_column])
+    except Exception as e:
+        logger.error(f"Error releasing dedup keys: {e}")
+
+
+def _start_stage(name: str, target, workers: int) -> list:
+    """
+    Start the worker threads of a pipeline stage.
+    """
+    threads = [
+        threading.Thread(
+            target=bind_job_metrics(target), name=f"{name}-{n}", daemon=True
+        )
+        for n in range(1, workers + 1)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
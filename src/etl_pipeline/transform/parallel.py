@@ -0,0 +1,94 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import pandas as pd
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+from src.etl_pipeline.transform.sales_data import (
+    init_transform_worker,
+    transform_sales_data
+)
+from src.etl_pipeline.utils.arrow_utils import df_to_ipc, ipc_to_df
+from src.etl_pipeline.utils.metrics import metrics
+from src.etl_pipeline.utils.profiling import profiling_enabled
+
+logger = get_logger()
+config = EnvConfig()
+
+# Process-wide transform pool, created on first use
+_transform_pool = None
+_transform_pool_lock = threading.Lock()
+
+
+def transform_chunk(df_raw: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """
+    Transform a raw sales chunk, in a worker process when
+    TRANSFORM_PROCESSES > 0 or in the calling thread otherwise (always
+    while profiling).
+    Args:
+        df_raw (pd.DataFrame): Extracted chunk.
+    Returns:
+        pd.DataFrame or None: Transformed chunk, as transform_sales_data.
+    """
+    if int(config.transform_processes) <= 0 or profiling_enabled():
+        return transform_sales_data(df_raw)
+
+    # The raw chunk crosses to the worker as one Arrow IPC buffer rather
+    # than pickled one string object at a time; the index goes alongside
+    result, delta = get_transform_pool().submit(
+        _transform_payload,
+        df_to_ipc(df_raw),
+        df_raw.index,
+        config.dataframe_engine.lower() == "arrow",
+    ).result()
+    # Stages timed in the worker (encrypt) count in this process
+    metrics.merge(delta)
+    return result
+
+
+def get_transform_pool() -> ProcessPoolExecutor:
+    """
+    Return the process-wide transform pool with TRANSFORM_PROCESSES
+    workers, each initialized once with the encryption keys.
+    Returns:
+        ProcessPoolExecutor: Long-lived transform pool.
+    """
+    global _transform_pool
+    with _transform_pool_lock:
+        if _transform_pool is None:
+            workers = int(config.transform_processes)
+            # Spawned workers do not inherit locks held by the parent's
+            # extract and load threads
+            _transform_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_transform_worker,
+                initargs=(
+                    config.fernet_key,
+                    config.deterministic_key,
+                    config.lookup_key,
+                ),
+            )
+            logger.info(f"Started transform pool with {workers} processes")
+        return _transform_pool
+
+
+def _transform_payload(buffer, index, arrow_backed: bool) -> tuple:
+    """
+    Worker entry point: rebuild a raw chunk sent with df_to_ipc and
+    transform it.
+    Args:
+        buffer (pyarrow.Buffer): The columns of the chunk.
+        index (pd.Index): The index of the chunk.
+        arrow_backed (bool): Whether the chunk has Arrow-backed columns.
+    Returns:
+        tuple: The transformed chunk (or None) and the metrics it
+            recorded.
+    """
+    before = metrics.snapshot()
+    df_raw = ipc_to_df(buffer, arrow_backed)
+    df_raw.index = index
+    return transform_sales_data(df_raw), metrics.delta(before)
@@ -1,3 +1,4 @@
+import base64
 from typing import Optional
 
 import numpy as np
@@ -5,15 +6,120 @@ import pandas as pd
 from cryptography.fernet import Fernet
 from utils.env_vars import EnvConfig
 from utils.logger import get_logger
-from utils.mapping import ColumnMapper, sales_column_mapping
+from utils.mapping import (
+    ColumnMapper,
+    sales_column_mapping,
+    sales_datetime_formats
+)
 
 from src.etl_pipeline.utils.csv_schemas import CSV_SCHEMAS
+from src.etl_pipeline.utils.encryption import (
+    DeterministicCipher,
+    LookupTokenizer,
+    derive_deterministic_key,
+    derive_lookup_key,
+    get_encrypt_mode,
+    lookup_column
+)
+from src.etl_pipeline.utils.profiling import profile_stage
 from src.etl_pipeline.utils.table_schemas import SALES_SQLALCHEMY_SCHEMA
-from src.etl_pipeline.utils.utils import encrypt_column
+from src.etl_pipeline.utils.utils import (
+    encrypt_column,
+    normalize_string_column
+)
 
 logger = get_logger()
 config = EnvConfig()
 
+# Ciphers shared by every chunk transformed in this process
+_fernet = None
+_deterministic_cipher = None
+_lookup_tokenizer = None
+
+# Mapping plan compiled once and reused for every chunk
+sales_mapper = ColumnMapper(sales_column_mapping, sales_datetime_formats)
+
+
+def get_fernet() -> Optional[Fernet]:
+    """
+    Return the process-wide Fernet instance built from FERNET_KEY, or None
+    if no key is configured.
+    """
+    global _fernet
+    if _fernet is None and config.fernet_key:
+        _fernet = Fernet(config.fernet_key.encode())
+    return _fernet
+
+
+def get_deterministic_cipher() -> Optional[DeterministicCipher]:
+    """
+    Return the process-wide AES-SIV cipher for "deterministic" columns,
+    keyed with DETERMINISTIC_KEY or a key derived from FERNET_KEY. Returns
+    None if neither key is configured.
+    """
+    global _deterministic_cipher
+    if _deterministic_cipher is None:
+        _deterministic_cipher = _build_deterministic_cipher(
+            config.fernet_key, config.deterministic_key
+        )
+    return _deterministic_cipher
+
+
+def get_lookup_tokenizer() -> Optional[LookupTokenizer]:
+    """
+    Return the process-wide HMAC tokenizer for "lookup" columns, keyed
+    with LOOKUP_KEY or a key derived from FERNET_KEY. Returns None if
+    neither key is configured.
+    """
+    global _lookup_tokenizer
+    if _lookup_tokenizer is None:
+        _lookup_tokenizer = _build_lookup_tokenizer(
+            config.fernet_key, config.lookup_key
+        )
+    return _lookup_tokenizer
+
+
+def init_transform_worker(
+    fernet_key: Optional[str],
+    deterministic_key: Optional[str] = None,
+    lookup_key: Optional[str] = None,
+):
+    """
+    Initialize a transform worker process once with the encryption keys,
+    so chunks are transformed without rebuilding the ciphers. The CSV and
+    SQL schemas are loaded with this module.
+    Args:
+        fernet_key (str, optional): 32-byte base64 Fernet key.
+        deterministic_key (str, optional): base64 AES-SIV key.
+        lookup_key (str, optional): base64 HMAC key of lookup tokens.
+    """
+    global _fernet, _deterministic_cipher, _lookup_tokenizer
+    _fernet = Fernet(fernet_key.encode()) if fernet_key else None
+    _deterministic_cipher = _build_deterministic_cipher(
+        fernet_key, deterministic_key
+    )
+    _lookup_tokenizer = _build_lookup_tokenizer(fernet_key, lookup_key)
+
+
+def _build_deterministic_cipher(
+    fernet_key: Optional[str], deterministic_key: Optional[str]
+) -> Optional[DeterministicCipher]:
+    if deterministic_key:
+        return DeterministicCipher(base64.b64decode(deterministic_key))
+    if fernet_key:
+        return DeterministicCipher(derive_deterministic_key(fernet_key))
+    return None
+
+
+def _build_lookup_tokenizer(
+    fernet_key: Optional[str], lookup_key: Optional[str]
+) -> Optional[LookupTokenizer]:
+    if lookup_key:
+        return LookupTokenizer(base64.b64decode(lookup_key))
+    if fernet_key:
+        return LookupTokenizer(derive_lookup_key(fernet_key))
+    return None
+
 
 def transform_sales_data(df_raw: pd.DataFrame) -> Optional[pd.DataFrame]:
     """
@@ -21,12 +127,11 @@ def transform_sales_data(df_raw: pd.DataFrame) -> Optional[pd.DataFrame]:
     Steps:
         1. Validate CSV structure
         2. Apply column mapping
-        3. Handle missing values and defaults
-        4. Encrypt sensitive columns
-        5. Calculate derived columns
-        6. Normalize and standardize
-        7. Filter invalid rows
-        8. Prepare DataFrame for SQL load
+        3. Handle missing values and calculate derived columns
+        4. Normalize and standardize
+        5. Encrypt sensitive columns and compute lookup tokens
+        6. Filter invalid rows
+        7. Prepare DataFrame for SQL load
     """
     if df_raw is None or df_raw.empty:
         logger.warning("Input DataFrame is None or empty. "
@@ -52,8 +157,7 @@ def transform_sales_data(df_raw: pd.DataFrame) -> Optional[pd.DataFrame]:
             logger.warning(f"Unexpected columns in DataFrame: {extra}")
 
         # 2. Apply column mapping
-        mapper = ColumnMapper(sales_column_mapping)
-        df = mapper.apply(df_raw)
+        df = sales_mapper.apply(df_raw)
 
         # 3. Handle missing values and defaults
         df["discount"] = df.get("discount", pd.Series(0)).fillna(0)
@@ -65,15 +169,8 @@ def transform_sales_data(df_raw: pd.DataFrame) -> Optional[pd.DataFrame]:
             )
         )
 
-        # 4. Encrypt columns flagged in SALES_SQLALCHEMY_SCHEMA
-        fernet_key = config.fernet_key  # 32-byte base64
-        fernet = Fernet(fernet_key.encode()) if fernet_key else None
-        for col_meta in SALES_SQLALCHEMY_SCHEMA["columns"]:
-            col = col_meta["name"]
-            if col_meta.get("encrypt", False) and col in df.columns:
-                df[col] = encrypt_column(df[col], fernet)
-
-        # 5. Normalize string columns
+        # 4. Normalize string columns (before encryption, so equal values
+        # give equal deterministic ciphertexts)
         string_cols = [
             col_meta["name"]
             for col_meta in SALES_SQLALCHEMY_SCHEMA["columns"]
@@ -83,10 +180,32 @@ def transform_sales_data(df_raw: pd.DataFrame) -> Optional[pd.DataFrame]:
             )
         ]
         for col in string_cols:
-            df[col] = df[col].astype(str).str.strip().str.lower()
+            df[col] = normalize_string_column(df[col])
+
+        # 5. Encrypt columns flagged in SALES_SQLALCHEMY_SCHEMA; lookup
+        # tokens are taken from the plaintext first
+        ciphers = {
+            "fernet": get_fernet(),
+            "deterministic": get_deterministic_cipher(),
+        }
+        with profile_stage("encrypt"):
+            for col_meta in SALES_SQLALCHEMY_SCHEMA["columns"]:
+                col = col_meta["name"]
+                if col not in df.columns:
+                    continue
+                token_col = lookup_column(col_meta)
+                if token_col:
+                    df[token_col] = encrypt_column(
+                        df[col].rename(token_col), get_lookup_tokenizer()
+                    )
+                mode = get_encrypt_mode(col_meta)
+                if mode:
+                    df[col] = encrypt_column(df[col], ciphers[mode])
 
         # 6. Filter invalid rows
-        df = df[(df["quantity"] > 0) & (df["unit_price"] >= 0)]
+        # Missing values in Arrow-backed columns compare as null; drop them
+        valid = (df["quantity"] > 0) & (df["unit_price"] >= 0)
+        df = df[valid.fillna(False).astype(bool)]
         if df.empty:
             logger.warning("0 rows after validation. No data to load.")
             return None
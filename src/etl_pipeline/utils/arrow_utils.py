@@ -0,0 +1,196 @@
+from io import BufferedReader, BytesIO, RawIOBase
+
+import pandas as pd
+from utils.logger import get_logger
+
+from src.etl_pipeline.utils.csv_schemas import CSV_SCHEMAS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # optional dependency, only needed by the arrow engine
+    pa = None
+
+logger = get_logger()
+
+DATAFRAME_ENGINES = ("pandas", "arrow")
+
+# Bytes of CSV parsed by pyarrow per record batch
+ARROW_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def require_pyarrow():
+    """
+    Raises:
+        RuntimeError: If pyarrow is not installed.
+    """
+    if pa is None:
+        raise RuntimeError(
+            "DATAFRAME_ENGINE=arrow requires pyarrow: pip install pyarrow"
+        )
+
+
+def is_arrow_backed(series: pd.Series) -> bool:
+    """
+    Return True if the Series is backed by a pyarrow array (ArrowDtype).
+    """
+    return isinstance(series.dtype, pd.ArrowDtype)
+
+
+def to_arrow_series(array, index=None, name=None) -> pd.Series:
+    """
+    Wrap a pyarrow array in an ArrowDtype Series without converting it.
+    """
+    return pd.Series(
+        pd.arrays.ArrowExtensionArray(array), index=index, name=name
+    )
+
+
+def read_csv_arrow(stream, chunk_size: int, schema_name: str, sizer=None):
+    """
+    Parse a binary CSV stream with the pyarrow streaming CSV reader and
+    yield DataFrames of chunk_size rows with Arrow-backed columns. Column
+    types come from CSV_SCHEMAS (see get_arrow_type) and columns outside
+    the schema are dropped.
+    Args:
+        stream: Binary file-like object.
+        chunk_size (int): Number of rows per chunk.
+        schema_name (str): Key in CSV_SCHEMAS describing the columns.
+        sizer (AdaptiveChunkSizer, optional): If given, its current
+            chunk_size is used for every chunk instead of chunk_size.
+    Yields:
+        pd.DataFrame: DataFrame containing up to chunk_size rows.
+    """
+    require_pyarrow()
+    if isinstance(stream, RawIOBase):
+        # A raw stream may return fewer bytes than asked for, and pyarrow
+        # cannot infer the columns from a first read that ends inside the
+        # header; a buffered reader fills each read of a block
+        stream = BufferedReader(stream, buffer_size=ARROW_BLOCK_SIZE)
+    schema = CSV_SCHEMAS[schema_name]
+    column_types = {
+        col: get_arrow_type(meta) for col, meta in schema.items()
+    }
+    reader = pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(
+            block_size=ARROW_BLOCK_SIZE, encoding="utf8"
+        ),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types),
+    )
+    columns = [name for name in reader.schema.names if name in schema]
+    dropped = [name for name in reader.schema.names if name not in schema]
+    if dropped:
+        logger.warning(f"Dropping unexpected CSV columns: {dropped}")
+
+    batches = []
+    buffered_rows = 0
+    size = sizer.chunk_size if sizer else chunk_size
+    for batch in reader:
+        batches.append(batch.select(columns))
+        buffered_rows += batch.num_rows
+        while buffered_rows >= size:
+            table = pa.Table.from_batches(batches)
+            yield arrow_table_to_df(table.slice(0, size))
+            rest = table.slice(size)
+            batches = rest.to_batches()
+            buffered_rows = rest.num_rows
+            size = sizer.chunk_size if sizer else chunk_size
+    if buffered_rows:
+        yield arrow_table_to_df(pa.Table.from_batches(batches))
+
+
+def get_arrow_type(meta: dict):
+    """
+    Return the Arrow type of a CSV_SCHEMAS column: strings (dictionary
+    encoded when flagged "category") or float64 for numeric columns, so
+    columns that are empty in a chunk are not inferred as null.
+    """
+    if meta["type"] is str:
+        if meta.get("category", False):
+            return pa.dictionary(pa.int32(), pa.string())
+        return pa.string()
+    return pa.float64()
+
+
+def arrow_table_to_df(table) -> pd.DataFrame:
+    """
+    Convert a pyarrow Table to pandas keeping Arrow-backed columns;
+    dictionary-encoded columns become pandas categoricals.
+    """
+    return table.to_pandas(
+        types_mapper=lambda t: (
+            None if pa.types.is_dictionary(t) else pd.ArrowDtype(t)
+        )
+    )
+
+
+def parse_datetime_arrow(values: pd.Series, fmt: str):
+    """
+    Parse an Arrow-backed string column with a strptime format.
+    Returns:
+        pyarrow.Array: timestamp[us] values.
+    """
+    array = pa.array(values.array)
+    return pc.strptime(array, format=fmt, unit="us")
+
+
+def split_datetime_arrow(timestamps, index=None) -> tuple:
+    """
+    Split timestamps into Arrow date32 and time64 Series.
+    Args:
+        timestamps: pyarrow timestamp Array or datetime64 Series.
+        index: Index of the resulting Series.
+    Returns:
+        tuple: (dates, times) ArrowDtype Series.
+    """
+    if isinstance(timestamps, pd.Series):
+        timestamps = pa.array(timestamps, type=pa.timestamp("us"))
+    dates = pc.cast(timestamps, pa.date32())
+    times = pc.cast(timestamps, pa.time64("us"))
+    return to_arrow_series(dates, index), to_arrow_series(times, index)
+
+
+def df_to_csv_bytes(df: pd.DataFrame) -> BytesIO:
+    """
+    Write a DataFrame as headerless CSV with pyarrow's C++ writer, without
+    converting Arrow-backed columns to Python objects. Nulls are written
+    as unquoted empty fields.
+    Returns:
+        BytesIO: Buffer positioned at the start.
+    """
+    buffer = BytesIO()
+    pa_csv.write_csv(
+        pa.Table.from_pandas(df, preserve_index=False),
+        buffer,
+        write_options=pa_csv.WriteOptions(include_header=False),
+    )
+    buffer.seek(0)
+    return buffer
+
+
+def df_to_ipc(df: pd.DataFrame):
+    """
+    Serialize the columns of a DataFrame as an Arrow IPC stream: every
+    column is written as its contiguous Arrow buffers, also object
+    string columns, and pandas dtypes are kept in the schema metadata.
+    The index is not included.
+    Returns:
+        pyarrow.Buffer: The stream, for ipc_to_df.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def ipc_to_df(buffer, arrow_backed: bool) -> pd.DataFrame:
+    """
+    Rebuild a DataFrame written by df_to_ipc, reading the Arrow buffers
+    in place. Arrow-backed chunks (DATAFRAME_ENGINE=arrow) are converted
+    as read_csv_arrow does, others with the pandas dtypes they had.
+    """
+    table = pa.ipc.open_stream(buffer).read_all()
+    return arrow_table_to_df(table) if arrow_backed else table.to_pandas()
@@ -0,0 +1,278 @@
+import threading
+
+import psutil
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+logger = get_logger()
+config = EnvConfig()
+
+# Weight of the newest measurement in the moving averages
+SMOOTHING = 0.3
+
+# Largest factor a single decision may grow or shrink a size by
+MAX_STEP = 2.0
+
+
+class AdaptiveChunkSizer:
+    """
+    Feedback controller for the extract chunk size and the load batch
+    size. The pipeline stages report what each chunk cost (rows, bytes,
+    seconds) and the process RSS is sampled at every report. After each
+    loaded chunk the next chunk size is recomputed as the smaller of:
+        - the rows that keep the peak RSS under memory_limit, scaling the
+          memory growth observed per row of the largest chunk in flight;
+        - the rows the slowest stage processes in target_chunk_seconds.
+    The batch size is scaled so a load batch takes about
+    target_batch_seconds. Each decision changes a size by at most
+    MAX_STEP times and is clamped to the configured bounds. Thread-safe:
+    stages running in different threads may report concurrently.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        batch_size: int,
+        min_chunk_size: int,
+        max_chunk_size: int,
+        min_batch_size: int,
+        max_batch_size: int,
+        memory_limit: int,
+        target_chunk_seconds: float,
+        target_batch_seconds: float,
+    ):
+        """
+        Args:
+            chunk_size (int): Initial rows per chunk.
+            batch_size (int): Initial rows per load batch.
+            min_chunk_size (int): Lower bound of the chunk size.
+            max_chunk_size (int): Upper bound of the chunk size.
+            min_batch_size (int): Lower bound of the batch size.
+            max_batch_size (int): Upper bound of the batch size.
+            memory_limit (int): Target ceiling of the process RSS in bytes.
+            target_chunk_seconds (float): Target time of the slowest stage
+                per chunk.
+            target_batch_seconds (float): Target time per load batch.
+        """
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.memory_limit = memory_limit
+        self.target_chunk_seconds = target_chunk_seconds
+        self.target_batch_seconds = target_batch_seconds
+
+        self._lock = threading.Lock()
+        self._process = psutil.Process()
+        self._baseline_rss = self._process.memory_info().rss
+        self._chunk_size = _clamp(chunk_size, min_chunk_size, max_chunk_size)
+        self._batch_size = _clamp(batch_size, min_batch_size, max_batch_size)
+
+        # Moving averages of the measurements
+        self.bytes_per_row = None
+        self.stage_rows_per_second = {}
+        self.batch_rows_per_second = None
+
+        # Measurements since the last decision
+        self._peak_rss = self._baseline_rss
+        self._max_rows = 0
+        self.decisions = 0
+
+    @property
+    def chunk_size(self) -> int:
+        with self._lock:
+            return self._chunk_size
+
+    @property
+    def batch_size(self) -> int:
+        with self._lock:
+            return self._batch_size
+
+    def record_extract(self, rows: int, bytes_read: int, seconds: float):
+        """
+        Report an extracted chunk: its rows, the CSV bytes it was parsed
+        from and the parse time.
+        """
+        with self._lock:
+            if rows and bytes_read:
+                self.bytes_per_row = _average(
+                    self.bytes_per_row, bytes_read / rows
+                )
+            self._max_rows = max(self._max_rows, rows)
+            self._record_stage("extract", rows, seconds)
+
+    def record_transform(self, rows: int, seconds: float):
+        """
+        Report a transformed chunk (input rows and transform time).
+        """
+        with self._lock:
+            self._record_stage("transform", rows, seconds)
+
+    def record_load(self, rows: int, seconds: float):
+        """
+        Report a loaded chunk (rows and load time).
+        """
+        with self._lock:
+            self._record_stage("load", rows, seconds)
+
+    def record_batches(self, rows: list, seconds: list):
+        """
+        Report the rows and duration of each load batch of a chunk.
+        """
+        total_seconds = sum(seconds)
+        if not total_seconds:
+            return
+        with self._lock:
+            self.batch_rows_per_second = _average(
+                self.batch_rows_per_second, sum(rows) / total_seconds
+            )
+
+    def update(self) -> int:
+        """
+        Recompute the chunk and batch sizes from the measurements since
+        the previous decision and log the decision.
+        Returns:
+            int: The new chunk size.
+        """
+        with self._lock:
+            self._sample_rss()
+            if not self._max_rows:
+                return self._chunk_size
+
+            # Memory: assume RSS above the baseline grows linearly with
+            # the chunk size. Never assume less than the CSV bytes per row.
+            growth_per_row = max(
+                (self._peak_rss - self._baseline_rss) / self._max_rows,
+                self.bytes_per_row or 1,
+            )
+            memory_rows = int(
+                max(self.memory_limit - self._baseline_rss, 0)
+                / growth_per_row
+            )
+
+            # Throughput: rows the bottleneck stage handles in the target
+            # time per chunk
+            rates = self.stage_rows_per_second
+            bottleneck = min(rates, key=rates.get, default=None)
+            bottleneck_rate = rates.get(bottleneck, 0.0)
+            time_rows = (
+                int(bottleneck_rate * self.target_chunk_seconds)
+                if bottleneck else self.max_chunk_size
+            )
+
+            previous = self._chunk_size
+            target = min(memory_rows, time_rows)
+            self._chunk_size = _clamp(
+                _step(previous, target), self.min_chunk_size,
+                self.max_chunk_size,
+            )
+
+            previous_batch = self._batch_size
+            if self.batch_rows_per_second:
+                batch_target = int(
+                    self.batch_rows_per_second * self.target_batch_seconds
+                )
+                self._batch_size = _clamp(
+                    _step(previous_batch, batch_target),
+                    self.min_batch_size, self.max_batch_size,
+                )
+
+            self.decisions += 1
+            logger.info(
+                f"Chunk sizing #{self.decisions}: chunk {previous} -> "
+                f"{self._chunk_size} rows, batch {previous_batch} -> "
+                f"{self._batch_size} rows "
+                f"(peak RSS {self._peak_rss // 1024**2}MB of "
+                f"{self.memory_limit // 1024**2}MB limit, "
+                f"{growth_per_row:.0f} B/row in memory, "
+                f"{self.bytes_per_row or 0:.0f} B/row in CSV, "
+                f"memory allows {memory_rows} rows; "
+                f"bottleneck {bottleneck} at {bottleneck_rate:.0f} rows/s "
+                f"allows {time_rows} rows; "
+                + ", ".join(
+                    f"{stage} {rate:.0f} rows/s"
+                    for stage, rate in rates.items()
+                )
+                + ")"
+            )
+
+            self._peak_rss = self._process.memory_info().rss
+            self._max_rows = 0
+            return self._chunk_size
+
+    def _record_stage(self, stage: str, rows: int, seconds: float):
+        """
+        Update the rows/second average of a stage and sample the RSS.
+        Must be called with the lock held.
+        """
+        if rows and seconds > 0:
+            self.stage_rows_per_second[stage] = _average(
+                self.stage_rows_per_second.get(stage), rows / seconds
+            )
+        self._sample_rss()
+
+    def _sample_rss(self):
+        self._peak_rss = max(
+            self._peak_rss, self._process.memory_info().rss
+        )
+
+
+def create_chunk_sizer(chunk_size: int):
+    """
+    Create an AdaptiveChunkSizer from the environment if ADAPTIVE_CHUNKING
+    is enabled.
+    Args:
+        chunk_size (int): Initial chunk size, e.g. from estimate_chunk_size.
+    Returns:
+        AdaptiveChunkSizer or None: None when adaptive chunking is off.
+    """
+    if config.adaptive_chunking.lower() not in ("1", "true", "yes"):
+        return None
+
+    if config.memory_limit_mb:
+        memory_limit = int(config.memory_limit_mb) * 1024**2
+    else:
+        # Current RSS plus half of the memory still available
+        memory_limit = (
+            psutil.Process().memory_info().rss
+            + psutil.virtual_memory().available // 2
+        )
+    sizer = AdaptiveChunkSizer(
+        chunk_size=chunk_size,
+        batch_size=int(config.batch_size),
+        min_chunk_size=int(config.chunk_size_min),
+        max_chunk_size=int(config.chunk_size_max),
+        min_batch_size=int(config.batch_size_min),
+        max_batch_size=int(config.batch_size_max),
+        memory_limit=memory_limit,
+        target_chunk_seconds=float(config.target_chunk_seconds),
+        target_batch_seconds=float(config.target_batch_seconds),
+    )
+    logger.info(
+        f"Adaptive chunking enabled: chunk {sizer.chunk_size} rows "
+        f"[{sizer.min_chunk_size}, {sizer.max_chunk_size}], batch "
+        f"{sizer.batch_size} rows [{sizer.min_batch_size}, "
+        f"{sizer.max_batch_size}], memory limit "
+        f"{memory_limit // 1024**2}MB"
+    )
+    return sizer
+
+
+def _average(current, value: float) -> float:
+    """
+    Exponential moving average; the first value seeds it.
+    """
+    if current is None:
+        return value
+    return (1 - SMOOTHING) * current + SMOOTHING * value
+
+
+def _step(current: int, target: int) -> int:
+    """
+    Move from current toward target by at most MAX_STEP times.
+    """
+    return int(min(max(target, current / MAX_STEP), current * MAX_STEP))
+
+
+def _clamp(value: int, lower: int, upper: int) -> int:
+    return max(lower, min(int(value), upper))
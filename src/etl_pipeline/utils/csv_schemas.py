@@ -1,14 +1,23 @@
+# Expected CSV columns. Optional keys used when parsing:
+#   "category": read the column as a pandas category (low cardinality)
+#   "downcast": narrowest numeric kind allowed ("integer" or "float").
+#       Monetary columns stay float64, as float32 rounding would change
+#       the computed totals.
 CSV_SCHEMAS = {
     "sales": {
         "transaction_id": {"type": str, "required": True},
-        "customer_id": {"type": str, "required": True},
-        "product_id": {"type": str, "required": True},
-        "store_id": {"type": str, "required": True},
-        "quantity": {"type": (int, float), "required": True},
+        "customer_id": {"type": str, "required": True, "category": True},
+        "product_id": {"type": str, "required": True, "category": True},
+        "store_id": {"type": str, "required": True, "category": True},
+        "quantity": {
+            "type": (int, float), "required": True, "downcast": "integer"
+        },
         "unit_price": {"type": (int, float), "required": True},
         "discount": {"type": (float, int), "required": False},
         "total_amount": {"type": (float, int), "required": False},
-        "payment_method": {"type": str, "required": True},
+        "payment_method": {
+            "type": str, "required": True, "category": True
+        },
         "timestamp": {"type": str, "required": True},
     },
     "suppliers": {},
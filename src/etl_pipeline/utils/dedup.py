@@ -0,0 +1,528 @@
+import json
+import math
+import struct
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+from utils.mapping import sales_column_mapping
+
+from src.etl_pipeline.load.to_sql import (
+    get_conflict_columns,
+    get_postgres_engine
+)
+from src.etl_pipeline.utils.metrics import metrics
+from src.etl_pipeline.utils.utils import normalize_string_column
+
+logger = get_logger()
+config = EnvConfig()
+
+DEDUP_TABLE = "etl_dedup_filters"
+
+# Seeds of the two independent 64-bit hashes combined by double hashing
+HASH_KEYS = ("etl-dedup-hash-1", "etl-dedup-hash-2")
+
+# Each new slice holds GROWTH times the keys of the previous one, with
+# TIGHTENING times its false positive rate, so the total rate stays under
+# the configured one however many slices are added
+GROWTH = 2
+TIGHTENING = 0.9
+
+# Keys hashed to bit positions at a time, bounding the temporary arrays
+HASH_BATCH = 65536
+
+# Creates the row of a table with an empty filter, so the first save of
+# concurrent workers already has a row to lock
+CREATE_SQL = text(
+    f"INSERT INTO {DEDUP_TABLE} (name, filter) VALUES (:name, :filter) "
+    "ON CONFLICT (name) DO NOTHING"
+)
+
+LOAD_SQL = text(
+    f"SELECT filter FROM {DEDUP_TABLE} WHERE name = :name FOR UPDATE"
+)
+
+SAVE_SQL = text(
+    f"INSERT INTO {DEDUP_TABLE} (name, filter, keys_added) "
+    "VALUES (:name, :filter, :keys_added) "
+    "ON CONFLICT (name) DO UPDATE SET filter = EXCLUDED.filter, "
+    "keys_added = EXCLUDED.keys_added, updated_at = CURRENT_TIMESTAMP"
+)
+
+# Process-wide indexes by table, warmed on first use
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+class BloomSlice:
+    """
+    Fixed-size Bloom filter over pre-hashed keys, with num_hashes bit
+    positions per key derived by double hashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, bits=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = slice_bits(capacity, error_rate)
+        self.num_hashes = max(
+            1, round(self.num_bits / capacity * math.log(2))
+        )
+        self.bits = (
+            np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+            if bits is None else bits
+        )
+        self.count = 0
+
+    def _positions(self, h1: np.ndarray, h2: np.ndarray):
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        # uint64 arithmetic wraps around, as double hashing expects
+        positions = (h1[:, None] + steps * h2[:, None]) % np.uint64(
+            self.num_bits
+        )
+        return positions >> np.uint64(3), np.left_shift(
+            np.uint8(1), (positions & np.uint64(7)).astype(np.uint8)
+        )
+
+    def contains(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        found = np.empty(len(h1), dtype=bool)
+        for start in range(0, len(h1), HASH_BATCH):
+            end = start + HASH_BATCH
+            byte_index, mask = self._positions(h1[start:end], h2[start:end])
+            found[start:end] = (
+                (self.bits[byte_index] & mask) != 0
+            ).all(axis=1)
+        return found
+
+    def add(self, h1: np.ndarray, h2: np.ndarray):
+        for start in range(0, len(h1), HASH_BATCH):
+            end = start + HASH_BATCH
+            byte_index, mask = self._positions(h1[start:end], h2[start:end])
+            np.bitwise_or.at(self.bits, byte_index.ravel(), mask.ravel())
+        self.count += len(h1)
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that adds a larger slice whenever the current one is
+    full, so it never needs to know the number of keys in advance. A key
+    is a probable member if any slice contains it: there are no false
+    negatives, and false positives stay under error_rate. Once the slices
+    would exceed max_bytes, the last slice keeps taking keys and the
+    false positive rate rises instead of the memory.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, max_bytes: int):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.slices = []
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.bits.nbytes for s in self.slices)
+
+    @property
+    def count(self) -> int:
+        return sum(s.count for s in self.slices)
+
+    def _slice_params(self, index: int) -> tuple:
+        return (
+            self.capacity * GROWTH ** index,
+            self.error_rate * (1 - TIGHTENING) * TIGHTENING ** index,
+        )
+
+    def contains(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(h1), dtype=bool)
+        for bloom_slice in self.slices:
+            unknown = ~found
+            if not unknown.any():
+                break
+            found[unknown] = bloom_slice.contains(h1[unknown], h2[unknown])
+        return found
+
+    def add(self, h1: np.ndarray, h2: np.ndarray):
+        """
+        Add keys that are not probable members yet.
+        """
+        new = ~self.contains(h1, h2)
+        h1, h2 = h1[new], h2[new]
+        while len(h1):
+            if not self.slices or self._is_full(self.slices[-1]):
+                self._add_slice()
+            current = self.slices[-1]
+            room = max(current.capacity - current.count, 0) or len(h1)
+            current.add(h1[:room], h2[:room])
+            h1, h2 = h1[room:], h2[room:]
+
+    def _is_full(self, bloom_slice: BloomSlice) -> bool:
+        if bloom_slice.count < bloom_slice.capacity:
+            return False
+        capacity, error_rate = self._slice_params(len(self.slices))
+        next_bytes = slice_bits(capacity, error_rate) // 8
+        # Keep filling the last slice rather than exceed max_bytes
+        return self.nbytes + next_bytes <= self.max_bytes
+
+    def _add_slice(self):
+        capacity, error_rate = self._slice_params(len(self.slices))
+        self.slices.append(BloomSlice(capacity, error_rate))
+        logger.info(
+            f"Dedup filter slice {len(self.slices)}: {capacity} keys at "
+            f"{error_rate:.2e} false positives "
+            f"({self.nbytes // 1024**2}MB in total)"
+        )
+
+    def merge(self, other: "ScalableBloomFilter"):
+        """
+        Union with a filter built with the same capacity and error rate:
+        slices are ORed pairwise and slices only other has are adopted.
+        The key counts become the larger of the two.
+        Raises:
+            ValueError: If the filters were built with other parameters.
+        """
+        if (other.capacity, other.error_rate) != (
+            self.capacity, self.error_rate
+        ):
+            raise ValueError(
+                f"Cannot merge a filter of {other.capacity} keys at "
+                f"{other.error_rate} into one of {self.capacity} keys at "
+                f"{self.error_rate}"
+            )
+        for index, other_slice in enumerate(other.slices):
+            if index < len(self.slices):
+                own = self.slices[index]
+                np.bitwise_or(own.bits, other_slice.bits, out=own.bits)
+                own.count = max(own.count, other_slice.count)
+            else:
+                self.slices.append(other_slice)
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "slices": [s.count for s in self.slices],
+        }).encode()
+        return b"".join(
+            [struct.pack(">I", len(header)), header]
+            + [s.bits.tobytes() for s in self.slices]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes, max_bytes: int) -> "ScalableBloomFilter":
+        (header_size,) = struct.unpack_from(">I", data)
+        header = json.loads(data[4:4 + header_size])
+        bloom = cls(header["capacity"], header["error_rate"], max_bytes)
+        offset = 4 + header_size
+        for count in header["slices"]:
+            capacity, error_rate = bloom._slice_params(len(bloom.slices))
+            size = (slice_bits(capacity, error_rate) + 7) // 8
+            bits = np.frombuffer(
+                data, dtype=np.uint8, count=size, offset=offset
+            ).copy()
+            bloom_slice = BloomSlice(capacity, error_rate, bits)
+            bloom_slice.count = count
+            bloom.slices.append(bloom_slice)
+            offset += size
+        return bloom
+
+
+class DedupIndex:
+    """
+    Persistent membership index of the keys loaded into a table, used to
+    drop rows that are already loaded before they are transformed. The
+    Bloom filter is kept in memory and saved to etl_dedup_filters; it
+    only ever answers "maybe loaded", so every probable duplicate is
+    confirmed against the table and false positives are kept. Keys are
+    added only after their rows were committed; until then the keys of
+    every chunk that passed the check are reserved, so a concurrent or
+    later chunk repeating them is dropped as well. Thread-safe.
+    """
+
+    def __init__(self, table_name: str, key_column: str, csv_column: str):
+        self.table_name = table_name
+        self.key_column = key_column
+        self.csv_column = csv_column
+        # Rows already loaded must reach the table to be updated
+        self.updates_rows = (
+            config.load_method.lower() == "merge"
+            and config.merge_on_conflict.lower() == "update"
+        )
+        self.bloom = ScalableBloomFilter(
+            int(config.dedup_capacity),
+            float(config.dedup_error_rate),
+            int(config.dedup_max_mb) * 1024**2,
+        )
+        self.keys_added = 0
+        self._lock = threading.Lock()
+        # Keys of chunks that passed the check and are not loaded yet
+        self._reserved = set()
+        # Rows dropped, by reason, since the index was created
+        self.stats = {
+            "in_chunk": 0, "in_flight": 0, "loaded": 0, "false_positives": 0
+        }
+        self._confirm_sql = text(
+            f"SELECT {key_column} FROM {table_name} "
+            f"WHERE {key_column} = ANY(:keys)"
+        )
+
+    def drop_loaded_rows(self, df_raw: pd.DataFrame) -> pd.DataFrame:
+        """
+        Drop rows of a raw chunk whose key repeats an earlier row of the
+        chunk, a row of a chunk not loaded yet, or is already in the
+        table. Keys are compared as the transform stores them (stripped
+        and lowercased). The keys of the remaining rows are reserved
+        until they are added (see add) or released (see release and
+        release_untransformed). With LOAD_METHOD=merge and
+        MERGE_ON_CONFLICT=update only the last row of each key in the
+        chunk is kept, and no key is reserved or dropped as loaded.
+        Args:
+            df_raw (pd.DataFrame): Extracted chunk.
+        Returns:
+            pd.DataFrame: The remaining rows, possibly none.
+        """
+        if df_raw is None or self.csv_column not in df_raw.columns:
+            return df_raw
+        keys = self.raw_keys(df_raw)
+
+        # Duplicates within the chunk: keep the row that would be stored
+        unique = ~pd.Series(keys).duplicated(
+            keep="last" if self.updates_rows else "first"
+        ).to_numpy()
+        keys = keys[unique]
+        if self.updates_rows:
+            maybe = np.zeros(len(keys), dtype=bool)
+            in_flight = np.zeros(len(keys), dtype=bool)
+        else:
+            h1, h2 = hash_keys(keys)
+            with self._lock:
+                maybe = self.bloom.contains(h1, h2)
+                # Checked and reserved at once, so of two chunks with a
+                # key only the first one keeps it
+                in_flight = np.fromiter(
+                    (key in self._reserved for key in keys),
+                    dtype=bool,
+                    count=len(keys),
+                )
+                self._reserved.update(keys[~in_flight].tolist())
+
+        loaded = np.zeros(len(keys), dtype=bool)
+        check = maybe & ~in_flight
+        if check.any():
+            try:
+                confirmed = self._find_loaded_keys(keys[check].tolist())
+            except Exception:
+                self.release(keys[~in_flight])
+                raise
+            loaded[check] = [key in confirmed for key in keys[check]]
+            self.release(keys[loaded])
+
+        keep = np.flatnonzero(unique)[~(loaded | in_flight)]
+        dropped = {
+            "in_chunk": len(df_raw) - len(keys),
+            "in_flight": int(in_flight.sum()),
+            "loaded": int(loaded.sum()),
+            "false_positives": int(check.sum() - loaded.sum()),
+        }
+        with self._lock:
+            for reason, rows in dropped.items():
+                self.stats[reason] += rows
+        for reason, rows in dropped.items():
+            metrics.count(f"dedup_{reason}", rows)
+        total = len(df_raw) - len(keep)
+        if total:
+            logger.info(
+                f"Dedup dropped {total} of {len(df_raw)} rows "
+                f"({dropped['in_chunk']} repeated in the chunk, "
+                f"{dropped['in_flight']} in chunks not loaded yet, "
+                f"{dropped['loaded']} already in {self.table_name}; "
+                f"{dropped['false_positives']} filter false positives kept)"
+            )
+        if len(keep) == len(df_raw):
+            return df_raw
+        return df_raw.iloc[keep]
+
+    def _find_loaded_keys(self, keys: list) -> set:
+        with get_postgres_engine(config).connect() as conn:
+            rows = conn.execute(self._confirm_sql, {"keys": keys})
+            return {row[0] for row in rows}
+
+    def raw_keys(self, df_raw: pd.DataFrame) -> np.ndarray:
+        """
+        Return the keys of a raw chunk as the transform stores them.
+        """
+        keys = normalize_string_column(df_raw[self.csv_column])
+        return np.asarray(keys.astype(str), dtype=object)
+
+    def add(self, keys: pd.Series):
+        """
+        Record the keys of committed rows, as loaded (already normalized),
+        and release their reservation.
+        """
+        keys = np.asarray(keys.astype(str), dtype=object)
+        h1, h2 = hash_keys(keys)
+        with self._lock:
+            self.bloom.add(h1, h2)
+            self._reserved.difference_update(keys.tolist())
+            self.keys_added += len(keys)
+
+    def release(self, keys):
+        """
+        Release the reservation of keys (already normalized) whose rows
+        will not be loaded, so a later chunk may load them.
+        """
+        with self._lock:
+            self._reserved.difference_update(
+                np.asarray(keys, dtype=str).tolist()
+            )
+
+    def release_untransformed(self, df_raw: pd.DataFrame, df_processed):
+        """
+        Release the keys of rows returned by drop_loaded_rows that the
+        transform dropped, or of all of them if df_processed is None.
+        """
+        if df_raw is None or self.updates_rows:
+            return
+        if self.csv_column not in df_raw.columns:
+            return
+        keys = set(self.raw_keys(df_raw).tolist())
+        if df_processed is not None:
+            keys -= set(df_processed[self.key_column].astype(str))
+        if keys:
+            self.release(list(keys))
+
+    def warm(self):
+        """
+        Load the saved filter, if any. A filter saved with other DEDUP_*
+        settings is used with its own capacity and error rate.
+        """
+        with get_postgres_engine(config).begin() as conn:
+            row = conn.execute(LOAD_SQL, {"name": self.table_name}).first()
+        if row is None:
+            logger.info(f"No saved dedup filter for {self.table_name}")
+            return
+        stored = ScalableBloomFilter.from_bytes(
+            bytes(row[0]), self.bloom.max_bytes
+        )
+        with self._lock:
+            self.bloom = stored
+        logger.info(
+            f"Dedup filter for {self.table_name} warmed: ~"
+            f"{self.bloom.count} keys in {len(self.bloom.slices)} slices "
+            f"({self.bloom.nbytes // 1024**2}MB)"
+        )
+
+    def save(self):
+        """
+        Save the filter, merged with the one saved by other workers since
+        it was loaded, under a row lock. The row is created first if it
+        does not exist, so two workers saving for the first time do not
+        overwrite each other's filter.
+        """
+        empty = ScalableBloomFilter(
+            self.bloom.capacity, self.bloom.error_rate, self.bloom.max_bytes
+        )
+        with get_postgres_engine(config).begin() as conn:
+            conn.execute(
+                CREATE_SQL,
+                {"name": self.table_name, "filter": empty.to_bytes()},
+            )
+            row = conn.execute(LOAD_SQL, {"name": self.table_name}).first()
+            with self._lock:
+                if row is not None:
+                    try:
+                        self.bloom.merge(
+                            ScalableBloomFilter.from_bytes(
+                                bytes(row[0]), self.bloom.max_bytes
+                            )
+                        )
+                    except ValueError as e:
+                        logger.warning(f"Replacing saved dedup filter: {e}")
+                data = self.bloom.to_bytes()
+                count = self.bloom.count
+            conn.execute(
+                SAVE_SQL,
+                {
+                    "name": self.table_name,
+                    "filter": data,
+                    "keys_added": count,
+                },
+            )
+        logger.info(
+            f"Dedup filter for {self.table_name} saved: ~{count} keys "
+            f"({len(data) // 1024**2}MB); dropped so far: {self.stats}"
+        )
+
+
+def slice_bits(capacity: int, error_rate: float) -> int:
+    """
+    Bits of a Bloom filter holding capacity keys at error_rate.
+    """
+    return max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+
+
+def hash_keys(keys: np.ndarray) -> tuple:
+    """
+    Hash string keys with two independent, process-independent 64-bit
+    hashes. The second is made odd so its multiples cover every bit.
+    """
+    h1 = pd.util.hash_array(keys, hash_key=HASH_KEYS[0], categorize=False)
+    h2 = pd.util.hash_array(keys, hash_key=HASH_KEYS[1], categorize=False)
+    return h1, h2 | np.uint64(1)
+
+
+def get_dedup_index(table_name: str = "sales"):
+    """
+    Return the process-wide DedupIndex of a table, warmed from the saved
+    filter on first use, or None if DEDUP is disabled.
+    Args:
+        table_name (str): Table whose unique key is indexed.
+    Returns:
+        DedupIndex or None
+    Raises:
+        ValueError: If the table has no single-column unique key.
+    """
+    if config.dedup.lower() not in ("1", "true", "yes"):
+        return None
+    with _indexes_lock:
+        if table_name not in _indexes:
+            keys = get_conflict_columns(table_name)
+            if len(keys) != 1:
+                raise ValueError(
+                    f"DEDUP needs a single unique column in {table_name}, "
+                    f"found {keys}"
+                )
+            csv_column = next(
+                (
+                    csv_col
+                    for csv_col, sql_col in sales_column_mapping.items()
+                    if sql_col == keys[0]
+                ),
+                keys[0],
+            )
+            index = DedupIndex(table_name, keys[0], csv_column)
+            try:
+                index.warm()
+            except Exception as e:
+                logger.warning(
+                    f"Starting with an empty dedup filter for "
+                    f"{table_name}: {e}"
+                )
+            _indexes[table_name] = index
+        return _indexes[table_name]
+
+
+def save_dedup_indexes():
+    """
+    Save every dedup index used by this process. Errors are logged.
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        try:
+            index.save()
+        except Exception as e:
+            logger.error(
+                f"Error saving dedup filter for {index.table_name}: {e}"
+            )
@@ -0,0 +1,144 @@
+import base64
+import hashlib
+import hmac
+from typing import Optional
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESSIV
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Encryption modes accepted in the "encrypt" key of SQL schema columns
+ENCRYPT_MODES = ("fernet", "deterministic")
+
+# Ciphertexts kept per column before the deterministic cache is reset
+DETERMINISTIC_CACHE_SIZE = 100_000
+
+# Suffix of the column holding the lookup tokens of a "lookup" column
+LOOKUP_SUFFIX = "_lookup"
+
+
+def get_encrypt_mode(col_meta: dict) -> Optional[str]:
+    """
+    Return the encryption mode of a SQL schema column.
+    "encrypt": True is the randomized "fernet" mode, "deterministic" gives
+    equal ciphertexts for equal values, and False disables encryption.
+    "deterministic" must only be set on a column that holds no Fernet
+    tokens yet; to query an encrypted column by value, prefer "lookup"
+    (see lookup_column).
+    Args:
+        col_meta (dict): Column definition from a SQLALCHEMY_SCHEMA.
+    Returns:
+        str or None: "fernet", "deterministic" or None.
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    mode = col_meta.get("encrypt", False)
+    if mode is False:
+        return None
+    if mode is True:
+        return "fernet"
+    if mode not in ENCRYPT_MODES:
+        raise ValueError(
+            f"Unknown encrypt mode '{mode}' for column '{col_meta['name']}'"
+        )
+    return mode
+
+
+def lookup_column(col_meta: dict) -> Optional[str]:
+    """
+    Return the lookup-token column of a SQL schema column flagged with
+    "lookup": True, or None. The column itself keeps its encryption
+    mode; the lookup column, <name>_lookup in the same table, holds a
+    keyed HMAC of each value, so equality lookups, joins and GROUP BY
+    can use an index without making the ciphertexts deterministic.
+    Args:
+        col_meta (dict): Column definition from a SQLALCHEMY_SCHEMA.
+    Returns:
+        str or None: Name of the lookup-token column.
+    """
+    if not col_meta.get("lookup", False):
+        return None
+    return col_meta["name"] + LOOKUP_SUFFIX
+
+
+def derive_deterministic_key(fernet_key: str) -> bytes:
+    """
+    Derive a 512-bit AES-SIV key from the Fernet key with HKDF-SHA256, so
+    deterministic encryption needs no extra secret.
+    Args:
+        fernet_key (str): 32-byte base64 Fernet key.
+    Returns:
+        bytes: 64-byte AES-SIV key.
+    """
+    return _derive_key(
+        fernet_key, 64, b"etl_pipeline deterministic encryption"
+    )
+
+
+def derive_lookup_key(fernet_key: str) -> bytes:
+    """
+    Derive a 256-bit HMAC key for lookup tokens from the Fernet key with
+    HKDF-SHA256, independent of the encryption keys.
+    Args:
+        fernet_key (str): 32-byte base64 Fernet key.
+    Returns:
+        bytes: 32-byte HMAC-SHA256 key.
+    """
+    return _derive_key(fernet_key, 32, b"etl_pipeline lookup tokens")
+
+
+def _derive_key(fernet_key: str, length: int, info: bytes) -> bytes:
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=length,
+        salt=None,
+        info=info,
+    ).derive(base64.urlsafe_b64decode(fernet_key))
+
+
+class DeterministicCipher:
+    """
+    Deterministic authenticated encryption with AES-SIV. Equal plaintexts
+    give equal URL-safe base64 tokens, so encrypted columns can be
+    indexed, joined and grouped in Postgres. Exposes the same
+    encrypt/decrypt interface as Fernet. Ciphertexts are cached, since a
+    value always encrypts to the same token.
+    """
+
+    def __init__(self, key: bytes):
+        """
+        Args:
+            key (bytes): 32, 48 or 64-byte AES-SIV key.
+        """
+        self._aessiv = AESSIV(key)
+        self._cache = {}
+
+    def encrypt(self, data: bytes) -> bytes:
+        token = self._cache.get(data)
+        if token is None:
+            if len(self._cache) >= DETERMINISTIC_CACHE_SIZE:
+                self._cache.clear()
+            token = base64.urlsafe_b64encode(self._aessiv.encrypt(data, None))
+            self._cache[data] = token
+        return token
+
+    def decrypt(self, token: bytes) -> bytes:
+        return self._aessiv.decrypt(base64.urlsafe_b64decode(token), None)
+
+
+class LookupTokenizer:
+    """
+    Keyed lookup tokens with HMAC-SHA256: equal plaintexts give equal hex
+    tokens, which cannot be decrypted. Exposes encrypt() like Fernet, so
+    encrypt_column can compute the tokens of a column.
+    """
+
+    def __init__(self, key: bytes):
+        """
+        Args:
+            key (bytes): HMAC key of at least 32 bytes.
+        """
+        self._key = key
+
+    def encrypt(self, data: bytes) -> bytes:
+        return hmac.new(self._key, data, hashlib.sha256).hexdigest().encode()
@@ -21,9 +21,64 @@ class EnvConfig:
         "BATCH_SIZE"
     ]
 
-    OPTIONAL_VARS = [
-        "CHUNK_SIZE",
-    ]
+    # Optional variables and the default used when they are not set
+    OPTIONAL_VARS = {
+        "CHUNK_SIZE": None,
+        "LOAD_METHOD": "insert",
+        "MERGE_ON_CONFLICT": "nothing",
+        "DB_POOL_SIZE": "5",
+        "DB_MAX_OVERFLOW": "0",
+        "DB_POOL_TIMEOUT": "30",
+        "DB_POOL_RECYCLE": "1800",
+        "EXTRACT_WORKERS": "1",
+        "EXTRACT_RANGE_SIZE_MB": "64",
+        "EXTRACT_PREFETCH_CHUNKS": "2",
+        "INPUT_COMPRESSION": "auto",
+        "PIPELINE_MODE": "sequential",
+        "PIPELINE_QUEUE_SIZE": "2",
+        "TRANSFORM_WORKERS": "1",
+        "LOAD_WORKERS": "1",
+        "TRANSFORM_PROCESSES": "0",
+        "ENCRYPT_THREADS": "1",
+        "DETERMINISTIC_KEY": None,
+        "LOOKUP_KEY": None,
+        "DATAFRAME_ENGINE": "pandas",
+        "ADAPTIVE_CHUNKING": "false",
+        "CHUNK_SIZE_MIN": "1000",
+        "CHUNK_SIZE_MAX": "1000000",
+        "BATCH_SIZE_MIN": "100",
+        "BATCH_SIZE_MAX": "50000",
+        "MEMORY_LIMIT_MB": None,
+        "TARGET_CHUNK_SECONDS": "10",
+        "TARGET_BATCH_SECONDS": "2",
+        "WORKER_CONCURRENCY": "1",
+        "LISTENER_SOURCE": "list",
+        "LISTENER_PREFIX": None,
+        "LISTENER_POLL_SECONDS": "5",
+        "LISTENER_CONCURRENCY": "1",
+        "LISTENER_VISIBILITY_SECONDS": "300",
+        "LEASE_SECONDS": "60",
+        "AZ_QUEUE_NAME": "etl-blobs",
+        "AZ_QUEUE_CONNECTION_STRING": None,
+        "CHECKPOINTS": "false",
+        "CHECKPOINT_MAX_ATTEMPTS": "3",
+        "ARCHIVE_MODE": "copy",
+        "ARCHIVE_COPY_TIMEOUT_SECONDS": "600",
+        "DEDUP": "false",
+        "DEDUP_CAPACITY": "1000000",
+        "DEDUP_ERROR_RATE": "0.001",
+        "DEDUP_MAX_MB": "256",
+        "AZ_POOL_SIZE": "20",
+        "AZ_MAX_CONCURRENCY": "4",
+        "AZ_MAX_SINGLE_GET_SIZE_MB": "32",
+        "AZ_MAX_CHUNK_GET_SIZE_MB": "4",
+        "AZ_ASYNC_DOWNLOADS": "false",
+        "AZ_ASYNC_MAX_DOWNLOADS": "16",
+        "METRICS_PORT": None,
+        "METRICS_TEXTFILE": None,
+        "JOB_REPORT": "false",
+        "JOB_REPORT_DIR": None,
+    }
 
     def __init__(self):
         """
@@ -32,8 +87,8 @@ class EnvConfig:
         """
         for var in self.REQUIRED_VARS:
             setattr(self, var.lower(), os.getenv(var))
-        for var in self.OPTIONAL_VARS:
-            setattr(self, var.lower(), os.getenv(var, None))
+        for var, default in self.OPTIONAL_VARS.items():
+            setattr(self, var.lower(), os.getenv(var, default))
         self.processed_prefix = "processed/"
         self.success_prefix = self.processed_prefix + "success/"
         self.fail_prefix = self.processed_prefix + "fail/"
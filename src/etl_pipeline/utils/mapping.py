@@ -1,4 +1,11 @@
 import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from src.etl_pipeline.utils.arrow_utils import (
+    is_arrow_backed,
+    parse_datetime_arrow,
+    split_datetime_arrow
+)
 
 sales_column_mapping = {
     "transaction_id": "transaction_id",
@@ -13,47 +20,114 @@ sales_column_mapping = {
     "timestamp": ["sale_date", "sale_time"]
 }
 
+# Datetime format of CSV columns split into date and time columns. Columns
+# without an entry have their format guessed once and cached.
+sales_datetime_formats = {
+    "timestamp": "%Y-%m-%d %H:%M:%S",
+}
+
 
 class ColumnMapper:
-    def __init__(self, mapping: dict):
+    def __init__(self, mapping: dict, datetime_formats: dict = None):
         """
         Initialize ColumnMapper with a mapping dict that defines CSV to SQL
-        column mapping.
+        column mapping, and compile it into a mapping plan: direct renames
+        and datetime columns split into [date, time] columns.
         Args:
             mapping (dict): Dictionary mapping CSV columns to SQL columns or
                 lists of columns.
+            datetime_formats (dict, optional): strftime format of the CSV
+                columns mapped to lists of columns.
         """
 
         self.mapping = mapping
+        self.datetime_formats = dict(datetime_formats or {})
+        self._guessed_formats = {}
+
+        self.renames = {
+            csv_col: sql_target
+            for csv_col, sql_target in mapping.items()
+            if isinstance(sql_target, str) and csv_col != sql_target
+        }
+        self.datetime_splits = {
+            csv_col: tuple(sql_target)
+            for csv_col, sql_target in mapping.items()
+            if isinstance(sql_target, list)
+        }
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Apply the column mapping to a DataFrame, handling direct and
-        multi-column mappings.
+        multi-column mappings. Datetime columns are parsed once and split
+        into a datetime64 date column and a timedelta64 time-of-day column,
+        or Arrow date32/time64 columns for Arrow-backed input.
+        The input data is not copied.
         Args:
             df (pd.DataFrame): Input DataFrame with CSV columns.
         Returns:
             pd.DataFrame: DataFrame with columns mapped for SQL loading.
         """
 
-        df_mapped = df.copy()
+        df_mapped = df.copy(deep=False)
+        df_mapped.columns = [self.renames.get(col, col) for col in df.columns]
 
-        for csv_col, sql_target in self.mapping.items():
+        for csv_col, (date_col, time_col) in self.datetime_splits.items():
             if csv_col not in df.columns:
                 continue
+            values = df[csv_col]
+            if is_arrow_backed(values):
+                fmt = self.get_datetime_format(csv_col, values)
+                try:
+                    timestamps = parse_datetime_arrow(values, fmt)
+                except Exception:
+                    # No format or mismatch; infer with pandas
+                    self._guessed_formats.pop(csv_col, None)
+                    timestamps = pd.to_datetime(values.astype(object))
+                dates, times = split_datetime_arrow(timestamps, df.index)
+                df_mapped[date_col] = dates
+                df_mapped[time_col] = times
+                continue
 
-            # Direct mapping
-            if isinstance(sql_target, str):
-                df_mapped.rename(columns={csv_col: sql_target}, inplace=True)
-
-            # Multiple target columns
-            elif isinstance(sql_target, list):
-                if csv_col == "timestamp":
-                    df_mapped["sale_date"] = pd.to_datetime(
-                        df[csv_col]
-                    ).dt.date
-                    df_mapped["sale_time"] = pd.to_datetime(
-                        df[csv_col]
-                    ).dt.time
+            timestamps = self.parse_datetime(csv_col, values)
+            dates = timestamps.dt.normalize()
+            df_mapped[date_col] = dates
+            df_mapped[time_col] = timestamps - dates
 
         return df_mapped
+
+    def parse_datetime(self, csv_col: str, values: pd.Series) -> pd.Series:
+        """
+        Parse a datetime column with its configured format, or with a format
+        guessed from the first value and cached for later chunks. Falls back
+        to per-chunk inference if the values do not match the format.
+        Args:
+            csv_col (str): CSV column name.
+            values (pd.Series): Raw column values.
+        Returns:
+            pd.Series: datetime64 values.
+        """
+        fmt = self.get_datetime_format(csv_col, values)
+        if fmt is not None:
+            try:
+                return pd.to_datetime(values, format=fmt)
+            except (ValueError, TypeError):
+                # Format differs in this chunk; guess again next chunk
+                self._guessed_formats.pop(csv_col, None)
+        return pd.to_datetime(values)
+
+    def get_datetime_format(self, csv_col: str, values: pd.Series):
+        """
+        Return the configured format of a datetime column, or the format
+        guessed from its first value (cached per column). None if no
+        format can be guessed.
+        """
+        fmt = self.datetime_formats.get(csv_col)
+        if fmt is None:
+            if csv_col not in self._guessed_formats:
+                first_valid = values.first_valid_index()
+                self._guessed_formats[csv_col] = (
+                    guess_datetime_format(str(values[first_valid]))
+                    if first_valid is not None else None
+                )
+            fmt = self._guessed_formats[csv_col]
+        return fmt
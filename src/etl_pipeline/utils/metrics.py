@@ -0,0 +1,361 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psutil
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+logger = get_logger()
+config = EnvConfig()
+
+# Fields measured for every stage
+STAGE_FIELDS = ("calls", "rows", "bytes", "batches", "seconds")
+
+# Prefix of every exported Prometheus metric
+PROMETHEUS_PREFIX = "etl"
+
+_server = None
+_server_lock = threading.Lock()
+
+# Metrics of the job running in the current context, if any
+_job_metrics = contextvars.ContextVar("job_metrics", default=None)
+
+
+class Metrics:
+    """
+    Thread-safe, process-wide performance counters. Every stage
+    (extract, transform, encrypt, load, ...) accumulates its calls, rows,
+    bytes, batches and busy seconds; named counters hold events such as
+    retries; the process RSS is sampled at every record. Collectors add
+    the state of other components (e.g. the DB pool) to each snapshot.
+    Stage seconds are summed over the threads doing the work, so rows per
+    second is the throughput per busy thread.
+    Everything recorded while a job is running in the current context
+    (see start_job_metrics) is also recorded in the metrics of that job.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = psutil.Process()
+        self.stages = defaultdict(Counter)
+        self.counters = Counter()
+        self.peak_rss = self._process.memory_info().rss
+        self.collectors = {}
+
+    def record(
+        self,
+        stage: str,
+        seconds: float,
+        rows: int = 0,
+        bytes: int = 0,
+        batches: int = 0,
+    ):
+        """
+        Record one call of a stage.
+        """
+        rss = self._process.memory_info().rss
+        for target in self._targets():
+            with target._lock:
+                target.stages[stage].update({
+                    "calls": 1,
+                    "rows": rows,
+                    "bytes": bytes,
+                    "batches": batches,
+                    "seconds": seconds,
+                })
+                target.peak_rss = max(target.peak_rss, rss)
+
+    def count(self, name: str, value: int = 1):
+        """
+        Add value to a named counter.
+        """
+        for target in self._targets():
+            with target._lock:
+                target.counters[name] += value
+
+    def _targets(self) -> tuple:
+        job = _job_metrics.get()
+        return (self,) if job is None or job is self else (self, job)
+
+    def add_collector(self, name: str, collect):
+        """
+        Include collect() (a dict of numbers) in snapshots under name.
+        """
+        with self._lock:
+            self.collectors[name] = collect
+
+    def snapshot(self) -> dict:
+        """
+        Return a copy of all metrics, with the rows and bytes per second
+        of each stage and the output of every collector.
+        """
+        rss = self._process.memory_info().rss
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, rss)
+            stages = {
+                stage: {field: values[field] for field in STAGE_FIELDS}
+                for stage, values in self.stages.items()
+            }
+            snapshot = {
+                "stages": stages,
+                "counters": dict(self.counters),
+                "rss_bytes": rss,
+                "peak_rss_bytes": self.peak_rss,
+            }
+            collectors = dict(self.collectors)
+        for values in stages.values():
+            _add_rates(values)
+        for name, collect in collectors.items():
+            try:
+                snapshot[name] = collect()
+            except Exception as e:
+                logger.warning(f"Metrics collector {name} failed: {e}")
+        return snapshot
+
+    def delta(self, before: dict) -> dict:
+        """
+        Return the stage fields and counters accumulated since the
+        snapshot before, e.g. to report one job or ship the metrics of a
+        worker process to its parent.
+        """
+        after = self.snapshot()
+        stages = {}
+        for stage, values in after["stages"].items():
+            previous = before["stages"].get(stage, {})
+            change = {
+                field: values[field] - previous.get(field, 0)
+                for field in STAGE_FIELDS
+            }
+            if change["calls"]:
+                stages[stage] = _add_rates(change)
+        counters = {
+            name: value - before["counters"].get(name, 0)
+            for name, value in after["counters"].items()
+            if value != before["counters"].get(name, 0)
+        }
+        return {
+            **after,
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def merge(self, delta: dict):
+        """
+        Add a delta produced in another process (stages and counters).
+        """
+        for target in self._targets():
+            with target._lock:
+                for stage, values in delta.get("stages", {}).items():
+                    target.stages[stage].update(
+                        {field: values[field] for field in STAGE_FIELDS}
+                    )
+                target.counters.update(delta.get("counters", {}))
+
+
+metrics = Metrics()
+
+
+def start_job_metrics() -> Metrics:
+    """
+    Start recording the metrics of a job run in the current context, in
+    addition to the process-wide metrics. Threads started for the job
+    must run in its context (see bind_job_metrics).
+    Returns:
+        Metrics: The metrics of the job, for finish_job_metrics.
+    """
+    job = Metrics()
+    job.token = _job_metrics.set(job)
+    return job
+
+
+def finish_job_metrics(job: Metrics) -> dict:
+    """
+    Stop recording the metrics of a job and return them: the stage
+    fields with their rates, the counters and the peak RSS of the job,
+    with the output of the process-wide collectors (e.g. the DB pool).
+    """
+    _job_metrics.reset(job.token)
+    return {**metrics.snapshot(), **job.snapshot()}
+
+
+def bind_job_metrics(fn):
+    """
+    Return fn running in a copy of the current context, so the metrics
+    it records on another thread (pipeline stages, executors) count in
+    the current job. Each call gets its own copy, so the result can be
+    run on several threads at once.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def _add_rates(values: dict) -> dict:
+    seconds = values["seconds"]
+    values["rows_per_second"] = values["rows"] / seconds if seconds else 0.0
+    values["bytes_per_second"] = (
+        values["bytes"] / seconds if seconds else 0.0
+    )
+    return values
+
+
+def log_stage_metrics(stages: dict):
+    """
+    Log the rows and bytes per second of each stage.
+    """
+    for stage, values in stages.items():
+        logger.info(
+            f"Stage {stage}: {values['rows']} rows, "
+            f"{values['bytes'] / 1024**2:.1f}MB, {values['batches']} "
+            f"batches in {values['calls']} calls, {values['seconds']:.2f}s "
+            f"busy ({values['rows_per_second']:.0f} rows/s, "
+            f"{values['bytes_per_second'] / 1024**2:.1f}MB/s)"
+        )
+
+
+def render_prometheus(snapshot: dict) -> str:
+    """
+    Render a snapshot in the Prometheus text exposition format.
+    """
+    lines = []
+
+    def add(name, kind, samples, help_text):
+        metric = f"{PROMETHEUS_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for labels, value in samples:
+            lines.append(f"{metric}{labels} {value}")
+
+    for field in STAGE_FIELDS:
+        add(
+            f"stage_{field}_total",
+            "counter",
+            [
+                (f'{{stage="{stage}"}}', values[field])
+                for stage, values in sorted(snapshot["stages"].items())
+            ],
+            f"Stage {field}",
+        )
+    for name, value in sorted(snapshot["counters"].items()):
+        add(f"{name}_total", "counter", [("", value)], name.replace("_", " "))
+    add("rss_bytes", "gauge", [("", snapshot["rss_bytes"])], "Process RSS")
+    add(
+        "peak_rss_bytes",
+        "gauge",
+        [("", snapshot["peak_rss_bytes"])],
+        "Peak process RSS",
+    )
+    for name, values in sorted(snapshot.items()):
+        if name in ("stages", "counters") or not isinstance(values, dict):
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)):
+                add(f"{name}_{key}", "gauge", [("", value)], f"{name} {key}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_textfile(path: str = None):
+    """
+    Write the current metrics for the node_exporter textfile collector,
+    replacing the file atomically. Does nothing without METRICS_TEXTFILE.
+    """
+    path = path or config.metrics_textfile
+    if not path:
+        return
+    try:
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(render_prometheus(metrics.snapshot()))
+        os.replace(temporary, path)
+    except Exception as e:
+        logger.error(f"Error writing metrics textfile {path}: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        snapshot = metrics.snapshot()
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(snapshot, indent=2).encode()
+            content_type = "application/json"
+        elif self.path.startswith("/metrics"):
+            body = render_prometheus(snapshot).encode()
+            content_type = "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = None):
+    """
+    Serve /metrics (Prometheus) and /metrics.json from a background
+    thread, once per process. Does nothing without METRICS_PORT.
+    """
+    global _server
+    port = port or config.metrics_port
+    if not port:
+        return
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("", int(port)), _MetricsHandler)
+            threading.Thread(
+                target=_server.serve_forever, name="metrics", daemon=True
+            ).start()
+            logger.info(f"Serving metrics on port {port}")
+
+
+def write_job_report(report: dict, force: bool = False):
+    """
+    Write a job report as JSON to JOB_REPORT_DIR, by default the folder
+    of the log file, as etl_report_<blob>_<timestamp>.json. Errors are
+    logged. Does nothing when JOB_REPORT is disabled, unless force is
+    set (e.g. for the profile summary of main.py --profile).
+    Returns:
+        str or None: Path of the report.
+    """
+    enabled = config.job_report.lower() in ("1", "true", "yes")
+    if not (enabled or force):
+        return None
+    directory = job_report_directory()
+    base = os.path.splitext(os.path.basename(report["blob"]))[0]
+    timestamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    path = os.path.join(directory, f"etl_report_{base}_{timestamp}.json")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+        logger.info(f"Job report written to {path}")
+        return path
+    except Exception as e:
+        logger.error(f"Error writing job report {path}: {e}")
+        return None
+
+
+def job_report_directory() -> str:
+    """
+    Return JOB_REPORT_DIR, or the folder of the log file if it is unset.
+    """
+    return config.job_report_dir or _log_directory()
+
+
+def _log_directory() -> str:
+    for handler in logger.handlers:
+        if isinstance(handler, logging.FileHandler):
+            return os.path.dirname(handler.baseFilename)
+    return os.getcwd()
@@ -0,0 +1,329 @@
+import cProfile
+import contextlib
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import Future
+
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+from src.etl_pipeline.utils.metrics import job_report_directory
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+    from pyinstrument.renderers import PstatsRenderer
+except ImportError:  # optional dependency, only needed by --profile
+    SamplingProfiler = None
+
+logger = get_logger()
+config = EnvConfig()
+
+PROFILERS = ("auto", "cprofile", "pyinstrument")
+
+# Settings given to enable_profiling; None while profiling is off
+_settings = None
+# Profiler of the job running in this process
+_job_profiler = None
+_profiling_lock = threading.Lock()
+
+# Returned by profile_stage while no job is profiled
+_NOT_PROFILED = contextlib.nullcontext()
+
+
+class StageProfiler:
+    """
+    Profiles every stage of one job separately, chunk by chunk, with
+    cProfile or the pyinstrument sampling profiler; the samples of all
+    chunks of a stage add up. A stage entered inside another (encrypt
+    inside transform) pauses the outer one, so each function is counted
+    in the stage that ran it. With trace_allocations, tracemalloc
+    records the memory allocated by each source line during each stage
+    (including nested stages) and the peak traced memory. Stages must
+    run on the thread that started the job.
+    """
+
+    def __init__(
+        self, profiler: str, trace_allocations: bool = False, top: int = 20
+    ):
+        self.profiler = profiler
+        self.trace_allocations = trace_allocations
+        self.top = top
+        self.stages = {}
+        self._stack = []
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _new_profiler(self):
+        if self.profiler == "pyinstrument":
+            return SamplingProfiler()
+        return cProfile.Profile()
+
+    def _pause(self, stage: dict):
+        if self.profiler == "pyinstrument":
+            stage["profiler"].stop()
+        else:
+            stage["profiler"].disable()
+
+    def _resume(self, stage: dict):
+        if self.profiler == "pyinstrument":
+            stage["profiler"].start()
+        else:
+            stage["profiler"].enable()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Profile the code run in the with block as one call of a stage.
+        """
+        stage = self.stages.setdefault(name, {
+            "profiler": self._new_profiler(),
+            "calls": 0,
+            "seconds": 0.0,
+            "allocations": Counter(),
+            "allocation_counts": Counter(),
+            "peak_traced_bytes": 0,
+        })
+        if self._stack:
+            outer = self._stack[-1]
+            self._pause(outer)
+            if self.trace_allocations:
+                # The peak is reset for this stage; keep the outer's so far
+                outer["peak_traced_bytes"] = max(
+                    outer["peak_traced_bytes"],
+                    tracemalloc.get_traced_memory()[1],
+                )
+        self._stack.append(stage)
+        before = None
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            before = _take_snapshot()
+        started = time.perf_counter()
+        self._resume(stage)
+        try:
+            yield
+        finally:
+            self._pause(stage)
+            stage["calls"] += 1
+            stage["seconds"] += time.perf_counter() - started
+            if before is not None:
+                self._record_allocations(stage, before)
+            self._stack.pop()
+            if self._stack:
+                self._resume(self._stack[-1])
+
+    def _record_allocations(self, stage: dict, before):
+        stage["peak_traced_bytes"] = max(
+            stage["peak_traced_bytes"], tracemalloc.get_traced_memory()[1]
+        )
+        for diff in _take_snapshot().compare_to(before, "lineno"):
+            if diff.size_diff > 0:
+                frame = diff.traceback[0]
+                line = f"{frame.filename}:{frame.lineno}"
+                stage["allocations"][line] += diff.size_diff
+                stage["allocation_counts"][line] += max(diff.count_diff, 0)
+
+    def profile_iter(self, name: str, iterable):
+        """
+        Yield the items of iterable, profiling the production of each
+        item (e.g. the extraction of a chunk) as one call of a stage.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def finish(self, directory: str) -> dict:
+        """
+        Write one <stage>.pstats file per stage to directory and return
+        the per-stage summary: calls, seconds, pstats path, the hottest
+        functions by own time and, with trace_allocations, the biggest
+        allocators and peak traced memory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        summary = {}
+        for name, stage in self.stages.items():
+            path = os.path.join(directory, f"{name}.pstats")
+            if self.profiler == "pyinstrument":
+                session = stage["profiler"].last_session
+                if session is None:
+                    continue
+                with open(path, "wb") as f:
+                    f.write(
+                        PstatsRenderer()
+                        .render(session)
+                        .encode("utf-8", errors="surrogateescape")
+                    )
+            else:
+                stage["profiler"].dump_stats(path)
+            summary[name] = {
+                "calls": stage["calls"],
+                "seconds": stage["seconds"],
+                "pstats": path,
+                "hottest": hottest_functions(path, self.top),
+            }
+            if self.trace_allocations:
+                summary[name]["peak_traced_bytes"] = (
+                    stage["peak_traced_bytes"]
+                )
+                summary[name]["allocators"] = [
+                    {
+                        "line": line,
+                        "size_bytes": size,
+                        "count": stage["allocation_counts"][line],
+                    }
+                    for line, size in stage["allocations"].most_common(
+                        self.top
+                    )
+                ]
+        if self.trace_allocations:
+            tracemalloc.stop()
+        return summary
+
+
+def _take_snapshot():
+    # Leave out the snapshots' own memory
+    return tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+
+
+class InlineExecutor:
+    """
+    Executor running every submitted call on the calling thread, so the
+    work stays in the profile of its stage.
+    """
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def hottest_functions(path: str, top: int) -> list:
+    """
+    Return the top functions of a .pstats file by their own time. A
+    sampling profiler does not count calls; their calls are None.
+    """
+    stats = pstats.Stats(path).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+    return [
+        {
+            "function": f"{filename}:{line}({function})",
+            "calls": calls if calls >= 0 else None,
+            "self_seconds": own_time,
+            "cumulative_seconds": cumulative_time,
+        }
+        for (filename, line, function), (_, calls, own_time,
+                                         cumulative_time, _) in ranked[:top]
+    ]
+
+
+def enable_profiling(
+    profiler: str = "auto", trace_allocations: bool = False, top: int = 20
+):
+    """
+    Profile every following job of this process (see StageProfiler).
+    Profiled jobs run every stage on the job's thread: chunks are
+    processed sequentially, without transform processes, extract range
+    workers, encrypt threads or concurrent load batches.
+    Args:
+        profiler (str): "cprofile", "pyinstrument" (sampling, lower
+            overhead) or "auto": pyinstrument if installed.
+        trace_allocations (bool): Also track allocations with tracemalloc.
+        top (int): Functions and allocators kept in the summary.
+    Raises:
+        ValueError: If the profiler is unknown.
+        RuntimeError: If pyinstrument is requested but not installed.
+    """
+    global _settings
+    profiler = profiler.lower()
+    if profiler not in PROFILERS:
+        raise ValueError(
+            f"Unknown profiler '{profiler}'. "
+            f"Expected one of: {', '.join(PROFILERS)}"
+        )
+    if profiler == "auto":
+        profiler = "cprofile" if SamplingProfiler is None else "pyinstrument"
+    if profiler == "pyinstrument" and SamplingProfiler is None:
+        raise RuntimeError(
+            "The pyinstrument profiler requires pyinstrument: "
+            "pip install pyinstrument"
+        )
+    _settings = {
+        "profiler": profiler,
+        "trace_allocations": trace_allocations,
+        "top": top,
+    }
+    logger.info(
+        f"Profiling enabled ({profiler}"
+        f"{', tracing allocations' if trace_allocations else ''})"
+    )
+
+
+def profiling_enabled() -> bool:
+    return _settings is not None
+
+
+def start_job_profile() -> StageProfiler:
+    """
+    Start profiling a job, if profiling is enabled.
+    Returns:
+        StageProfiler or None: Profiler of the job.
+    """
+    global _job_profiler
+    if _settings is None:
+        return None
+    with _profiling_lock:
+        _job_profiler = StageProfiler(**_settings)
+        return _job_profiler
+
+
+def finish_job_profile(job_profiler: StageProfiler, blob_name: str) -> dict:
+    """
+    Stop profiling a job and write its .pstats files to
+    etl_profile_<blob>_<timestamp>/ next to the job reports.
+    Returns:
+        dict: Per-stage summary (see StageProfiler.finish).
+    """
+    global _job_profiler
+    with _profiling_lock:
+        _job_profiler = None
+    base = os.path.splitext(os.path.basename(blob_name))[0]
+    timestamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    directory = os.path.join(
+        job_report_directory(), f"etl_profile_{base}_{timestamp}"
+    )
+    summary = job_profiler.finish(directory)
+    for name, stage in summary.items():
+        hottest = stage["hottest"][0] if stage["hottest"] else None
+        logger.info(
+            f"Profile {name}: {stage['calls']} calls, "
+            f"{stage['seconds']:.2f}s -> {stage['pstats']}"
+            + (
+                f"; hottest {hottest['function']} "
+                f"({hottest['self_seconds']:.3f}s)"
+                if hottest else ""
+            )
+        )
+    return summary
+
+
+def profile_stage(name: str):
+    """
+    Context manager profiling a stage of the current job; a shared no-op
+    when profiling is off.
+    """
+    if _job_profiler is None:
+        return _NOT_PROFILED
+    return _job_profiler.stage(name)
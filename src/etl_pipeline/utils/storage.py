@@ -0,0 +1,248 @@
+import asyncio
+import queue
+import threading
+
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient
+from urllib3.util.retry import Retry
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+from src.etl_pipeline.utils.metrics import metrics
+
+try:
+    import aiohttp
+    from azure.core.pipeline.transport import AioHttpTransport
+    from azure.storage.blob.aio import (
+        BlobServiceClient as AsyncBlobServiceClient
+    )
+except ImportError:  # optional dependency, only needed by async downloads
+    aiohttp = None
+
+logger = get_logger()
+config = EnvConfig()
+
+# Process-wide clients, created on first use
+_service_client = None
+_container_client = None
+_async_downloader = None
+_client_lock = threading.Lock()
+
+# Marks the end of a download in its chunk queue
+_DOWNLOAD_DONE = object()
+
+
+def client_options() -> dict:
+    """
+    Download tuning shared by the sync and async service clients: a blob
+    up to AZ_MAX_SINGLE_GET_SIZE_MB is fetched in its first request, and
+    larger blobs are streamed in AZ_MAX_CHUNK_GET_SIZE_MB requests.
+    Every retry of the SDK's retry policy is counted in the metrics.
+    """
+    return {
+        "max_single_get_size": int(config.az_max_single_get_size_mb)
+        * 1024**2,
+        "max_chunk_get_size": int(config.az_max_chunk_get_size_mb) * 1024**2,
+        "retry_hook": _count_retry,
+    }
+
+
+def _count_retry(**kwargs):
+    metrics.count("storage_retries")
+
+
+def get_blob_service_client() -> BlobServiceClient:
+    """
+    Return the process-wide BlobServiceClient. Its HTTP session keeps up
+    to AZ_POOL_SIZE connections open, so every thread of the process
+    (range workers, blobs of a worker or listener, blob moves) reuses
+    connections instead of opening a new TLS session per client.
+    Returns:
+        BlobServiceClient: Shared, thread-safe client.
+    Raises:
+        RuntimeError: If the client cannot be created.
+    """
+    global _service_client
+    try:
+        with _client_lock:
+            if _service_client is None:
+                pool_size = int(config.az_pool_size)
+                session = requests.Session()
+                # Retries are handled by the SDK's retry policy
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=pool_size,
+                    pool_maxsize=pool_size,
+                    max_retries=Retry(
+                        total=False, redirect=False, raise_on_status=False
+                    ),
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _service_client = BlobServiceClient.from_connection_string(
+                    config.az_connection_string,
+                    transport=RequestsTransport(session=session),
+                    **client_options(),
+                )
+            return _service_client
+    except Exception as e:
+        logger.error(f"Error creating BlobServiceClient: {e}")
+        raise RuntimeError(f"Error creating BlobServiceClient: {e}")
+
+
+def get_container_client():
+    """
+    Return the process-wide ContainerClient of the configured container.
+    """
+    global _container_client
+    service_client = get_blob_service_client()
+    with _client_lock:
+        if _container_client is None:
+            _container_client = service_client.get_container_client(
+                config.az_container_name
+            )
+        return _container_client
+
+
+def download_blob(
+    blob_client, offset: int = None, length: int = None, **kwargs
+):
+    """
+    Start a download with AZ_MAX_CONCURRENCY parallel connections. The
+    connections are used when the content is read whole (readall);
+    chunks() streams it one AZ_MAX_CHUNK_GET_SIZE_MB request at a time.
+    The bytes are returned as stored, also for blobs with a
+    Content-Encoding; compressed blobs are decompressed by the extractors.
+    Returns:
+        StorageStreamDownloader: The download.
+    """
+    kwargs.setdefault("max_concurrency", int(config.az_max_concurrency))
+    kwargs.setdefault("decompress", False)
+    return blob_client.download_blob(offset=offset, length=length, **kwargs)
+
+
+def async_downloads_enabled() -> bool:
+    return config.az_async_downloads.lower() in ("1", "true", "yes")
+
+
+class AsyncDownloader:
+    """
+    Runs azure.storage.blob.aio downloads on one event loop in a
+    background thread, so a process can keep many byte ranges in flight
+    (across blobs, worker and listener threads) without a blocked thread
+    per download. At most max_downloads downloads run at a time. Callers
+    stay synchronous: iter_chunks yields the downloaded bytes.
+    """
+
+    def __init__(self, max_downloads: int):
+        if aiohttp is None:
+            raise RuntimeError(
+                "AZ_ASYNC_DOWNLOADS requires aiohttp: pip install aiohttp"
+            )
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="storage-aio", daemon=True
+        )
+        self._thread.start()
+        self._slots = asyncio.Semaphore(max_downloads)
+        self._container_client = self._run(
+            self._open(int(config.az_pool_size))
+        )
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(
+            coroutine, self._loop
+        ).result()
+
+    async def _open(self, pool_size: int):
+        # The aiohttp session must be created on the loop that uses it
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size)
+        )
+        service_client = AsyncBlobServiceClient.from_connection_string(
+            config.az_connection_string,
+            transport=AioHttpTransport(session=session),
+            **client_options(),
+        )
+        return service_client.get_container_client(config.az_container_name)
+
+    def iter_chunks(
+        self,
+        blob_name: str,
+        offset: int = None,
+        length: int = None,
+        prefetch: int = 2,
+    ):
+        """
+        Download a blob or byte range on the event loop, as stored.
+        Args:
+            blob_name (str): Name of the blob in the container.
+            offset (int, optional): First byte to download.
+            length (int, optional): Bytes to download.
+            prefetch (int): Chunks downloaded ahead of the consumer.
+        Yields:
+            bytes: Downloaded chunks of about AZ_MAX_CHUNK_GET_SIZE_MB.
+        """
+        chunks = queue.Queue()
+        # One credit per chunk the consumer has not taken yet
+        credits = asyncio.Semaphore(prefetch)
+        future = asyncio.run_coroutine_threadsafe(
+            self._download(blob_name, offset, length, chunks, credits),
+            self._loop,
+        )
+        try:
+            while True:
+                item = chunks.get()
+                if item is _DOWNLOAD_DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                self._loop.call_soon_threadsafe(credits.release)
+                yield item
+        finally:
+            # Stops the download if the consumer gives up early
+            future.cancel()
+
+    async def _download(self, blob_name, offset, length, chunks, credits):
+        try:
+            async with self._slots:
+                blob_client = self._container_client.get_blob_client(
+                    blob_name
+                )
+                downloader = await blob_client.download_blob(
+                    offset=offset, length=length, decompress=False
+                )
+                async for data in downloader.chunks():
+                    await credits.acquire()
+                    chunks.put(data)
+            chunks.put(_DOWNLOAD_DONE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            chunks.put(e)
+
+    def close(self):
+        """
+        Close the async client and stop the event loop.
+        """
+        self._run(self._container_client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def get_async_downloader() -> AsyncDownloader:
+    """
+    Return the process-wide AsyncDownloader, allowing
+    AZ_ASYNC_MAX_DOWNLOADS downloads in flight.
+    """
+    global _async_downloader
+    with _client_lock:
+        if _async_downloader is None:
+            _async_downloader = AsyncDownloader(
+                int(config.az_async_max_downloads)
+            )
+            logger.info(
+                f"Async downloads enabled: up to "
+                f"{config.az_async_max_downloads} in flight"
+            )
+        return _async_downloader
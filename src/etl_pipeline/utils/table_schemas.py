@@ -15,6 +15,7 @@ SALES_SQLALCHEMY_SCHEMA = {
             "type": "String",
             "length": 100,
             "nullable": False,
+            "unique": True,
             "encrypt": False,
             "required": True,
         },
@@ -24,6 +25,7 @@ SALES_SQLALCHEMY_SCHEMA = {
             "length": 100,
             "nullable": False,
             "encrypt": True,
+            "lookup": False,
             "required": True,
         },
         {
@@ -32,6 +34,7 @@ SALES_SQLALCHEMY_SCHEMA = {
             "length": 100,
             "nullable": False,
             "encrypt": True,
+            "lookup": False,
             "required": True,
         },
         {
@@ -40,8 +43,34 @@ SALES_SQLALCHEMY_SCHEMA = {
             "length": 100,
             "nullable": False,
             "encrypt": True,
+            "lookup": False,
             "required": True,
         },
+        # Lookup tokens of the columns above, filled when "lookup": True
+        {
+            "name": "customer_id_lookup",
+            "type": "String",
+            "length": 64,
+            "nullable": True,
+            "encrypt": False,
+            "required": False,
+        },
+        {
+            "name": "product_id_lookup",
+            "type": "String",
+            "length": 64,
+            "nullable": True,
+            "encrypt": False,
+            "required": False,
+        },
+        {
+            "name": "store_id_lookup",
+            "type": "String",
+            "length": 64,
+            "nullable": True,
+            "encrypt": False,
+            "required": False,
+        },
         {
             "name": "quantity",
             "type": "Integer",
@@ -319,3 +348,15 @@ STORES_SQLALCHEMY_SCHEMA = {
         },
     ],
 }
+
+# SQLAlchemy-compatible schemas indexed by table name
+SQLALCHEMY_SCHEMAS = {
+    schema["__tablename__"]: schema
+    for schema in (
+        SALES_SQLALCHEMY_SCHEMA,
+        SUPPLIERS_SQLALCHEMY_SCHEMA,
+        PRODUCTS_SQLALCHEMY_SCHEMA,
+        CUSTOMERS_SQLALCHEMY_SCHEMA,
+        STORES_SQLALCHEMY_SCHEMA,
+    )
+}
@@ -1,20 +1,126 @@
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 import psutil
-from azure.storage.blob import BlobServiceClient
 from utils.env_vars import EnvConfig
 from utils.logger import get_logger
 
+from src.etl_pipeline.utils.arrow_utils import (
+    is_arrow_backed,
+    pa,
+    to_arrow_series
+)
+from src.etl_pipeline.utils.csv_schemas import CSV_SCHEMAS
+from src.etl_pipeline.utils.metrics import metrics
+from src.etl_pipeline.utils.profiling import profiling_enabled
+from src.etl_pipeline.utils.storage import get_container_client
+
 logger = get_logger()
 config = EnvConfig()
 
+# Fernet encrypt calls avoided per column by encrypting distinct values once
+encrypt_calls_saved = Counter()
+_encrypt_lock = threading.Lock()
+_encrypt_executor = None
+
+ARCHIVE_MODES = ("copy", "tags")
+
+# Blob index tag (and metadata key) holding the outcome of a job
+STATUS_TAG = "etl_status"
+# STATUS_TAG of new blobs, set by producers, for ARCHIVE_MODE=tags
+PENDING_STATUS = "pending"
+# STATUS_TAG values of processed blobs
+ARCHIVED_STATUSES = ("success", "fail")
+
+
+def archive_blob(blob_name: str, success: bool, rows: int, lease=None) -> str:
+    """
+    Record the outcome of a job on its blob with the ARCHIVE_MODE method.
+    The status ("success" or "fail"), UTC timestamp and rows loaded are
+    stored as etl_status, etl_processed_at and etl_rows.
+        - tags: set them as blob index tags and metadata on the blob in
+          place, replacing etl_status=pending. No bytes are copied; the
+          listener only finds blobs that are still pending.
+        - copy: copy the blob to processed/success or processed/fail
+          with them as metadata and delete the source once the copy has
+          completed.
+    Args:
+        blob_name (str): Processed blob.
+        success (bool): Outcome of the job.
+        rows (int): Rows loaded from the blob.
+        lease (BlobLeaseClient, optional): Active lease on the blob.
+    Returns:
+        str: Name of the blob holding the outcome; blob_name if it was
+            tagged in place or could not be moved.
+    Raises:
+        ValueError: If ARCHIVE_MODE is unknown.
+    """
+    archive_mode = config.archive_mode.lower()
+    if archive_mode not in ARCHIVE_MODES:
+        raise ValueError(
+            f"Unknown ARCHIVE_MODE '{archive_mode}'. "
+            f"Expected one of: {', '.join(ARCHIVE_MODES)}"
+        )
+    now = time.gmtime()
+    status = {
+        STATUS_TAG: "success" if success else "fail",
+        "etl_processed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", now),
+        "etl_rows": str(rows),
+    }
+    if archive_mode == "tags":
+        tag_blob(blob_name, status, lease=lease)
+        return blob_name
+
+    base, ext = os.path.splitext(os.path.basename(blob_name))
+    dest_prefix = config.success_prefix if success else config.fail_prefix
+    timestamp = time.strftime("%Y%m%d%H%M%S", now)
+    dest_blob_name = f"{dest_prefix}{base}_{timestamp}{ext}"
+    if move_blob(blob_name, dest_blob_name, lease=lease, metadata=status):
+        return dest_blob_name
+    return blob_name
+
+
+def tag_blob(blob_name: str, tags: dict, lease=None):
+    """
+    Set tags as index tags of a blob and merge them into its metadata.
+    Errors are logged and not raised.
+    """
+    try:
+        blob_client = create_blob_client(blob_name)
+        blob_client.set_blob_tags(tags, lease=lease)
+        metadata = blob_client.get_blob_properties().metadata or {}
+        blob_client.set_blob_metadata({**metadata, **tags}, lease=lease)
+        logger.info(f"Blob '{blob_name}' tagged {tags}")
+    except Exception as e:
+        logger.error(f"Error tagging blob {blob_name}: {e}")
+
 
-def move_blob(blob_name, dest_blob_name):
+def is_archived(blob_client) -> bool:
+    """
+    Return True if the blob's etl_status index tag records an outcome.
+    """
+    tags = blob_client.get_blob_tags() or {}
+    return tags.get(STATUS_TAG) in ARCHIVED_STATUSES
+
+
+def move_blob(blob_name, dest_blob_name, lease=None, metadata=None) -> bool:
     """
     Move a blob from one name to another within the same container.
-    Deletes the original blob after copying.
+    Deletes the original blob once the server-side copy has completed;
+    if the copy fails or does not complete within
+    ARCHIVE_COPY_TIMEOUT_SECONDS, it is aborted and the source is kept.
     Args:
         blob_name (str): Source blob name.
         dest_blob_name (str): Destination blob name.
+        lease (BlobLeaseClient, optional): Active lease on the source blob.
+        metadata (dict, optional): Metadata of the destination blob.
+    Returns:
+        bool: True if the blob was moved.
     """
     try:
         container_client = create_container_client()
@@ -22,11 +128,56 @@ def move_blob(blob_name, dest_blob_name):
         dest_blob_client = container_client.get_blob_client(dest_blob_name)
 
         source_url = blob_client.url
-        dest_blob_client.start_copy_from_url(source_url)
-        blob_client.delete_blob()
+        copy = dest_blob_client.start_copy_from_url(
+            source_url, metadata=metadata
+        )
+        if copy["copy_status"] != "success":
+            wait_for_copy(
+                dest_blob_client,
+                copy["copy_id"],
+                float(config.archive_copy_timeout_seconds),
+            )
+        blob_client.delete_blob(lease=lease)
         logger.info(f"Blob '{blob_name}' moved to '{dest_blob_name}'")
+        return True
     except Exception as e:
         logger.error(f"Error moving blob {blob_name} to {dest_blob_name}: {e}")
+        return False
+
+
+def wait_for_copy(dest_blob_client, copy_id: str, timeout: float):
+    """
+    Poll the copy status of a blob until the copy succeeds, with a
+    growing interval of up to 5 seconds.
+    Args:
+        dest_blob_client: BlobClient of the copy destination.
+        copy_id (str): Id of the pending copy.
+        timeout (float): Seconds to wait before aborting the copy.
+    Raises:
+        RuntimeError: If the copy failed, was aborted or timed out.
+    """
+    deadline = time.monotonic() + timeout
+    interval = 0.2
+    while True:
+        copy = dest_blob_client.get_blob_properties().copy
+        if copy.status == "success":
+            return
+        if copy.status in ("failed", "aborted"):
+            raise RuntimeError(
+                f"Copy {copy.status}: {copy.status_description}"
+            )
+        if time.monotonic() >= deadline:
+            dest_blob_client.abort_copy(copy_id)
+            raise RuntimeError(
+                f"Copy not completed after {timeout}s ({copy.progress} "
+                f"bytes); aborted"
+            )
+        logger.info(
+            f"Waiting for copy to '{dest_blob_client.blob_name}' "
+            f"({copy.progress} bytes)"
+        )
+        time.sleep(interval)
+        interval = min(interval * 2, 5)
 
 
 def estimate_chunk_size() -> int:
@@ -63,20 +214,18 @@ def estimate_chunk_size() -> int:
 
 def create_container_client():
     """
-    Create and return a ContainerClient for the configured Azure Blob
-    container.
+    Return the ContainerClient for the configured Azure Blob container.
+    The client comes from the process-wide pooled service client (see
+    storage.get_blob_service_client), so all threads reuse its HTTP
+    connections.
     Returns:
         ContainerClient: Azure Blob ContainerClient instance.
     Raises:
         RuntimeError: If the client cannot be created.
     """
+    container_name = config.az_container_name
     try:
-        connection_str = config.az_connection_string
-        container_name = config.az_container_name
-        blob_service_client = BlobServiceClient.from_connection_string(
-            connection_str
-        )
-        return blob_service_client.get_container_client(container_name)
+        return get_container_client()
     except Exception as e:
         logger.error(
             f"Error creating ContainerClient for '{container_name}': {e}"
@@ -105,12 +254,179 @@ def create_blob_client(blob_name: str):
         raise RuntimeError(f"Error creating BlobClient for '{blob_name}': {e}")
 
 
-def encrypt_column(series: pd.Series, fernet=None) -> pd.Series:
+def get_csv_read_options(schema_name: str) -> dict:
+    """
+    Build pd.read_csv options from CSV_SCHEMAS: text columns are read as
+    strings (or categories when flagged), so types are not inferred per
+    chunk, and columns outside the schema are dropped while parsing.
+    Args:
+        schema_name (str): Key in CSV_SCHEMAS.
+    Returns:
+        dict: "dtype" and "usecols" keyword arguments for pd.read_csv.
+    """
+    schema = CSV_SCHEMAS[schema_name]
+    dtype = {
+        col: "category" if meta.get("category", False) else str
+        for col, meta in schema.items()
+        if meta["type"] is str
+    }
+
+    dropped = set()
+
+    def usecols(col: str) -> bool:
+        if col in schema:
+            return True
+        if col not in dropped:
+            dropped.add(col)
+            logger.warning(f"Dropping unexpected CSV column: {col}")
+        return False
+
+    return {"dtype": dtype, "usecols": usecols}
+
+
+def downcast_numeric_columns(
+    df: pd.DataFrame, schema_name: str
+) -> pd.DataFrame:
+    """
+    Downcast numeric columns to the narrowest type allowed by the
+    "downcast" key of their CSV_SCHEMAS entry. Columns that did not parse
+    as numbers are left unchanged.
+    Args:
+        df (pd.DataFrame): Parsed chunk. Modified in place.
+        schema_name (str): Key in CSV_SCHEMAS.
+    Returns:
+        pd.DataFrame: The same DataFrame.
+    """
+    for col, meta in CSV_SCHEMAS[schema_name].items():
+        downcast = meta.get("downcast")
+        if (
+            downcast
+            and col in df.columns
+            and pd.api.types.is_numeric_dtype(df[col])
+        ):
+            df[col] = pd.to_numeric(df[col], downcast=downcast)
+    return df
+
+
+def normalize_string_column(series: pd.Series) -> pd.Series:
+    """
+    Strip and lowercase a string column. Categorical columns are
+    normalized on their categories only and stay categorical; Arrow-backed
+    columns are normalized with Arrow compute kernels and stay Arrow.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        normalized = series.cat.categories.astype(str).str.strip().str.lower()
+        # Categories that collide after normalization are merged
+        categories, inverse = np.unique(
+            np.asarray(normalized, dtype=object), return_inverse=True
+        )
+        codes = series.cat.codes.to_numpy()
+        new_codes = np.where(codes >= 0, inverse[codes], -1)
+        return pd.Series(
+            pd.Categorical.from_codes(new_codes, categories),
+            index=series.index,
+            name=series.name,
+        )
+    if is_arrow_backed(series):
+        return series.str.strip().str.lower()
+    return series.astype(str).str.strip().str.lower()
+
+
+def encrypt_column(
+    series: pd.Series, fernet=None, max_workers: int = None
+) -> pd.Series:
     """
     Encrypt a pandas Series using Fernet. Return hexadecimal strings.
+    The column is factorized so each distinct value is encrypted once per
+    call, and the ciphertexts are mapped back to the rows by index; rows
+    sharing a value within a chunk share its ciphertext.
+    Args:
+        series (pd.Series): Values to encrypt.
+        fernet (Fernet, optional): Fernet instance. If None, the series is
+            returned unchanged.
+        max_workers (int, optional): Threads used to encrypt the distinct
+            values. Defaults to ENCRYPT_THREADS.
+    Returns:
+        pd.Series: Encrypted values with the input index.
     """
     if fernet is None:
         return series
-    return series.astype(str).apply(
-        lambda x: fernet.encrypt(x.encode()).decode()
+    started = time.perf_counter()
+    is_category = isinstance(series.dtype, pd.CategoricalDtype)
+    if is_category:
+        # Categories are already the distinct values
+        series = series.cat.remove_unused_categories()
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories.astype(str)
+    elif is_arrow_backed(series):
+        # Nulls get code -1 and are left null
+        codes, uniques = pd.factorize(series)
+    else:
+        codes, uniques = pd.factorize(series.astype(str))
+    plaintexts = [value.encode() for value in uniques]
+
+    max_workers = max_workers or int(config.encrypt_threads)
+    if profiling_enabled():
+        # Encrypt on the profiled thread
+        max_workers = 1
+    if max_workers > 1 and len(plaintexts) > max_workers:
+        # One contiguous slice of distinct values per thread
+        step = -(-len(plaintexts) // max_workers)
+        slices = [
+            plaintexts[i:i + step] for i in range(0, len(plaintexts), step)
+        ]
+        ciphertexts = [
+            token
+            for tokens in _get_encrypt_executor(max_workers).map(
+                lambda values: [fernet.encrypt(v) for v in values], slices
+            )
+            for token in tokens
+        ]
+    else:
+        ciphertexts = [fernet.encrypt(value) for value in plaintexts]
+
+    tokens = [c.decode() for c in ciphertexts]
+    metrics.record(
+        "encrypt",
+        time.perf_counter() - started,
+        rows=len(series),
+        bytes=sum(len(value) for value in plaintexts),
+        batches=1,
+    )
+    metrics.count("encrypt_calls", len(plaintexts))
+    saved = len(series) - len(plaintexts)
+    with _encrypt_lock:
+        encrypt_calls_saved[series.name] += saved
+        total_saved = encrypt_calls_saved[series.name]
+    logger.info(
+        f"Encrypted column {series.name}: {len(plaintexts)} distinct "
+        f"values for {len(series)} rows ({saved} encrypt calls saved, "
+        f"{total_saved} in total)"
     )
+    if is_category:
+        return pd.Series(
+            pd.Categorical.from_codes(codes, tokens),
+            index=series.index,
+            name=series.name,
+        )
+    if is_arrow_backed(series):
+        encrypted = pa.array(tokens, type=pa.string()).take(
+            pa.array(codes, mask=codes < 0)
+        )
+        return to_arrow_series(encrypted, series.index, series.name)
+    # Trailing NaN so missing values (code -1) stay missing
+    tokens = np.array(tokens + [np.nan], dtype=object)
+    return pd.Series(tokens[codes], index=series.index, name=series.name)
+
+
+def _get_encrypt_executor(max_workers: int) -> ThreadPoolExecutor:
+    """
+    Return the process-wide executor used to encrypt distinct values.
+    """
+    global _encrypt_executor
+    with _encrypt_lock:
+        if _encrypt_executor is None:
+            _encrypt_executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="encrypt"
+            )
+        return _encrypt_executor
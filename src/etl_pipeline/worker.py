@@ -0,0 +1,117 @@
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.env_vars import EnvConfig
+from utils.logger import get_logger
+
+from src.etl_pipeline.pipeline import process_blob
+from src.etl_pipeline.utils.dedup import get_dedup_index
+from src.etl_pipeline.utils.metrics import start_metrics_server
+
+logger = get_logger()
+config = EnvConfig()
+
+
+def read_blob_names(blobs: list, manifest: str = None) -> list:
+    """
+    Collect blob names from the command line and an optional manifest.
+    Args:
+        blobs (list): Blob names given as arguments.
+        manifest (str, optional): Path of a file with one blob name per
+            line, or "-" to read them from stdin. Blank lines and lines
+            starting with "#" are ignored.
+    Returns:
+        list: Blob names in order, without duplicates.
+    """
+    names = list(blobs)
+    if manifest:
+        lines = (
+            sys.stdin if manifest == "-"
+            else open(manifest, encoding="utf-8")
+        )
+        with lines:
+            names.extend(
+                line.strip() for line in lines
+                if line.strip() and not line.lstrip().startswith("#")
+            )
+    return list(dict.fromkeys(names))
+
+
+def run_worker(blob_names: list, concurrency: int = None) -> list:
+    """
+    Process many blobs in this process with at most concurrency blobs in
+    flight. The storage client, DB engine, loader and transform pools,
+    ciphers and dedup filter are created once and shared by all blobs.
+    Args:
+        blob_names (list): Blobs to process.
+        concurrency (int, optional): Defaults to WORKER_CONCURRENCY.
+    Returns:
+        list: One process_blob summary per blob, in input order.
+    """
+    concurrency = concurrency or int(config.worker_concurrency)
+    # Warm the dedup filter before the first blob
+    get_dedup_index()
+    start_metrics_server()
+    logger.info(
+        f"Worker processing {len(blob_names)} blobs with concurrency "
+        f"{concurrency}"
+    )
+    with ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="blob"
+    ) as executor:
+        summaries = list(executor.map(process_blob, blob_names))
+
+    succeeded = sum(s["success"] for s in summaries)
+    logger.info("----- WORKER SUMMARY -----")
+    for summary in summaries:
+        logger.info(
+            f"{summary['blob']}: "
+            f"{'SUCCESS' if summary['success'] else 'FAILURE'} "
+            f"({summary['succeeded']}/{summary['chunks']} chunks, "
+            f"{summary['rows']} rows) -> "
+            f"{summary['destination']}"
+        )
+    logger.info(
+        f"Blobs succeeded: {succeeded}, failed: "
+        f"{len(summaries) - succeeded}"
+    )
+    return summaries
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the ETL job for many blobs in one process."
+    )
+    parser.add_argument("blobs", nargs="*", help="Blob names to process")
+    parser.add_argument(
+        "--manifest",
+        help='File with one blob name per line, or "-" for stdin',
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Blobs processed at the same time (default: "
+             "WORKER_CONCURRENCY)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        config.validate()
+        blob_names = read_blob_names(args.blobs, args.manifest)
+    except Exception as e:
+        logger.error(f"Worker failed to start: {e}")
+        sys.exit(1)
+
+    if not blob_names:
+        logger.error(
+            "Usage: python worker.py [--manifest FILE|-] [--concurrency N] "
+            "<blob> ..."
+        )
+        sys.exit(1)
+
+    summaries = run_worker(blob_names, args.concurrency)
+    sys.exit(0 if all(s["success"] for s in summaries) else 1)